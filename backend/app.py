@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import sqlite3
 from datetime import datetime
@@ -8,27 +8,94 @@ from google.cloud import speech
 from gtts import gTTS
 import tempfile
 import json
+import math
+import base64
+from urllib.parse import urlencode
 from dotenv import load_dotenv
-import requests
 from supabase import create_client, Client
 import pyotp
 import secrets
 import time
+import threading
+import atexit
+import contextvars
+from contextlib import closing
+from db_pool import ConnectionPool, ThreadLocalPool
+from translation_cache import LRUCache, DatabaseCacheStore, TranslationCache, make_cache_key
+from kv_store import MemoryKVStore, DatabaseKVStore, RateLimiter
+from auth_tokens import TokenVerifier, TokenError, JWKSCache
+from translation_memory import TranslationMemory
+from glossary import Glossary
+from audio_store import AudioStore
+from tts_worker import TTSWorkerPool, READY, PENDING, UNKNOWN
+from batch_translation import pack_segments, build_batch_prompt, parse_batch_response, estimate_tokens
+from document_translation import chunk_document, context_tail
+from history_writer import HistoryWriter
+from singleflight import SingleFlight
+from history_search import search_terms, match_expression, ensure_search_index, search_query
+from metrics import Registry
+from concurrent.futures import ThreadPoolExecutor
+from gemini_client import GeminiClient, GeminiError, CircuitBreaker
+from gemini_scheduler import GeminiScheduler, SchedulerRejected, PRIORITIES
+from phrase_pack import PhrasePack, PhrasePackError, DEFAULT_PATH as DEFAULT_PHRASE_PACK_PATH
+from speech_stream import iter_chunks, streaming_transcribe
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": os.getenv("VITE_API_BASE_URL", "*")}})
+CORS(app, resources={r"/*": {"origins": os.getenv("VITE_API_BASE_URL", "*")}}, expose_headers=["X-Next-Cursor", "Link"])
+
+# Metrics configuration: with several workers, point METRICS_DIR at a directory
+# they all share (emptied on deploy) so /metrics reports every worker's totals
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # seconds
+
+metrics = Registry(METRICS_DIR, stale_after=max(60.0, 3 * METRICS_FLUSH_INTERVAL))
+metrics.start_writer(METRICS_FLUSH_INTERVAL)
+if METRICS_DIR:
+    atexit.register(metrics.write_snapshot)
+
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Time until the response headers were ready', ('route', 'method'))
+stage_seconds = metrics.histogram(
+    'stage_duration_seconds', 'Time spent in one processing stage (gemini, tts, speech, db_insert, ...)', ('stage',))
+stage_errors = metrics.counter('stage_errors_total', 'Stage calls that raised an error', ('stage',))
+
+def timed_stage(stage):
+    """Record the duration (and failure) of a block as one processing stage"""
+    return stage_seconds.time(stage, errors=stage_errors)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The URL rule, not the path, so /audio/<audio_id> stays one series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, route, request.method)
+        http_requests.inc(route, request.method, str(response.status_code))
+    return response
 @app.route('/')
 def index():
     return jsonify({
         "message": "Welcome to the Healthcare Translation API 🎉",
         "available_endpoints": [
             "/translate",
+            "/translate/stream",
+            "/translate/batch",
+            "/translate/document",
             "/speech-to-text",
+            "/speech-to-text/stream",
             "/languages",
             "/history",
+            "/history/search",
+            "/cache/stats",
             "/auth/signup",
             "/auth/login",
             "/auth/verify-otp",
@@ -69,7 +136,6 @@ if DATABASE_TYPE == 'local':
 elif DATABASE_TYPE == 'supabase':
     # Use full DATABASE_URL - this is the recommended approach
     DB_URL = os.getenv('DATABASE_URL')
-    print("Loaded DB_URL:", DB_URL)
     if not DB_URL:
         raise ValueError("DATABASE_URL environment variable is required for Supabase. Please set it to your Supabase connection string.")
     print("✅ Using DATABASE_URL for Supabase connection")
@@ -89,35 +155,20 @@ else:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 
 # OTP Configuration
-OTP_SECRET = os.getenv('OTP_SECRET', secrets.token_hex(32))
+OTP_SECRET = os.getenv('OTP_SECRET', pyotp.random_base32())
 OTP_EXPIRY = 300  # 5 minutes in seconds
 
-# OTP Storage (in production, use Redis or database)
-otp_storage = {}
-
 def generate_otp():
     """Generate a 6-digit OTP"""
     return pyotp.TOTP(OTP_SECRET).now()
 
 def verify_otp(email, otp):
-    """Verify OTP for email"""
-    if email not in otp_storage:
-        return False
-    
-    stored_otp, timestamp = otp_storage[email]
-    if time.time() - timestamp > OTP_EXPIRY:
-        del otp_storage[email]
-        return False
-    
-    if stored_otp == otp:
-        del otp_storage[email]
-        return True
-    
-    return False
+    """Verify OTP for email; a matching code is consumed so it works only once"""
+    return kv_store.delete(f'otp:{email}', otp)
 
 def store_otp(email, otp):
-    """Store OTP with timestamp"""
-    otp_storage[email] = (otp, time.time())
+    """Store OTP in the shared key-value store; it expires after OTP_EXPIRY"""
+    kv_store.set(f'otp:{email}', otp, OTP_EXPIRY)
 
 # Use gemini-2.0-flash model
 try:
@@ -205,47 +256,94 @@ SUPPORTED_LANGUAGES = {
     'me': 'Montenegrin'
 }
 
-def get_db_connection():
-    """Get database connection based on configuration"""
-    try:
-        if DATABASE_TYPE == 'local':
-            return sqlite3.connect(DB_PATH)
-        elif DATABASE_TYPE == 'supabase':
-            import psycopg2
-            db_url = os.getenv('DATABASE_URL')
-            print(f"🔗 Connecting to database using DATABASE_URL: {db_url}")
-            if db_url:
-                return psycopg2.connect(db_url)
-            else:
-                raise ValueError("DATABASE_URL environment variable is required for Supabase connection")
-        elif DATABASE_TYPE == 'sqlite_cloud':
-            # For cloud SQLite services
-            return sqlite3.connect(DB_PATH)
-        elif DATABASE_TYPE == 'postgresql':
-            import psycopg2
-            return psycopg2.connect(
-                host=os.getenv('DB_HOST', 'localhost'),
-                port=os.getenv('DB_PORT', '5432'),
-                database=os.getenv('DB_NAME', 'translation_app'),
-                user=os.getenv('DB_USER', 'postgres'),
-                password=os.getenv('DB_PASSWORD', '')
-            )
-        elif DATABASE_TYPE == 'mysql':
-            import mysql.connector
-            return mysql.connector.connect(
-                host=os.getenv('DB_HOST', 'localhost'),
-                port=os.getenv('DB_PORT', '3306'),
-                database=os.getenv('DB_NAME', 'translation_app'),
-                user=os.getenv('DB_USER', 'root'),
-                password=os.getenv('DB_PASSWORD', '')
-            )
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_CHECK_AFTER = float(os.getenv('DB_POOL_CHECK_AFTER', '5'))
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))
+
+# psycopg2 and mysql-connector use %s placeholders, sqlite3 uses ?
+SQL_PARAM = '%s' if DATABASE_TYPE in ['supabase', 'postgresql', 'mysql'] else '?'
+
+# SQL dialect used for schema statements
+if DATABASE_TYPE in ['local', 'sqlite_cloud']:
+    DB_DIALECT = 'sqlite'
+elif DATABASE_TYPE == 'mysql':
+    DB_DIALECT = 'mysql'
+else:
+    DB_DIALECT = 'postgresql'
+
+def connect_db():
+    """Open a new raw database connection based on configuration"""
+    if DATABASE_TYPE in ['local', 'sqlite_cloud']:
+        return sqlite3.connect(DB_PATH)
+    elif DATABASE_TYPE == 'supabase':
+        import psycopg2
+        db_url = os.getenv('DATABASE_URL')
+        if db_url:
+            return psycopg2.connect(db_url)
         else:
-            raise ValueError(f"Unsupported database type: {DATABASE_TYPE}")
+            raise ValueError("DATABASE_URL environment variable is required for Supabase connection")
+    elif DATABASE_TYPE == 'postgresql':
+        import psycopg2
+        return psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '5432'),
+            database=os.getenv('DB_NAME', 'translation_app'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', '')
+        )
+    elif DATABASE_TYPE == 'mysql':
+        import mysql.connector
+        return mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '3306'),
+            database=os.getenv('DB_NAME', 'translation_app'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', '')
+        )
+    else:
+        raise ValueError(f"Unsupported database type: {DATABASE_TYPE}")
+
+def create_db_pool():
+    """Create the connection pool matching DATABASE_TYPE"""
+    if DATABASE_TYPE in ['local', 'sqlite_cloud']:
+        return ThreadLocalPool(connect_db, check_after=DB_POOL_CHECK_AFTER, name=DATABASE_TYPE)
+    return ConnectionPool(
+        connect_db,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        check_after=DB_POOL_CHECK_AFTER,
+        max_idle=DB_POOL_MAX_IDLE,
+        name=DATABASE_TYPE
+    )
+
+db_pool = create_db_pool()
+
+def get_db_connection():
+    """Check out a pooled database connection
+
+    close() or leaving a ``with`` block returns it to the pool.
+    """
+    try:
+        return db_pool.connection()
     except Exception as e:
         print(f"❌ Database connection error: {e}")
         print(f"📊 Database type: {DATABASE_TYPE}")
         raise e
 
+# History rows of requests without an access token belong to this user id
+ANONYMOUS_USER_ID = 'anonymous'
+# Owner of the rows that existed before chat_history had a user_id column
+HISTORY_BACKFILL_USER_ID = os.getenv('HISTORY_BACKFILL_USER_ID', ANONYMOUS_USER_ID)
+# Postgres only, applied when chat_history is created: 'none', 'month' (range
+# partitions on date) or 'user' (HISTORY_PARTITIONS hash partitions on user_id)
+HISTORY_PARTITIONING = os.getenv('HISTORY_PARTITIONING', 'none')
+HISTORY_PARTITIONS = int(os.getenv('HISTORY_PARTITIONS', '16'))
+HISTORY_MONTHS_AHEAD = int(os.getenv('HISTORY_MONTHS_AHEAD', '3'))
+
 def init_db():
     """Initialize database with proper schema"""
     if DATABASE_TYPE == 'supabase':
@@ -257,7 +355,7 @@ def init_db():
         cursor = conn.cursor()
         
         if DATABASE_TYPE in ['local', 'sqlite_cloud']:
-            cursor.execute('''
+            cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS chat_history (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     date TEXT NOT NULL,
@@ -265,267 +363,1603 @@ def init_db():
                     translated_text TEXT NOT NULL,
                     input_language TEXT NOT NULL,
                     output_language TEXT NOT NULL,
-                    audio_path TEXT
+                    audio_path TEXT,
+                    user_id TEXT NOT NULL DEFAULT '{ANONYMOUS_USER_ID}'
                 )
             ''')
         elif DATABASE_TYPE == 'postgresql':
-            cursor.execute('''
+            create_postgres_history_table(cursor)
+        elif DATABASE_TYPE == 'mysql':
+            # Indexed columns must be VARCHAR in MySQL
+            cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS chat_history (
-                    id SERIAL PRIMARY KEY,
-                    date TEXT NOT NULL,
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    date VARCHAR(32) NOT NULL,
                     original_text TEXT NOT NULL,
                     translated_text TEXT NOT NULL,
-                    input_language TEXT NOT NULL,
-                    output_language TEXT NOT NULL,
-                    audio_path TEXT
+                    input_language VARCHAR(16) NOT NULL,
+                    output_language VARCHAR(16) NOT NULL,
+                    audio_path TEXT,
+                    user_id VARCHAR(64) NOT NULL DEFAULT '{ANONYMOUS_USER_ID}'
                 )
             ''')
-        elif DATABASE_TYPE == 'mysql':
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
+        
+        conn.commit()
+        conn.close()
+
+    if DATABASE_TYPE == 'postgresql' and HISTORY_PARTITIONING == 'month':
+        create_history_month_partitions()
+    migrate_history_user_id()
+    create_history_indexes()
+    create_history_search_index()
+
+def create_postgres_history_table(cursor):
+    """Create chat_history on Postgres, partitioned as configured by HISTORY_PARTITIONING"""
+    columns = f'''
+                    id SERIAL,
                     date TEXT NOT NULL,
                     original_text TEXT NOT NULL,
                     translated_text TEXT NOT NULL,
                     input_language TEXT NOT NULL,
                     output_language TEXT NOT NULL,
-                    audio_path TEXT
-                )
+                    audio_path TEXT,
+                    user_id TEXT NOT NULL DEFAULT '{ANONYMOUS_USER_ID}'
+                '''
+    if HISTORY_PARTITIONING == 'none':
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS chat_history ({columns}, PRIMARY KEY (id))')
+        return
+
+    cursor.execute("SELECT to_regclass('chat_history')")
+    if cursor.fetchone()[0] is not None:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'chat_history'::regclass")
+        if cursor.fetchone() is None:
+            print("⚠️ Warning: chat_history already exists unpartitioned; HISTORY_PARTITIONING only applies to new tables")
+    elif HISTORY_PARTITIONING == 'month':
+        # The partition key has to be part of the primary key
+        cursor.execute(f'CREATE TABLE chat_history ({columns}, PRIMARY KEY (id, date)) PARTITION BY RANGE (date)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS chat_history_default PARTITION OF chat_history DEFAULT')
+    elif HISTORY_PARTITIONING == 'user':
+        cursor.execute(f'CREATE TABLE chat_history ({columns}, PRIMARY KEY (id, user_id)) PARTITION BY HASH (user_id)')
+        for remainder in range(HISTORY_PARTITIONS):
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS chat_history_p{remainder} PARTITION OF chat_history
+                FOR VALUES WITH (MODULUS {HISTORY_PARTITIONS}, REMAINDER {remainder})
             ''')
-        
-        conn.commit()
-        conn.close()
+    else:
+        raise ValueError(f"Unsupported HISTORY_PARTITIONING: {HISTORY_PARTITIONING}")
+
+def create_history_month_partitions(months_ahead=HISTORY_MONTHS_AHEAD):
+    """Create the monthly chat_history partitions from this month to months_ahead months out
+
+    date holds ISO 8601 strings, so a month is the text range ['YYYY-MM', next 'YYYY-MM').
+    Rows outside the created months land in chat_history_default.
+    """
+    today = datetime.now()
+    for offset in range(months_ahead + 1):
+        year, month = divmod(today.year * 12 + today.month - 1 + offset, 12)
+        next_year, next_month = divmod(year * 12 + month + 1, 12)
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS chat_history_y{year}m{month + 1:02d} PARTITION OF chat_history
+                    FOR VALUES FROM ('{year}-{month + 1:02d}') TO ('{next_year}-{next_month + 1:02d}')
+                ''')
+        except Exception as e:
+            # e.g. rows for that month already sit in chat_history_default
+            print(f"⚠️ Warning: Could not create chat_history partition {year}-{month + 1:02d}: {e}")
+
+def migrate_history_user_id(batch_size=10000):
+    """Add chat_history.user_id to tables created before it existed and backfill the old rows"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if DB_DIALECT == 'sqlite':
+                cursor.execute('PRAGMA table_info(chat_history)')
+                columns = {row[1] for row in cursor.fetchall()}
+            else:
+                schema = 'DATABASE()' if DB_DIALECT == 'mysql' else 'current_schema()'
+                cursor.execute(f'''
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = {schema} AND table_name = 'chat_history'
+                ''')
+                columns = {row[0].lower() for row in cursor.fetchall()}
+            if not columns or 'user_id' in columns:
+                return
+
+            column_type = 'VARCHAR(64)' if DB_DIALECT == 'mysql' else 'TEXT'
+            # With a constant default this is a metadata-only change on Postgres 11+, MySQL 8 and SQLite
+            cursor.execute(f"ALTER TABLE chat_history ADD COLUMN user_id {column_type} NOT NULL DEFAULT '{ANONYMOUS_USER_ID}'")
+        print("✅ Added chat_history.user_id")
+
+        if HISTORY_BACKFILL_USER_ID == ANONYMOUS_USER_ID:
+            return
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(id) FROM chat_history')
+            max_id = cursor.fetchone()[0] or 0
+        # Committed in id ranges so a large table is not locked by one long transaction
+        for start in range(0, max_id, batch_size):
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    UPDATE chat_history SET user_id = {SQL_PARAM}
+                    WHERE user_id = {SQL_PARAM} AND id > {SQL_PARAM} AND id <= {SQL_PARAM}
+                ''', (HISTORY_BACKFILL_USER_ID, ANONYMOUS_USER_ID, start, start + batch_size))
+        print(f"✅ Assigned existing history rows to user {HISTORY_BACKFILL_USER_ID}")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not migrate chat_history.user_id: {e}")
+
+# Indexes backing /history keyset pagination and language-pair filters, per user
+HISTORY_INDEXES = {
+    'idx_chat_history_user_date': 'user_id, date, id',
+    'idx_chat_history_user_languages_date': 'user_id, input_language, output_language, date, id',
+}
+# Superseded by the user-scoped indexes above
+OBSOLETE_HISTORY_INDEXES = ['idx_chat_history_date_id', 'idx_chat_history_languages_date']
+
+def create_history_indexes():
+    """Create the chat_history indexes if they are missing"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if DB_DIALECT == 'mysql':
+                # Tables created before these indexes existed used TEXT columns
+                cursor.execute('''
+                    ALTER TABLE chat_history
+                        MODIFY date VARCHAR(32) NOT NULL,
+                        MODIFY input_language VARCHAR(16) NOT NULL,
+                        MODIFY output_language VARCHAR(16) NOT NULL
+                ''')
+                cursor.execute('''
+                    SELECT DISTINCT index_name FROM information_schema.statistics
+                    WHERE table_schema = DATABASE() AND table_name = 'chat_history'
+                ''')
+                existing = {row[0] for row in cursor.fetchall()}
+                for name, columns in HISTORY_INDEXES.items():
+                    if name not in existing:
+                        cursor.execute(f'CREATE INDEX {name} ON chat_history ({columns})')
+                for name in OBSOLETE_HISTORY_INDEXES:
+                    if name in existing:
+                        cursor.execute(f'DROP INDEX {name} ON chat_history')
+            else:
+                for name, columns in HISTORY_INDEXES.items():
+                    cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON chat_history ({columns})')
+                for name in OBSOLETE_HISTORY_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
+    except Exception as e:
+        print(f"⚠️ Warning: Could not create chat_history indexes: {e}")
+
+# Adding the full-text index to a populated Postgres or MySQL chat_history rewrites the
+# table under lock, so it is only done when this is set (for one deploy, off-peak)
+HISTORY_SEARCH_MIGRATE = os.getenv('HISTORY_SEARCH_MIGRATE', 'false').lower() == 'true'
+history_search_ready = False
+
+def create_history_search_index():
+    """Create the full-text index behind /history/search if it is missing"""
+    global history_search_ready
+    try:
+        with get_db_connection() as conn:
+            history_search_ready = ensure_search_index(conn.cursor(), DB_DIALECT, migrate=HISTORY_SEARCH_MIGRATE)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not create chat_history full-text index, /history/search disabled: {e}")
+        return
+    if not history_search_ready:
+        print("⚠️ Warning: chat_history has no full-text index and adding one rewrites the table; "
+              "/history/search is disabled until a start with HISTORY_SEARCH_MIGRATE=true")
+
+# CREATE ... IF NOT EXISTS is idempotent, so initialize on every start
+init_db()
+
+# Open the minimum number of pooled connections before the first request
+try:
+    db_pool.warm_up()
+except Exception as e:
+    print(f"⚠️ Warning: Could not warm up database pool: {e}")
+
+# Key-value store for OTPs and rate limits: 'sqlite' (a local file shared by the
+# workers on this host), 'database' (the main database, shared by every host)
+# or 'memory' (single process only)
+KV_BACKEND = os.getenv('KV_BACKEND', 'sqlite')
+KV_SQLITE_PATH = os.getenv('KV_SQLITE_PATH', 'kv_store.db')
+KV_SWEEP_INTERVAL = float(os.getenv('KV_SWEEP_INTERVAL', '60'))
+
+def connect_kv_sqlite():
+    conn = sqlite3.connect(KV_SQLITE_PATH, timeout=10)
+    # WAL lets workers read while another one writes
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def create_kv_store():
+    """Create the key-value store matching KV_BACKEND"""
+    if KV_BACKEND == 'memory':
+        return MemoryKVStore()
+    if KV_BACKEND == 'database':
+        store = DatabaseKVStore(get_db_connection, DB_DIALECT, sweep_interval=KV_SWEEP_INTERVAL)
+    elif KV_BACKEND == 'sqlite':
+        pool = ThreadLocalPool(connect_kv_sqlite, name='kv_sqlite')
+        store = DatabaseKVStore(pool.connection, 'sqlite', sweep_interval=KV_SWEEP_INTERVAL, name='sqlite')
+    else:
+        raise ValueError(f"Unsupported KV_BACKEND: {KV_BACKEND}")
+    store.ensure_schema()
+    return store
+
+kv_store = create_kv_store()
+
+# Rate limits: requests allowed per window (seconds); a limit of 0 disables it
+OTP_RESEND_LIMIT_PER_EMAIL = int(os.getenv('OTP_RESEND_LIMIT_PER_EMAIL', '3'))
+OTP_RESEND_LIMIT_PER_IP = int(os.getenv('OTP_RESEND_LIMIT_PER_IP', '20'))
+OTP_RESEND_WINDOW = int(os.getenv('OTP_RESEND_WINDOW', '900'))
+TRANSLATE_LIMIT_PER_IP = int(os.getenv('TRANSLATE_LIMIT_PER_IP', '120'))
+TRANSLATE_WINDOW = int(os.getenv('TRANSLATE_WINDOW', '60'))
+
+def create_rate_limiter(name, limit, window):
+    return RateLimiter(kv_store, name, limit, window) if limit > 0 else None
+
+otp_email_limiter = create_rate_limiter('otp-email', OTP_RESEND_LIMIT_PER_EMAIL, OTP_RESEND_WINDOW)
+otp_ip_limiter = create_rate_limiter('otp-ip', OTP_RESEND_LIMIT_PER_IP, OTP_RESEND_WINDOW)
+translate_ip_limiter = create_rate_limiter('translate-ip', TRANSLATE_LIMIT_PER_IP, TRANSLATE_WINDOW)
+
+def check_rate_limit(limiter, key):
+    """Count a request against limiter; returns None, or the Retry-After seconds when over the limit
+
+    A store failure lets the request through rather than taking the route down.
+    """
+    if limiter is None or not key:
+        return None
+    try:
+        allowed, retry_after = limiter.hit(key)
+    except Exception as e:
+        print(f"⚠️ Warning: Rate limit check failed: {e}")
+        return None
+    return None if allowed else retry_after
+
+def rate_limited_response(retry_after):
+    response = jsonify({'error': 'Too many requests, please try again later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def overloaded_response(e):
+    """503 for a request whose Gemini call the scheduler did not admit"""
+    response = jsonify({'error': str(e), 'reason': e.reason})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+# Access token verification. With SUPABASE_JWT_SECRET (HS256) and/or
+# SUPABASE_JWKS_URL (asymmetric keys, needs PyJWT[crypto]) tokens are verified
+# in-process; otherwise each new token is checked with a call to Supabase. Either
+# way verified tokens are cached until they expire or are revoked.
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL')
+JWT_AUDIENCE = os.getenv('JWT_AUDIENCE', 'authenticated')
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+AUTH_REVOCATION_CHECK_INTERVAL = float(os.getenv('AUTH_REVOCATION_CHECK_INTERVAL', '5'))  # seconds
+AUTH_JWKS_TTL = int(os.getenv('AUTH_JWKS_TTL', '600'))
+
+# Without REQUIRE_AUTH, requests without a token use the shared anonymous history
+REQUIRE_AUTH = os.getenv('REQUIRE_AUTH', 'false').lower() == 'true'
+
+def supabase_user_claims(token):
+    """Claims of the Supabase user a token belongs to; raises TokenError"""
+    try:
+        user_response = supabase.auth.get_user(token)
+    except Exception as e:
+        raise TokenError(str(e))
+    user = getattr(user_response, 'user', None)
+    if user is None:
+        raise TokenError('Invalid token or user not found.')
+    return {'sub': user.id, 'email': user.email, 'user_metadata': user.user_metadata}
+
+token_verifier = None
+if SUPABASE_JWT_SECRET or SUPABASE_JWKS_URL or supabase:
+    token_verifier = TokenVerifier(
+        secret=SUPABASE_JWT_SECRET,
+        jwks=JWKSCache(SUPABASE_JWKS_URL, ttl=AUTH_JWKS_TTL) if SUPABASE_JWKS_URL else None,
+        remote=supabase_user_claims,
+        audience=JWT_AUDIENCE,
+        cache_size=AUTH_TOKEN_CACHE_SIZE,
+        store=kv_store,
+        revocation_check_interval=AUTH_REVOCATION_CHECK_INTERVAL
+    )
+elif REQUIRE_AUTH:
+    raise RuntimeError("REQUIRE_AUTH needs SUPABASE_JWT_SECRET, SUPABASE_JWKS_URL or a Supabase client")
+else:
+    print("⚠️ Warning: No token verification configured, bearer tokens are ignored (anonymous history)")
+
+def bearer_token():
+    """Access token from the Authorization header, or None"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+def verify_access_token(token):
+    """Claims of a valid access token (``sub`` is the user id); raises TokenError"""
+    if token_verifier is None:
+        raise TokenError('Token verification is not configured.')
+    return token_verifier.verify(token)
+
+def resolve_user(token):
+    """User id for a request's bearer token: returns (user_id, error)
+
+    error is a (body, status) pair so Flask and ASGI views can both render it.
+    Tokens are ignored when nothing is configured to verify them.
+    """
+    if not token or token_verifier is None:
+        if REQUIRE_AUTH:
+            return None, ({'error': 'Authorization token required.'}, 401)
+        return ANONYMOUS_USER_ID, None
+    try:
+        return verify_access_token(token)['sub'], None
+    except TokenError as e:
+        return None, ({'error': str(e)}, 401)
+
+# Translation cache configuration
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', '5000'))
+TRANSLATION_CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', '86400'))  # 1 day
+TRANSLATION_CACHE_PERSIST = os.getenv('TRANSLATION_CACHE_PERSIST', 'false').lower() == 'true'
+TRANSLATION_CACHE_DB_TTL = int(os.getenv('TRANSLATION_CACHE_DB_TTL', str(30 * 86400)))  # 30 days
+
+def create_translation_cache():
+    """Create the translation cache, with a database tier if enabled"""
+    store = None
+    if TRANSLATION_CACHE_PERSIST:
+        store = DatabaseCacheStore(get_db_connection, DB_DIALECT, ttl=TRANSLATION_CACHE_DB_TTL)
+        try:
+            store.ensure_schema()
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create translation_cache table, persistent tier disabled: {e}")
+            store = None
+    memory = LRUCache(max_size=TRANSLATION_CACHE_SIZE, ttl=TRANSLATION_CACHE_TTL)
+    return TranslationCache(memory, store)
+
+translation_cache = create_translation_cache()
+
+# Translation memory configuration
+TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY', 'true').lower() == 'true'
+TM_FUZZY_THRESHOLD = float(os.getenv('TM_FUZZY_THRESHOLD', '0.75'))
+TM_MAX_REFERENCES = int(os.getenv('TM_MAX_REFERENCES', '3'))
+TM_REFRESH_INTERVAL = int(os.getenv('TM_REFRESH_INTERVAL', '60'))  # seconds
+TM_LOAD_LIMIT = int(os.getenv('TM_LOAD_LIMIT', '5000'))  # most recent segments indexed per user and pair
+# Exact hits and prompt references come from the requesting user's own history only;
+# TM_SHARED=true pools every user's history (opt in only if users may see each other's texts)
+TM_SHARED = os.getenv('TM_SHARED', 'false').lower() == 'true'
+
+def load_translation_memory(user_id, input_language, output_language):
+    """Most recent segments of one user (every user when shared) and language pair, for the lazy index build"""
+    where = 'input_language = {0} AND output_language = {0}'.format(SQL_PARAM)
+    params = [input_language, output_language]
+    if user_id is not None:
+        where += f' AND user_id = {SQL_PARAM}'
+        params.append(user_id)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT original_text, translated_text FROM chat_history
+            WHERE {where} ORDER BY id DESC LIMIT {TM_LOAD_LIMIT}
+        ''', params)
+        # Oldest first so newer translations of the same text win
+        return cursor.fetchall()[::-1]
+
+# Indexes are built per user and language pair on first use, not for the whole table at startup
+translation_memory = TranslationMemory(threshold=TM_FUZZY_THRESHOLD, shared=TM_SHARED,
+                                       loader=load_translation_memory) \
+    if TRANSLATION_MEMORY_ENABLED else None
+
+# User of the request being handled, for the per-user translation memory lookups
+request_user = contextvars.ContextVar('request_user', default=ANONYMOUS_USER_ID)
+
+def sync_translation_memory(batch_size=1000):
+    """Index chat_history rows added since the last sync (by this or any other worker)
+
+    Only indexes that are already loaded take the new rows; the rest read
+    them when they are first used.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, original_text, translated_text, input_language, output_language, user_id
+            FROM chat_history WHERE id > {SQL_PARAM} ORDER BY id
+        ''', (translation_memory.last_row_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            translation_memory.load_rows(rows)
+
+def skip_translation_memory_backlog():
+    """Start syncing from the newest row: rows already in the table are read by the lazy loads"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(id) FROM chat_history')
+        row = cursor.fetchone()
+    translation_memory.last_row_id = max(translation_memory.last_row_id, row[0] or 0)
 
-# Initialize database if it doesn't exist (for local SQLite)
-if DATABASE_TYPE == 'local' and not os.path.exists(DB_PATH):
-    init_db()
-elif DATABASE_TYPE != 'local':
-    # For cloud databases, always try to initialize
-    init_db()
+def run_translation_memory_sync():
+    skipped = False
+    while True:
+        try:
+            if not skipped:
+                skip_translation_memory_backlog()
+                skipped = True
+            sync_translation_memory()
+        except Exception as e:
+            print(f"⚠️ Warning: Translation memory sync failed: {e}")
+        time.sleep(TM_REFRESH_INTERVAL)
+
+if translation_memory is not None:
+    # Picks up rows other workers write to indexes this worker has loaded
+    threading.Thread(target=run_translation_memory_sync, name='translation-memory-sync', daemon=True).start()
+
+# Phrase pack: standard phrases pre-translated offline by build_phrase_pack.py; '' disables it
+PHRASE_PACK_PATH = os.getenv('PHRASE_PACK_PATH', DEFAULT_PHRASE_PACK_PATH)
+
+def load_phrase_pack():
+    # A zero-length file (e.g. an interrupted deploy copy) counts as no pack
+    if not PHRASE_PACK_PATH or not os.path.exists(PHRASE_PACK_PATH) or not os.path.getsize(PHRASE_PACK_PATH):
+        return None
+    try:
+        pack = PhrasePack(PHRASE_PACK_PATH)
+    except (OSError, PhrasePackError) as e:
+        print(f"⚠️ Warning: Failed to load phrase pack: {e}")
+        return None
+    print(f"✅ Loaded {len(pack)} pre-translated phrases from {PHRASE_PACK_PATH}")
+    return pack
+
+phrase_pack = load_phrase_pack()
+
+def lookup_translation(text, input_language, output_language, context=None):
+    """Translation already known for text, or None if Gemini has to be called
+
+    Cached translations made with context (the preceding text of a document)
+    are only found with the same context.
+    """
+    with timed_stage('cache_lookup'):
+        translated_text = None
+        if phrase_pack is not None:
+            translated_text = phrase_pack.get(text, input_language, output_language)
+        if translated_text is None:
+            translated_text = translation_cache.get(text, input_language, output_language, context)
+        if translated_text is None and translation_memory is not None:
+            translated_text = translation_memory.exact(text, input_language, output_language,
+                                                       scope=request_user.get())
+    return translated_text
+
+def remember_translation(text, input_language, output_language, translated_text, context=None):
+    """Record a fresh Gemini translation so later lookups can reuse it"""
+    translation_cache.set(text, input_language, output_language, translated_text, context)
+
+# Request coalescing: concurrent identical translations (and audio renders) share one
+# upstream call; SINGLE_FLIGHT_SHARED extends that across workers through the KV store
+SINGLE_FLIGHT_SHARED = os.getenv('SINGLE_FLIGHT_SHARED', 'false').lower() == 'true'
+SINGLE_FLIGHT_LOCK_TTL = int(os.getenv('SINGLE_FLIGHT_LOCK_TTL', '30'))  # seconds a crashed worker's lock lives
+SINGLE_FLIGHT_WAIT = float(os.getenv('SINGLE_FLIGHT_WAIT', '60'))  # seconds before calling upstream anyway
+
+def create_single_flight(name):
+    return SingleFlight(
+        name,
+        store=kv_store if SINGLE_FLIGHT_SHARED else None,
+        lock_ttl=SINGLE_FLIGHT_LOCK_TTL,
+        wait_timeout=SINGLE_FLIGHT_WAIT
+    )
+
+translation_flight = create_single_flight('translation')
+
+def translation_flight_key(text, input_language, output_language):
+    """Single-flight key of a translation
+
+    Per user while the translation memory is: the leader's lookups and prompt
+    draw on its own user's history, which must not reach other users' requests.
+    """
+    key = make_cache_key(text, input_language, output_language)
+    if translation_memory is not None and not TM_SHARED:
+        key = f'{request_user.get()}:{key}'
+    return key
+
+def fetch_translation(text, input_language, output_language):
+    """Translation from Gemini, unless a call that finished just now already cached it"""
+    translated_text = lookup_translation(text, input_language, output_language)
+    if translated_text is None:
+        translated_text = gemini_translate(text, input_language, output_language)
+        remember_translation(text, input_language, output_language, translated_text)
+    return translated_text
 
 def translate_text(text, input_language, output_language):
+    """Translate text, serving repeated (text, language pair) requests from cache
+
+    Concurrent requests for the same uncached text wait on one Gemini call.
+    """
+    translated_text = lookup_translation(text, input_language, output_language)
+    if translated_text is not None:
+        return translated_text
+    return translation_flight.do(
+        translation_flight_key(text, input_language, output_language),
+        lambda: fetch_translation(text, input_language, output_language),
+        recheck=lambda: lookup_translation(text, input_language, output_language)
+    )
+
+# Gemini client configuration
+GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+GEMINI_CONNECT_TIMEOUT = float(os.getenv('GEMINI_CONNECT_TIMEOUT', '5'))
+GEMINI_READ_TIMEOUT = float(os.getenv('GEMINI_READ_TIMEOUT', '60'))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+GEMINI_BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', '0.5'))
+GEMINI_BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', '20'))
+GEMINI_POOL_SIZE = int(os.getenv('GEMINI_POOL_SIZE', '20'))
+GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5'))
+GEMINI_BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', '30'))
+
+gemini = GeminiClient(
+    GOOGLE_API_KEY,
+    model=GEMINI_MODEL,
+    base_url=GEMINI_API_BASE,
+    connect_timeout=GEMINI_CONNECT_TIMEOUT,
+    read_timeout=GEMINI_READ_TIMEOUT,
+    max_retries=GEMINI_MAX_RETRIES,
+    backoff_base=GEMINI_BACKOFF_BASE,
+    backoff_max=GEMINI_BACKOFF_MAX,
+    pool_size=GEMINI_POOL_SIZE,
+    breaker=CircuitBreaker(GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_RESET)
+)
+
+# Gemini quota scheduling: calls are admitted in priority order ('urgent',
+# 'normal', 'bulk') within GEMINI_RPM requests and GEMINI_TPM estimated tokens
+# per minute (0 = no limit). Requests pick a priority with the "priority" body
+# field and may give "deadlineMs", the longest they are willing to wait for quota.
+# Buckets are per process: each of the WEB_CONCURRENCY workers (gunicorn's worker
+# count) gets an equal share, so set it to the number of workers started
+GEMINI_RPM = int(os.getenv('GEMINI_RPM', '0'))
+GEMINI_TPM = int(os.getenv('GEMINI_TPM', '0'))
+WEB_CONCURRENCY = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+GEMINI_QUEUE_MAX = int(os.getenv('GEMINI_QUEUE_MAX', '200'))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', '30'))  # seconds, without deadlineMs
+GEMINI_THROTTLE_SECONDS = float(os.getenv('GEMINI_THROTTLE_SECONDS', '5'))  # pause after an upstream 429
+
+gemini_queue_wait_seconds = metrics.histogram(
+    'gemini_queue_wait_seconds', 'Time Gemini calls waited for quota', ('priority',))
+gemini_scheduler = GeminiScheduler(
+    GEMINI_RPM / WEB_CONCURRENCY,
+    GEMINI_TPM / WEB_CONCURRENCY,
+    max_queue=GEMINI_QUEUE_MAX,
+    observe_wait=lambda priority, waited: gemini_queue_wait_seconds.observe(waited, priority)
+)
+
+# (priority, deadline) for the Gemini calls of the request being handled
+gemini_request = contextvars.ContextVar('gemini_request', default=('normal', None))
+
+def request_scheduling(data, default_priority='normal'):
+    """Priority and deadline from a request body: returns ((priority, deadline), error)"""
+    data = data if isinstance(data, dict) else {}
+    priority = data.get('priority', default_priority)
+    if priority not in PRIORITIES:
+        return None, ({'error': f"priority must be one of: {', '.join(PRIORITIES)}"}, 400)
+    timeout = GEMINI_QUEUE_TIMEOUT
+    deadline_ms = data.get('deadlineMs')
+    if deadline_ms is not None:
+        # JSON numbers only: no booleans, numeric strings, NaN or Infinity
+        if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) \
+                or not math.isfinite(deadline_ms) or deadline_ms <= 0:
+            return None, ({'error': 'deadlineMs must be a positive number'}, 400)
+        timeout = deadline_ms / 1000
+    return (priority, time.monotonic() + timeout), None
+
+@app.before_request
+def reset_request_context():
+    # Worker threads are reused; don't let a request inherit the previous one's priority or user
+    gemini_request.set(('normal', time.monotonic() + GEMINI_QUEUE_TIMEOUT))
+    request_user.set(ANONYMOUS_USER_ID)
+
+def in_request_context(fn):
+    """fn wrapped to run in a copy of the caller's context, for executor threads"""
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(fn, *args)
+
+def gemini_call_cost(prompt):
+    # The reply is about as long as the text; counting the whole prompt twice errs on the safe side
+    return 2 * estimate_tokens(prompt)
+
+def schedule_gemini_call(prompt):
+    """Wait until the scheduler admits a Gemini call for the current request"""
+    priority, deadline = gemini_request.get()
+    gemini_scheduler.acquire(priority, gemini_call_cost(prompt), deadline)
+
+def note_gemini_error(e):
+    """Back off the whole queue when Gemini says the quota is exhausted anyway"""
+    if isinstance(e, GeminiError) and e.status_code == 429:
+        gemini_scheduler.throttle(GEMINI_THROTTLE_SECONDS)
+
+def indent_lines(text, prefix='        '):
+    return '\n'.join(prefix + line for line in text.splitlines())
+
+def generate_content(prompt, generation_config=None):
+    """Send a single prompt to Gemini generateContent and return the response text"""
+    schedule_gemini_call(prompt)
+    with timed_stage('gemini'):
+        try:
+            return gemini.generate_content(prompt, generation_config)
+        except GeminiError as e:
+            note_gemini_error(e)
+            raise
+
+def stream_content(prompt):
+    """Stream a prompt through Gemini streamGenerateContent, yielding text fragments as they arrive"""
+    schedule_gemini_call(prompt)
+    with timed_stage('gemini_stream'):
+        try:
+            yield from gemini.stream_generate_content(prompt)
+        except GeminiError as e:
+            note_gemini_error(e)
+            raise
+
+# Glossary configuration: <input>.<output>.tsv term tables, see glossary.Glossary.load_dir
+GLOSSARY_DIR = os.getenv('GLOSSARY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'glossary'))
+
+glossary = Glossary()
+if os.path.isdir(GLOSSARY_DIR):
     try:
-        # Use Gemini 2.0 Flash API directly
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GOOGLE_API_KEY}"
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        # Create a prompt for medical translation
-        prompt = f"""Translate the following medical text from {SUPPORTED_LANGUAGES[input_language]} to {SUPPORTED_LANGUAGES[output_language]}. 
+        print(f"✅ Loaded {glossary.load_dir(GLOSSARY_DIR)} glossary terms from {GLOSSARY_DIR}")
+    except Exception as e:
+        print(f"⚠️ Warning: Failed to load glossary: {e}")
+
+def terminology_violations(text, input_language, output_language, translated_text):
+    """Glossary terms and numbers the translation did not keep, or None without a glossary for the pair"""
+    if glossary.table(input_language, output_language) is None:
+        return None
+    return glossary.check(text, translated_text, input_language, output_language)
+
+def build_translation_prompt(text, input_language, output_language, context=None):
+    """Create a prompt for medical translation, with glossary terms and similar past translations
+
+    ``context`` is the text just before ``text`` in a longer document; it is
+    shown to the model but not translated.
+    """
+    preceding = ''
+    if context:
+        preceding = f"""
+        Preceding text, for context only (do not translate it):
+{indent_lines(context)}
+        """
+    required = ''
+    terms = glossary.tag(text, input_language, output_language)
+    if terms:
+        required = f"""
+        Translate these terms exactly as given:
+{indent_lines(glossary.prompt_section(terms))}
+        """
+    references = ''
+    if translation_memory is not None:
+        matches = translation_memory.fuzzy(text, input_language, output_language, TM_MAX_REFERENCES,
+                                           scope=request_user.get())
+        if matches:
+            lines = '\n'.join(f'- "{source}" → "{translation}"' for _, source, translation in matches)
+            references = f"""
+        Reference translations of similar segments translated before (reuse their terminology where it applies):
+{indent_lines(lines)}
+        """
+    return f"""Translate the following medical text from {SUPPORTED_LANGUAGES[input_language]} to {SUPPORTED_LANGUAGES[output_language]}. 
         Maintain medical terminology accuracy and consider healthcare context and medicines or different conditions. Wear your doctor listening hat but do not change the terms or anything:
-        
+        {preceding}{required}{references}
         Text: {text}
         
         Provide only the translation without any additional explanation."""
-        
-        data = {
-            "contents": [
-                {
-                    "parts": [
-                        {
-                            "text": prompt
-                        }
-                    ]
-                }
-            ]
-        }
-        
-        response = requests.post(url, headers=headers, json=data)
-        
-        if response.status_code == 200:
-            result = response.json()
-            # Extract the translated text from the response
-            if 'candidates' in result and len(result['candidates']) > 0:
-                translated_text = result['candidates'][0]['content']['parts'][0]['text']
-                return translated_text.strip()
-            else:
-                raise Exception("No translation result received")
-        else:
-            raise Exception(f"API Error: {response.status_code} - {response.text}")
-            
+
+def gemini_translate(text, input_language, output_language, context=None):
+    try:
+        prompt = build_translation_prompt(text, input_language, output_language, context)
+        return generate_content(prompt).strip()
+    except SchedulerRejected:
+        raise
     except Exception as e:
         raise Exception(f"Translation error: {str(e)}")
 
-def speech_to_text(audio_file):
+# Batch translation configuration
+BATCH_MAX_SEGMENTS = int(os.getenv('BATCH_MAX_SEGMENTS', '200'))
+BATCH_TOKEN_BUDGET = int(os.getenv('BATCH_TOKEN_BUDGET', '3000'))  # estimated source tokens per prompt
+BATCH_MAX_PER_PROMPT = int(os.getenv('BATCH_MAX_PER_PROMPT', '50'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+
+def translate_pack(segments, input_language, output_language):
+    """Translate one pack of segments with a single Gemini call
+
+    Returns a list of (translated_text, error) pairs in input order. Segments
+    the batch response did not cover are retried one by one.
+    """
+    translations = {}
+    if len(segments) > 1:
+        try:
+            terms = [term for segment in segments for term in glossary.tag(segment, input_language, output_language)]
+            prompt = build_batch_prompt(
+                segments, SUPPORTED_LANGUAGES[input_language], SUPPORTED_LANGUAGES[output_language],
+                glossary.prompt_section(terms))
+            response_text = generate_content(prompt, {"responseMimeType": "application/json"})
+            translations = parse_batch_response(response_text, len(segments))
+        except SchedulerRejected:
+            raise
+        except Exception as e:
+            print(f"⚠️ Warning: Batch prompt failed, translating segments individually: {e}")
+
+    results = []
+    for i, segment in enumerate(segments):
+        if i in translations:
+            results.append((translations[i], None))
+            continue
+        try:
+            results.append((gemini_translate(segment, input_language, output_language), None))
+        except SchedulerRejected:
+            raise
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+def translate_batch(segments, input_language, output_language):
+    """Translate many segments for one language pair in as few Gemini calls as fit the budget
+
+    Returns a list of (translated_text, error) pairs in input order.
+    """
+    results = [None] * len(segments)
+    pending = {}  # segment text -> indices still needing translation
+    for index, segment in enumerate(segments):
+        cached = lookup_translation(segment, input_language, output_language)
+        if cached is not None:
+            results[index] = (cached, None)
+        else:
+            pending.setdefault(segment, []).append(index)
+
+    unique = list(pending)
+    packs = [[unique[i] for i in pack]
+             for pack in pack_segments(unique, BATCH_TOKEN_BUDGET, BATCH_MAX_PER_PROMPT)]
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_CONCURRENCY, len(packs)))) as executor:
+        pack_results = executor.map(
+            in_request_context(lambda pack: translate_pack(pack, input_language, output_language)), packs)
+        for pack, translated in zip(packs, pack_results):
+            for segment, (translated_text, error) in zip(pack, translated):
+                if translated_text is not None:
+                    remember_translation(segment, input_language, output_language, translated_text)
+                for index in pending[segment]:
+                    results[index] = (translated_text, error)
+    return results
+
+# Document translation configuration
+DOCUMENT_MAX_CHARS = int(os.getenv('DOCUMENT_MAX_CHARS', '200000'))
+DOCUMENT_CHUNK_TOKENS = int(os.getenv('DOCUMENT_CHUNK_TOKENS', '800'))  # estimated source tokens per chunk
+DOCUMENT_CONTEXT_CHARS = int(os.getenv('DOCUMENT_CONTEXT_CHARS', '300'))  # preceding text shown with each chunk
+DOCUMENT_CONCURRENCY = int(os.getenv('DOCUMENT_CONCURRENCY', '4'))
+
+def translate_document(text, input_language, output_language):
+    """Translate a long document chunk by chunk, in parallel, and reassemble it in order
+
+    Chunks are cached under their text and the context they were translated
+    with, so after an edit only the changed chunks (and the chunks following
+    them, whose context changed) go to Gemini. Returns (translated_text,
+    chunk count, cached chunk count).
+    """
+    chunks = chunk_document(text, DOCUMENT_CHUNK_TOKENS)
+
+    def translate_chunk(index):
+        chunk = chunks[index][0]
+        context = context_tail(chunks[index - 1][0], DOCUMENT_CONTEXT_CHARS) if index else None
+        translated_text = lookup_translation(chunk, input_language, output_language, context)
+        if translated_text is not None:
+            return translated_text, True
+        translated_text = gemini_translate(chunk, input_language, output_language, context)
+        remember_translation(chunk, input_language, output_language, translated_text, context)
+        return translated_text, False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(DOCUMENT_CONCURRENCY, len(chunks)))) as executor:
+        translated = list(executor.map(in_request_context(translate_chunk), range(len(chunks))))
+    translated_text = ''.join(translated_chunk + separator
+                              for (translated_chunk, _), (_, separator) in zip(translated, chunks))
+    return translated_text, len(chunks), sum(1 for _, cached in translated if cached)
+
+# Speech-to-text configuration: 'google' or 'fake' (local stand-in, see fakes/speech.py)
+SPEECH_BACKEND = os.getenv('SPEECH_BACKEND', 'google')
+
+SPEECH_KEEPALIVE_MS = int(os.getenv('SPEECH_KEEPALIVE_MS', '30000'))
+SPEECH_CONNECT_TIMEOUT = float(os.getenv('SPEECH_CONNECT_TIMEOUT', '10'))
+
+def new_speech_client():
+    """Create a speech client for the configured backend
+
+    The real client gets a gRPC channel with keep-alive pings so an idle
+    connection survives between requests instead of being re-established.
+    """
+    if SPEECH_BACKEND == 'fake':
+        from fakes.speech import FakeSpeechClient
+        return FakeSpeechClient.from_env()
+
+    import grpc
+    from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+    channel = SpeechGrpcTransport.create_channel(
+        'speech.googleapis.com:443',
+        options=[
+            ('grpc.keepalive_time_ms', SPEECH_KEEPALIVE_MS),
+            ('grpc.keepalive_timeout_ms', 10000),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+        ]
+    )
     try:
-        # Initialize the Google Cloud Speech client
-        client = speech.SpeechClient()
+        # Pay the TLS handshake here rather than inside the first recognition
+        grpc.channel_ready_future(channel).result(timeout=SPEECH_CONNECT_TIMEOUT)
+    except grpc.FutureTimeoutError:
+        print("⚠️ Warning: Speech channel not ready yet; it will connect on first use")
+    return speech.SpeechClient(transport=SpeechGrpcTransport(channel=channel))
+
+# Process-wide speech client; gRPC channels must not cross a fork, so each
+# worker process builds its own on first use
+_speech_client = None
+_speech_client_pid = None
+_speech_client_lock = threading.Lock()
+_speech_timings_lock = threading.Lock()
+speech_timings = {
+    'client_setups': 0,
+    'setup_seconds': 0.0,
+    'recognitions': 0,
+    'recognition_seconds': 0.0,
+    'first_result_seconds': 0.0
+}
 
-        # Read the audio file
-        with open(audio_file, "rb") as audio_file:
-            content = audio_file.read()
-
-        # Configure the audio and recognition settings
-        audio = speech.RecognitionAudio(content=content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000,
-            language_code="en-US",  # This will be overridden by the input_language parameter
-        )
+def get_speech_client():
+    """Return the shared speech client, creating it lazily in this process"""
+    global _speech_client, _speech_client_pid
+    if _speech_client is None or _speech_client_pid != os.getpid():
+        with _speech_client_lock:
+            if _speech_client is None or _speech_client_pid != os.getpid():
+                started = time.perf_counter()
+                _speech_client = new_speech_client()
+                _speech_client_pid = os.getpid()
+                elapsed = time.perf_counter() - started
+                with _speech_timings_lock:
+                    speech_timings['client_setups'] += 1
+                    speech_timings['setup_seconds'] += elapsed
+                print(f"🎙️ Speech client ready in {elapsed:.3f}s (pid {_speech_client_pid})")
+    return _speech_client
+
+def timed_recognition(results):
+    """Pass recognition results through, recording time to first result and total time"""
+    started = time.perf_counter()
+    first_result = None
+    try:
+        with timed_stage('speech'):
+            for result in results:
+                if first_result is None:
+                    first_result = time.perf_counter() - started
+                yield result
+    finally:
+        with _speech_timings_lock:
+            speech_timings['recognitions'] += 1
+            speech_timings['recognition_seconds'] += time.perf_counter() - started
+            speech_timings['first_result_seconds'] += first_result or 0.0
+
+def speech_stats():
+    with _speech_timings_lock:
+        timings = dict(speech_timings)
+    recognitions = timings['recognitions']
+    setups = timings['client_setups']
+    return {
+        **timings,
+        'avg_setup_seconds': round(timings['setup_seconds'] / setups, 6) if setups else 0.0,
+        'avg_recognition_seconds': round(timings['recognition_seconds'] / recognitions, 6) if recognitions else 0.0,
+        'avg_first_result_seconds': round(timings['first_result_seconds'] / recognitions, 6) if recognitions else 0.0
+    }
 
-        # Perform the transcription
-        response = client.recognize(config=config, audio=audio)
-        
-        # Get the transcribed text
-        text = ""
-        for result in response.results:
-            text += result.alternatives[0].transcript
+def transcribe_stream(chunks, language_code, interim_results=True):
+    """Streaming recognition on the shared client, with timing"""
+    return timed_recognition(streaming_transcribe(get_speech_client(), chunks, language_code, interim_results))
+
+def transcribe_text(chunks, language_code):
+    """Full transcript (final results only) on the shared client"""
+    return ''.join(result['transcript']
+                   for result in transcribe_stream(chunks, language_code, interim_results=False)
+                   if result['is_final'])
 
-        return text
+def speech_to_text(audio_file, language_code="en-US"):
+    try:
+        # Stream the audio file to the recognizer chunk by chunk
+        with open(audio_file, "rb") as audio_file:
+            return transcribe_text(iter_chunks(audio_file), language_code)
     except Exception as e:
         raise Exception(f"Speech recognition error: {str(e)}")
 
+# Audio store configuration
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'translation_audio'))
+AUDIO_CACHE_MAX_MB = int(os.getenv('AUDIO_CACHE_MAX_MB', '512'))
+AUDIO_SWEEP_INTERVAL = int(os.getenv('AUDIO_SWEEP_INTERVAL', '300'))  # seconds
+
+audio_store = AudioStore(AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_MB * 1024 * 1024)
+audio_store.start_sweeper(AUDIO_SWEEP_INTERVAL)
+if phrase_pack is not None and os.path.isdir(phrase_pack.audio_dir):
+    audio_store.attach(phrase_pack.audio_dir)
+
+# 'fake' renders placeholder audio locally (see fakes.tts), for benchmarks
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'gtts')
+
+fake_tts = None
+if TTS_BACKEND == 'fake':
+    from fakes.tts import FakeTTS
+    fake_tts = FakeTTS.from_env()
+
+def synthesize_speech(text, language, path):
+    """Render text to an MP3 file at path with gTTS"""
+    with timed_stage('tts'):
+        if fake_tts is not None:
+            fake_tts.synthesize(text, language, path)
+            return
+        tts = gTTS(text=text, lang=language, slow=False)
+        tts.save(path)
+
 def text_to_speech(text, language):
+    """Return the audio id for text, synthesizing it only if it is not stored yet"""
     try:
-        tts = gTTS(text=text, lang=language, slow=False)
-        # Create a temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-        tts.save(temp_file.name)
-        return temp_file.name
+        audio_id, _ = audio_store.get_or_create(text, language, synthesize_speech)
+        return audio_id
     except Exception as e:
         raise Exception(f"Text-to-speech error: {str(e)}")
 
+# Background TTS configuration
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', '2'))
+TTS_QUEUE_SIZE = int(os.getenv('TTS_QUEUE_SIZE', '100'))
+TTS_WAIT_TIMEOUT = float(os.getenv('TTS_WAIT_TIMEOUT', '10'))  # seconds /audio waits for a pending job
+AUDIO_MAX_AGE = int(os.getenv('AUDIO_MAX_AGE', str(365 * 24 * 3600)))  # browser cache lifetime of /audio
+# Hand /audio files to a fronting nginx/Apache with X-Sendfile; otherwise gunicorn
+# sends whole files with sendfile(2) through wsgi.file_wrapper
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+
+# Always shared: a worker rendering a job another worker queued must not repeat a render in progress
+tts_flight = SingleFlight('tts', store=kv_store, lock_ttl=SINGLE_FLIGHT_LOCK_TTL, wait_timeout=SINGLE_FLIGHT_WAIT)
+# Job statuses are published to the KV store so every worker can answer /audio polls for them
+tts_pool = TTSWorkerPool(audio_store, synthesize_speech, workers=TTS_WORKERS, max_queue=TTS_QUEUE_SIZE,
+                         flight=tts_flight, job_store=kv_store)
+
 def call_gemini(prompt, api_key):
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    data = {
-        "contents": [
-            {
-                "parts": [
-                    {
-                        "text": prompt
-                    }
-                ]
-            }
-        ]
-    }
-    response = requests.post(url, headers=headers, json=data)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print("Error:", response.status_code, response.text)
+    try:
+        schedule_gemini_call(prompt)
+        return gemini.generate(GeminiClient.build_payload(prompt), api_key=api_key)
+    except (GeminiError, SchedulerRejected) as e:
+        note_gemini_error(e)
+        print("Error:", e)
         return None
 
+def write_history_rows(rows):
+    """Insert (date, original, translated, input lang, output lang, audio, user id) rows in one transaction"""
+    with timed_stage('db_insert'), get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(f'''
+            INSERT INTO chat_history (date, original_text, translated_text, input_language, output_language, audio_path, user_id)
+            VALUES ({', '.join([SQL_PARAM] * 7)})
+        ''', rows)
+
+# History write mode: 'async' (write-behind batches), 'durable' (batched, but the
+# request waits for the commit) or 'sync' (one transaction per request)
+HISTORY_WRITE_MODE = os.getenv('HISTORY_WRITE_MODE', 'async')
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', '200'))
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', '0.05'))  # seconds
+HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', '10000'))
+HISTORY_READ_WAIT = float(os.getenv('HISTORY_READ_WAIT', '2'))  # seconds a history read waits for the user's queued rows
+
+def log_dropped_history_rows(rows, error):
+    """One line per lost history row, without its texts"""
+    for date, _, _, input_language, output_language, audio_id, user_id in rows:
+        print(f"⚠️ Warning: Dropped history row of user {user_id} at {date} "
+              f"({input_language}->{output_language}, audio {audio_id}): {error}")
+
+history_writer = None
+if HISTORY_WRITE_MODE != 'sync':
+    history_writer = HistoryWriter(
+        write_history_rows,
+        batch_size=HISTORY_BATCH_SIZE,
+        flush_interval=HISTORY_FLUSH_INTERVAL,
+        max_queue=HISTORY_QUEUE_SIZE,
+        durable=HISTORY_WRITE_MODE == 'durable',
+        on_drop=log_dropped_history_rows,
+        key=lambda row: row[6]
+    )
+    # Flush queued rows when the worker exits
+    atexit.register(history_writer.close)
+
+def insert_history_rows(rows):
+    """Record history rows through the configured write mode"""
+    with timed_stage('history_submit'):
+        if history_writer is not None:
+            history_writer.submit(rows)
+        else:
+            write_history_rows(rows)
+    if translation_memory is not None:
+        for _, original_text, translated_text, input_language, output_language, _, user_id in rows:
+            translation_memory.add(original_text, translated_text, input_language, output_language, user_id)
+
+def wait_for_own_history(user_id):
+    """Let a history read see the rows this user just submitted (read-your-writes)"""
+    if history_writer is not None:
+        with timed_stage('history_read_wait'):
+            history_writer.wait_written(user_id, HISTORY_READ_WAIT)
+
+def parse_translation_request(data):
+    """Validate a /translate body: returns ((text, input_language, output_language), error)
+
+    error is a (body, status) pair so Flask and ASGI views can both render it.
+    """
+    data = data or {}
+    text = data.get('text')
+    input_language = data.get('inputLanguage')
+    output_language = data.get('outputLanguage')
+
+    if not text or not input_language or not output_language:
+        return None, ({'error': 'Missing required fields'}, 400)
+
+    if input_language not in SUPPORTED_LANGUAGES or output_language not in SUPPORTED_LANGUAGES:
+        return None, ({'error': 'Unsupported language'}, 400)
+
+    return (text, input_language, output_language), None
+
+def complete_translation(text, input_language, output_language, translated_text, audio=True,
+                         user_id=ANONYMOUS_USER_ID):
+    """Queue audio and record history for a finished translation; returns the /translate response body"""
+    body = {'translated_text': translated_text}
+    audio_id = None
+    if audio:
+        # Queue audio generation; the client fetches it from /audio/<audio_id>
+        audio_id = tts_pool.submit(translated_text, output_language)
+        audio_status, _ = tts_pool.status(audio_id)
+        body.update({
+            'audio_path': audio_id,
+            'audio_url': f'/audio/{audio_id}',
+            'audio_status': audio_status
+        })
+
+    # Store in database
+    insert_history_rows([
+        (datetime.now().isoformat(), text, translated_text, input_language, output_language, audio_id, user_id)
+    ])
+
+    violations = terminology_violations(text, input_language, output_language, translated_text)
+    if violations is not None:
+        body['glossary_violations'] = violations
+    return body
+
 @app.route('/translate', methods=['POST'])
 def translate():
+    retry_after = check_rate_limit(translate_ip_limiter, request.remote_addr)
+    if retry_after is not None:
+        return rate_limited_response(retry_after)
     try:
+        user_id, error = resolve_user(bearer_token())
+        if error:
+            return jsonify(error[0]), error[1]
+        request_user.set(user_id)
         data = request.get_json()
-        text = data.get('text')
+        fields, error = parse_translation_request(data)
+        if not error:
+            scheduling, error = request_scheduling(data)
+        if error:
+            return jsonify(error[0]), error[1]
+        text, input_language, output_language = fields
+        gemini_request.set(scheduling)
+
+        translated_text = translate_text(text, input_language, output_language)
+        return jsonify(complete_translation(text, input_language, output_language, translated_text,
+                                            user_id=user_id))
+    except SchedulerRejected as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/translate/document', methods=['POST'])
+def translate_document_route():
+    """Translate a long document (e.g. a discharge summary) in parallel chunks"""
+    try:
+        user_id, error = resolve_user(bearer_token())
+        if error:
+            return jsonify(error[0]), error[1]
+        request_user.set(user_id)
+        data = request.get_json() or {}
+        fields, error = parse_translation_request(data)
+        if not error:
+            scheduling, error = request_scheduling(data)
+        if error:
+            return jsonify(error[0]), error[1]
+        text, input_language, output_language = fields
+        gemini_request.set(scheduling)
+
+        if len(text) > DOCUMENT_MAX_CHARS:
+            return jsonify({'error': f'Document too long (max {DOCUMENT_MAX_CHARS} characters)'}), 400
+
+        translated_text, chunk_count, cached_count = translate_document(text, input_language, output_language)
+        body = complete_translation(text, input_language, output_language, translated_text,
+                                    audio=bool(data.get('audio', False)), user_id=user_id)
+        body['chunks'] = chunk_count
+        body['cached_chunks'] = cached_count
+        return jsonify(body)
+    except SchedulerRejected as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def sse_event(event, payload):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route('/translate/stream', methods=['POST'])
+def translate_stream():
+    """Translate with server-sent events: chunk events as Gemini streams, then translation, audio and done"""
+    user_id, error = resolve_user(bearer_token())
+    if error:
+        return jsonify(error[0]), error[1]
+    request_user.set(user_id)
+    data = request.get_json()
+    fields, error = parse_translation_request(data)
+    if not error:
+        scheduling, error = request_scheduling(data)
+    if error:
+        return jsonify(error[0]), error[1]
+    text, input_language, output_language = fields
+    gemini_request.set(scheduling)
+
+    def generate():
+        try:
+            translated_text = lookup_translation(text, input_language, output_language)
+            if translated_text is not None:
+                yield sse_event('chunk', {'text': translated_text})
+            else:
+                pieces = []
+                try:
+                    for piece in stream_content(build_translation_prompt(text, input_language, output_language)):
+                        pieces.append(piece)
+                        yield sse_event('chunk', {'text': piece})
+                except Exception as e:
+                    raise Exception(f"Translation error: {str(e)}")
+                translated_text = ''.join(pieces).strip()
+                if not translated_text:
+                    raise Exception("Translation error: No translation result received")
+                remember_translation(text, input_language, output_language, translated_text)
+            translation_event = {'translated_text': translated_text}
+            violations = terminology_violations(text, input_language, output_language, translated_text)
+            if violations is not None:
+                translation_event['glossary_violations'] = violations
+            yield sse_event('translation', translation_event)
+
+            audio_id = tts_pool.submit(translated_text, output_language)
+            audio_status, audio_error = tts_pool.ensure(audio_id, TTS_WAIT_TIMEOUT)
+            audio_event = {'audio_path': audio_id, 'audio_url': f'/audio/{audio_id}', 'audio_status': audio_status}
+            if audio_error:
+                audio_event['audio_error'] = audio_error
+            yield sse_event('audio', audio_event)
+
+            insert_history_rows([
+                (datetime.now().isoformat(), text, translated_text, input_language, output_language, audio_id, user_id)
+            ])
+            yield sse_event('done', {})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/translate/batch', methods=['POST'])
+def translate_batch_route():
+    try:
+        user_id, error = resolve_user(bearer_token())
+        if error:
+            return jsonify(error[0]), error[1]
+        request_user.set(user_id)
+        data = request.get_json()
+        segments = data.get('segments')
         input_language = data.get('inputLanguage')
         output_language = data.get('outputLanguage')
+        with_audio = bool(data.get('audio', False))
 
-        if not text or not input_language or not output_language:
+        if not segments or not input_language or not output_language:
             return jsonify({'error': 'Missing required fields'}), 400
 
+        if not isinstance(segments, list) or not all(isinstance(segment, str) and segment.strip() for segment in segments):
+            return jsonify({'error': 'segments must be a list of non-empty strings'}), 400
+
+        if len(segments) > BATCH_MAX_SEGMENTS:
+            return jsonify({'error': f'Too many segments (max {BATCH_MAX_SEGMENTS})'}), 400
+
         if input_language not in SUPPORTED_LANGUAGES or output_language not in SUPPORTED_LANGUAGES:
             return jsonify({'error': 'Unsupported language'}), 400
 
-        translated_text = translate_text(text, input_language, output_language)
-        
-        # Generate audio for translated text
-        audio_path = text_to_speech(translated_text, output_language)
-
-        # Store in database
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            if DATABASE_TYPE == 'supabase':
-                cursor.execute('''
-                    INSERT INTO chat_history (date, original_text, translated_text, input_language, output_language, audio_path)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                ''', (datetime.now().isoformat(), text, translated_text, input_language, output_language, audio_path))
-            else:
-                cursor.execute('''
-                    INSERT INTO chat_history (date, original_text, translated_text, input_language, output_language, audio_path)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (datetime.now().isoformat(), text, translated_text, input_language, output_language, audio_path))
-            conn.commit()
+        # Batches are bulk work unless the caller says otherwise
+        scheduling, error = request_scheduling(data, default_priority='bulk')
+        if error:
+            return jsonify(error[0]), error[1]
+        gemini_request.set(scheduling)
+
+        now = datetime.now().isoformat()
+        results = []
+        rows = []
+        for index, (segment, (translated_text, error)) in enumerate(
+                zip(segments, translate_batch(segments, input_language, output_language))):
+            if error is not None:
+                results.append({'index': index, 'error': error})
+                continue
+            result = {'index': index, 'translated_text': translated_text}
+            violations = terminology_violations(segment, input_language, output_language, translated_text)
+            if violations is not None:
+                result['glossary_violations'] = violations
+            audio_id = None
+            if with_audio:
+                audio_id = tts_pool.submit(translated_text, output_language)
+                result['audio_path'] = audio_id
+                result['audio_url'] = f'/audio/{audio_id}'
+            results.append(result)
+            rows.append((now, segment, translated_text, input_language, output_language, audio_id, user_id))
+
+        if rows:
+            insert_history_rows(rows)
 
         return jsonify({
-            'translated_text': translated_text,
-            'audio_path': audio_path
+            'results': results,
+            'translated': len(rows),
+            'failed': len(results) - len(rows)
         })
+    except SchedulerRejected as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/speech-to-text', methods=['POST'])
-def handle_speech_to_text():
-    try:
+def is_raw_audio_upload():
+    return request.mimetype.startswith('audio/') or request.mimetype == 'application/octet-stream'
+
+def get_speech_upload():
+    """Validate a speech upload: returns (audio stream, input language, error response)
+
+    The audio is either the raw request body (Content-Type audio/* or
+    application/octet-stream, language in the inputLanguage query
+    parameter), which is read straight off the connection, or an 'audio'
+    multipart field, which werkzeug spools to memory or a temp file first.
+    The caller closes the stream.
+    """
+    if is_raw_audio_upload():
+        if request.content_length == 0:
+            return None, None, (jsonify({'error': 'No audio file provided'}), 400)
+        audio = request.stream
+        input_language = request.args.get('inputLanguage', 'en')
+    else:
         if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file provided'}), 400
-
-        audio_file = request.files['audio']
+            return None, None, (jsonify({'error': 'No audio file provided'}), 400)
+        audio = request.files['audio'].stream
         input_language = request.form.get('inputLanguage', 'en')
 
-        if input_language not in SUPPORTED_LANGUAGES:
-            return jsonify({'error': 'Unsupported language'}), 400
+    if input_language not in SUPPORTED_LANGUAGES:
+        audio.close()
+        return None, None, (jsonify({'error': 'Unsupported language'}), 400)
 
-        # Save the audio file temporarily
-        temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        audio_file.save(temp_audio.name)
-        
-        # Convert speech to text using Google Cloud Speech-to-Text
-        client = speech.SpeechClient()
-        
-        # Read the audio file
-        with open(temp_audio.name, "rb") as audio_file:
-            content = audio_file.read()
-
-        # Configure the audio and recognition settings
-        audio = speech.RecognitionAudio(content=content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000,
-            language_code=input_language,  # Use the input language from the request
-        )
+    return audio, input_language, None
+
+@app.route('/speech-to-text', methods=['POST'])
+def handle_speech_to_text():
+    try:
+        audio, input_language, error = get_speech_upload()
+        if error:
+            return error
+
+        # Convert speech to text using Google Cloud Speech-to-Text streaming recognition,
+        # feeding the upload in chunks so long recordings are not limited to ~1 minute
+        with closing(audio):
+            text = transcribe_text(iter_chunks(audio), input_language)
 
-        # Perform the transcription
-        response = client.recognize(config=config, audio=audio)
-        
-        # Get the transcribed text
-        text = ""
-        for result in response.results:
-            text += result.alternatives[0].transcript
-        
-        # Clean up temporary file
-        os.unlink(temp_audio.name)
-        
         return jsonify({'text': text})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/audio/<path:filename>')
-def get_audio(filename):
+@app.route('/speech-to-text/stream', methods=['POST'])
+def handle_speech_to_text_stream():
+    """Transcribe with server-sent events: partial events as results arrive, then final"""
+    audio, input_language, error = get_speech_upload()
+    if error:
+        return error
+
+    def generate():
+        try:
+            finals = []
+            for result in transcribe_stream(iter_chunks(audio), input_language):
+                if result['is_final']:
+                    finals.append(result['transcript'])
+                yield sse_event('partial', {
+                    'transcript': result['transcript'],
+                    'is_final': result['is_final'],
+                    'stability': result['stability']
+                })
+            yield sse_event('final', {'text': ''.join(finals)})
+        except Exception as e:
+            yield sse_event('error', {'error': f"Speech recognition error: {str(e)}"})
+        finally:
+            audio.close()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/audio/<audio_id>')
+def get_audio(audio_id):
+    path = audio_store.get(audio_id)
+    if path is None:
+        # Wait for a queued job, or render a deferred/failed one on demand
+        status, error = tts_pool.ensure(audio_id, TTS_WAIT_TIMEOUT)
+        if status == UNKNOWN:
+            return jsonify({'error': 'Audio not found'}), 404
+        if status == PENDING:
+            return jsonify({'audio_id': audio_id, 'status': status}), 202, {'Retry-After': '1',
+                                                                            'Cache-Control': 'no-store'}
+        if status != READY:
+            return jsonify({'audio_id': audio_id, 'status': status, 'error': error}), 500
+        path = audio_store.get(audio_id)
+        if path is None:
+            return jsonify({'error': 'Audio not found'}), 404
     try:
-        return send_file(filename, mimetype='audio/mpeg')
+        # Audio ids are content hashes, so the id is a strong ETag and the file never
+        # changes; conditional=True answers If-None-Match and Range (seeking) requests
+        response = send_file(path, mimetype='audio/mpeg', conditional=True, etag=audio_id,
+                             max_age=AUDIO_MAX_AGE)
     except Exception as e:
         return jsonify({'error': str(e)}), 404
+    response.cache_control.immutable = True
+    # Advertise seeking up front; werkzeug only sets this on range responses
+    response.headers['Accept-Ranges'] = 'bytes'
+    # The store touches mtime as its LRU clock, so it is no modification date
+    response.headers.pop('Last-Modified', None)
+    return response
+
+@app.route('/audio/<audio_id>/status')
+def get_audio_status(audio_id):
+    status, error = tts_pool.status(audio_id)
+    result = {'audio_id': audio_id, 'status': status}
+    if error:
+        result['error'] = error
+    return jsonify(result), 404 if status == UNKNOWN else 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'translation': translation_cache.stats(),
+        'translation_memory': translation_memory.stats() if translation_memory is not None else None,
+        'phrase_pack': phrase_pack.stats() if phrase_pack is not None else None,
+        'glossary': glossary.stats(),
+        'audio': audio_store.stats(),
+        'tts_queue': tts_pool.stats(),
+        'kv_store': kv_store.stats(),
+        'single_flight': {flight.name: flight.stats() for flight in (translation_flight, tts_flight)}
+    })
+
+def gemini_samples(client, name):
+    """Upstream counters of a Gemini client, labelled with the client name"""
+    stats = client.stats()
+    labels = {'client': name}
+    for key in ('requests', 'retries', 'errors', 'rate_limited', 'short_circuited'):
+        yield f'gemini_{key}_total', 'counter', f'Gemini {key.replace("_", " ")}', labels, stats[key]
+    yield ('gemini_circuit_open', 'gauge', 'Whether the Gemini circuit breaker is open', labels,
+           int(stats['circuit']['state'] != 'closed'))
+
+@metrics.collector
+def component_samples():
+    """Cache, pool, queue and upstream figures from the components' own stats"""
+    caches = [('translation', translation_cache.memory.stats()), ('audio', audio_store.stats())]
+    if translation_cache.store is not None:
+        caches.append(('translation_persistent', translation_cache.store.stats()))
+    if token_verifier is not None:
+        caches.append(('auth_tokens', token_verifier.stats()['cache']))
+    if phrase_pack is not None:
+        caches.append(('phrase_pack', phrase_pack.stats()))
+    for name, stats in caches:
+        yield 'cache_hits_total', 'counter', 'Cache lookups that hit', {'cache': name}, stats['hits']
+        yield 'cache_misses_total', 'counter', 'Cache lookups that missed', {'cache': name}, stats['misses']
+
+    pool = db_pool.stats()
+    labels = {'pool': pool['name']}
+    yield 'db_pool_in_use', 'gauge', 'Connections checked out', labels, pool['in_use']
+    if pool['kind'] == 'shared':
+        yield 'db_pool_max_size', 'gauge', 'Connection pool size limit', labels, pool['max_size']
+        yield 'db_pool_idle', 'gauge', 'Idle pooled connections', labels, pool['idle']
+        yield 'db_pool_waiting', 'gauge', 'Requests waiting for a connection', labels, pool['waiting']
+        yield 'db_pool_waits_total', 'counter', 'Checkouts that had to wait', labels, pool['waits']
+        yield 'db_pool_timeouts_total', 'counter', 'Checkouts that timed out', labels, pool['timeouts']
+        yield ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection', labels,
+               pool['wait_time_total'])
+
+    yield from gemini_samples(gemini, 'sync')
+
+    scheduler = gemini_scheduler.stats()
+    for priority in PRIORITIES:
+        yield ('gemini_queue_depth', 'gauge', 'Gemini calls waiting for quota', {'priority': priority},
+               scheduler['queue_depth'][priority])
+        for outcome, count in scheduler['counters'][priority].items():
+            yield ('gemini_scheduler_calls_total', 'counter', 'Gemini calls admitted or rejected (deadline, shed, queue_full)',
+                   {'priority': priority, 'outcome': outcome}, count)
+
+    for flight in (translation_flight, tts_flight):
+        stats = flight.stats()
+        for outcome in ('calls', 'coalesced', 'shared_from_worker', 'lock_timeouts'):
+            yield ('single_flight_requests_total', 'counter',
+                   'Requests that called upstream, or shared another request\'s call',
+                   {'flight': flight.name, 'outcome': outcome}, stats[outcome])
+
+    tts = tts_pool.stats()
+    yield 'tts_queue_depth', 'gauge', 'Audio jobs waiting for a TTS worker', {}, tts['queue_depth']
+    yield 'tts_failures_total', 'counter', 'Audio jobs that failed', {}, tts['failures']
+    if history_writer is not None:
+        writer = history_writer.stats()
+        yield 'history_queue_depth', 'gauge', 'History rows waiting to be written', {}, writer['queued']
+        yield 'history_rows_written_total', 'counter', 'History rows written', {}, writer['rows_written']
+        yield 'history_rows_dropped_total', 'counter', 'History rows dropped after failed writes', {}, writer['rows_dropped']
+
+metrics.ratio('cache_hit_ratio', 'Share of cache lookups that hit', 'cache_hits_total',
+              ('cache_hits_total', 'cache_misses_total'))
+metrics.ratio('db_pool_utilization', 'Share of the connection pool checked out', 'db_pool_in_use',
+              ('db_pool_max_size',))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/languages', methods=['GET'])
 def get_languages():
     return jsonify(SUPPORTED_LANGUAGES)
 
+# History pagination configuration
+HISTORY_DEFAULT_LIMIT = int(os.getenv('HISTORY_DEFAULT_LIMIT', '50'))
+HISTORY_MAX_LIMIT = int(os.getenv('HISTORY_MAX_LIMIT', '500'))
+
+def encode_history_cursor(date, row_id):
+    """Opaque cursor for the (date, id) keyset position of the last returned row"""
+    raw = json.dumps([date, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_history_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(date, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return date, row_id
+
+def encode_search_cursor(offset):
+    """Opaque cursor for the rank position after the last returned search result"""
+    return base64.urlsafe_b64encode(json.dumps([offset]).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_search_cursor(cursor):
+    try:
+        (offset,) = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def history_entry(row):
+    return {
+        'id': row[0],
+        'date': row[1],
+        'original_text': row[2],
+        'translated_text': row[3],
+        'input_language': row[4],
+        'output_language': row[5],
+        'audio_path': row[6]
+    }
+
+def next_page_query(next_cursor):
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return urlencode(args)
+
 @app.route('/history', methods=['GET'])
 def get_history():
     try:
+        user_id, error = resolve_user(bearer_token())
+        if error:
+            return jsonify(error[0]), error[1]
+        limit = request.args.get('limit', HISTORY_DEFAULT_LIMIT, type=int)
+        if limit is None or limit < 1 or limit > HISTORY_MAX_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {HISTORY_MAX_LIMIT}'}), 400
+        wait_for_own_history(user_id)
+
+        conditions = [f'user_id = {SQL_PARAM}']
+        params = [user_id]
+        input_language = request.args.get('inputLanguage')
+        output_language = request.args.get('outputLanguage')
+        if input_language:
+            conditions.append(f'input_language = {SQL_PARAM}')
+            params.append(input_language)
+        if output_language:
+            conditions.append(f'output_language = {SQL_PARAM}')
+            params.append(output_language)
+
+        for arg, operator in (('since', '>='), ('until', '<')):
+            value = request.args.get(arg)
+            if value:
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    return jsonify({'error': f'{arg} must be an ISO 8601 date'}), 400
+                conditions.append(f'date {operator} {SQL_PARAM}')
+                params.append(value)
+
+        cursor_arg = request.args.get('cursor')
+        if cursor_arg:
+            try:
+                after_date, after_id = decode_history_cursor(cursor_arg)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            conditions.append(f'(date < {SQL_PARAM} OR (date = {SQL_PARAM} AND id < {SQL_PARAM}))')
+            params.extend([after_date, after_date, after_id])
+
+        where = f"WHERE {' AND '.join(conditions)}"
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM chat_history ORDER BY date DESC')
+            # Fetch one extra row to know whether there is a next page
+            cursor.execute(f'''
+                SELECT id, date, original_text, translated_text, input_language, output_language, audio_path
+                FROM chat_history {where}
+                ORDER BY date DESC, id DESC
+                LIMIT {limit + 1}
+            ''', params)
             rows = cursor.fetchall()
-            history = [
-                {
-                    'id': row[0],
-                    'date': row[1],
-                    'original_text': row[2],
-                    'translated_text': row[3],
-                    'input_language': row[4],
-                    'output_language': row[5],
-                    'audio_path': row[6]
-                } for row in rows
-            ]
-        return jsonify(history)
+        history = [history_entry(row) for row in rows[:limit]]
+
+        response = jsonify(history)
+        if len(rows) > limit:
+            next_cursor = encode_history_cursor(history[-1]['date'], history[-1]['id'])
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.base_url}?{next_page_query(next_cursor)}>; rel="next"'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history/search', methods=['GET'])
+def search_history():
+    """Full-text search over the user's original and translated texts, best match first"""
+    try:
+        user_id, error = resolve_user(bearer_token())
+        if error:
+            return jsonify(error[0]), error[1]
+        if not history_search_ready:
+            return jsonify({'error': 'History search is not available'}), 503
+        terms = search_terms(request.args.get('q', ''))
+        if not terms:
+            return jsonify({'error': 'q must contain at least one word'}), 400
+        limit = request.args.get('limit', HISTORY_DEFAULT_LIMIT, type=int)
+        if limit is None or limit < 1 or limit > HISTORY_MAX_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {HISTORY_MAX_LIMIT}'}), 400
+        offset = 0
+        if request.args.get('cursor'):
+            try:
+                offset = decode_search_cursor(request.args['cursor'])
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+        wait_for_own_history(user_id)
+
+        conditions = [f'h.user_id = {SQL_PARAM}']
+        values = [user_id]
+        for arg, column in (('inputLanguage', 'input_language'), ('outputLanguage', 'output_language')):
+            if request.args.get(arg):
+                conditions.append(f'h.{column} = {SQL_PARAM}')
+                values.append(request.args[arg])
+
+        # Fetch one extra row to know whether there is a next page
+        sql, params = search_query(DB_DIALECT, SQL_PARAM, match_expression(DB_DIALECT, terms),
+                                   conditions, values, limit + 1, offset)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        response = jsonify([history_entry(row) for row in rows[:limit]])
+        if len(rows) > limit:
+            next_cursor = encode_search_cursor(offset + limit)
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.base_url}?{next_page_query(next_cursor)}>; rel="next"'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -646,6 +2080,11 @@ def resend_otp():
         if not email:
             return jsonify({'error': 'Email is required'}), 400
 
+        retry_after = (check_rate_limit(otp_ip_limiter, request.remote_addr)
+                       or check_rate_limit(otp_email_limiter, email.strip().lower()))
+        if retry_after is not None:
+            return rate_limited_response(retry_after)
+
         # Generate new OTP
         otp = generate_otp()
         store_otp(email, otp)
@@ -663,15 +2102,23 @@ def resend_otp():
 def logout():
     try:
         # Get the access token from headers
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            # Sign out from Supabase
-            supabase.auth.sign_out()
-            return jsonify({'message': 'Logged out successfully'})
-        else:
+        token = bearer_token()
+        if not token:
             return jsonify({'error': 'No valid token provided'}), 401
 
+        # Revoke the session locally so every worker rejects its tokens until they expire
+        # (an expired or already revoked token needs nothing revoked, so logout is idempotent)
+        if token_verifier is not None:
+            try:
+                token_verifier.revoke(token)
+            except TokenError as e:
+                return jsonify({'error': str(e)}), 401
+
+        # Sign out from Supabase
+        if supabase:
+            supabase.auth.sign_out()
+        return jsonify({'message': 'Logged out successfully'})
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -689,21 +2136,13 @@ def update_user():
 
         # Find user by email
         try:
-            # First try to get the user from the token in the Authorization header
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-                # Get user from token
-                user_response = supabase.auth.get_user(token)
-                if user_response and hasattr(user_response, 'user'):
-                    user = user_response.user
-                    user_id = user.id
-                else:
-                    return jsonify({'error': 'Invalid token or user not found.'}), 401
-            else:
-                # If no token, try to find user by email using sign_in method
-                # This is a fallback and less secure approach
+            # Get the user from the token in the Authorization header
+            token = bearer_token()
+            if not token:
                 return jsonify({'error': 'Authorization token required.'}), 401
+            user_id = verify_access_token(token)['sub']
+        except TokenError as auth_error:
+            return jsonify({'error': str(auth_error)}), 401
         except Exception as auth_error:
             return jsonify({'error': f'Authentication error: {str(auth_error)}'}), 401
 
@@ -731,19 +2170,24 @@ def test_database():
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT version()')
+            if DATABASE_TYPE in ['local', 'sqlite_cloud']:
+                cursor.execute('SELECT sqlite_version()')
+            else:
+                cursor.execute('SELECT version()')
             version = cursor.fetchone()
             return jsonify({
                 'status': 'success',
                 'message': 'Database connection successful',
                 'database_type': DATABASE_TYPE,
-                'version': version[0] if version else 'Unknown'
+                'version': version[0] if version else 'Unknown',
+                'pool': db_pool.stats()
             })
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Database connection failed: {str(e)}',
             'database_type': DATABASE_TYPE,
+            'pool': db_pool.stats(),
             'config': {
                 'host': DB_HOST if 'DB_HOST' in globals() else 'N/A',
                 'port': DB_PORT if 'DB_PORT' in globals() else 'N/A',
@@ -762,7 +2206,13 @@ def test_config():
         'supabase_url_set': bool(SUPABASE_URL),
         'supabase_key_set': bool(SUPABASE_KEY),
         'gemini_key_set': bool(GOOGLE_API_KEY),
+        'gemini_client': gemini.stats(),
+        'gemini_scheduler': gemini_scheduler.stats(),
+        'speech': speech_stats(),
         'db_password_set': bool(os.getenv('DB_PASSWORD')),
+        'db_pool': db_pool.stats(),
+        'history_writer': history_writer.stats() if history_writer is not None else None,
+        'auth_tokens': token_verifier.stats() if token_verifier is not None else None,
         'environment_variables': {
             'DATABASE_TYPE': DATABASE_TYPE,
             'DB_HOST': os.getenv('DB_HOST'),
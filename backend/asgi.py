@@ -0,0 +1,206 @@
+"""ASGI serving mode
+
+/translate runs natively on the event loop: Gemini is called through the
+httpx-based AsyncGeminiClient and the short blocking steps (cache lookups,
+history insert, queueing TTS) run on a thread pool, so one process keeps
+many translations in flight while they wait on upstream I/O. Every other
+route is served by the Flask app through a WSGI bridge, so the JSON API is
+the same in both modes.
+
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+
+import app as backend
+from gemini_client import AsyncGeminiClient
+
+ASGI_GEMINI_POOL_SIZE = int(os.getenv('ASGI_GEMINI_POOL_SIZE', '200'))
+ASGI_BLOCKING_THREADS = int(os.getenv('ASGI_BLOCKING_THREADS', '64'))  # cache/DB/TTS queue steps
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))  # routes served by Flask
+ASGI_MAX_BODY = int(os.getenv('ASGI_MAX_BODY', str(1024 * 1024)))
+
+CORS_ORIGINS = os.getenv("VITE_API_BASE_URL", "*")
+
+# Shares the circuit breaker with the sync client so both modes see the same upstream health
+gemini_async = AsyncGeminiClient(
+    backend.GOOGLE_API_KEY,
+    model=backend.GEMINI_MODEL,
+    base_url=backend.GEMINI_API_BASE,
+    connect_timeout=backend.GEMINI_CONNECT_TIMEOUT,
+    read_timeout=backend.GEMINI_READ_TIMEOUT,
+    max_retries=backend.GEMINI_MAX_RETRIES,
+    backoff_base=backend.GEMINI_BACKOFF_BASE,
+    backoff_max=backend.GEMINI_BACKOFF_MAX,
+    pool_size=ASGI_GEMINI_POOL_SIZE,
+    breaker=backend.gemini.breaker
+)
+
+backend.metrics.collector(lambda: backend.gemini_samples(gemini_async, 'async'))
+
+flask_app = WSGIMiddleware(backend.app, workers=ASGI_WSGI_THREADS)
+
+
+class RequestError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+async def fetch_translation_async(text, input_language, output_language):
+    """Async counterpart of app.fetch_translation"""
+    translated_text = await asyncio.to_thread(backend.lookup_translation, text, input_language, output_language)
+    if translated_text is not None:
+        return translated_text
+    prompt = backend.build_translation_prompt(text, input_language, output_language)
+    priority, deadline = backend.gemini_request.get()
+    await backend.gemini_scheduler.acquire_async(priority, backend.gemini_call_cost(prompt), deadline)
+    try:
+        with backend.timed_stage('gemini'):
+            translated_text = (await gemini_async.generate_content(prompt)).strip()
+    except Exception as e:
+        backend.note_gemini_error(e)
+        raise Exception(f"Translation error: {str(e)}")
+    await asyncio.to_thread(backend.remember_translation, text, input_language, output_language, translated_text)
+    return translated_text
+
+
+async def translate_text_async(text, input_language, output_language):
+    """Async counterpart of app.translate_text"""
+    translated_text = await asyncio.to_thread(backend.lookup_translation, text, input_language, output_language)
+    if translated_text is not None:
+        return translated_text
+    return await backend.translation_flight.do_async(
+        backend.translation_flight_key(text, input_language, output_language),
+        lambda: fetch_translation_async(text, input_language, output_language),
+        recheck=lambda: backend.lookup_translation(text, input_language, output_language)
+    )
+
+
+async def read_json(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise RequestError('Client disconnected', 400)
+        body.extend(message.get('body', b''))
+        if len(body) > ASGI_MAX_BODY:
+            raise RequestError('Request body too large', 413)
+        if not message.get('more_body'):
+            break
+    try:
+        return backend.app.json.loads(bytes(body)) if body else None
+    except ValueError:
+        raise RequestError('Invalid JSON body', 400)
+
+
+def bearer_token(scope):
+    authorization = dict(scope.get('headers', [])).get(b'authorization', b'').decode('latin-1')
+    if authorization.startswith('Bearer '):
+        return authorization.split(' ')[1]
+    return None
+
+
+def cors_headers(scope):
+    if CORS_ORIGINS == '*':
+        return [(b'access-control-allow-origin', b'*')]
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if origin and origin.decode('latin-1') == CORS_ORIGINS:
+        return [(b'access-control-allow-origin', origin), (b'vary', b'Origin')]
+    return []
+
+
+async def send_json(scope, send, payload, status=200, headers=()):
+    # Serialize exactly like Flask's jsonify so responses match the WSGI mode
+    body = (backend.app.json.dumps(payload) + '\n').encode('utf-8')
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('ascii')),
+    ] + list(headers) + cors_headers(scope)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def translate(scope, receive, send):
+    client = scope.get('client')
+    retry_after = await asyncio.to_thread(
+        backend.check_rate_limit, backend.translate_ip_limiter, client[0] if client else None)
+    if retry_after is not None:
+        return await send_json(scope, send, {'error': 'Too many requests, please try again later'}, 429,
+                               [(b'retry-after', str(retry_after).encode('ascii'))])
+    try:
+        user_id, error = await asyncio.to_thread(backend.resolve_user, bearer_token(scope))
+        if error:
+            return await send_json(scope, send, error[0], error[1])
+        data = await read_json(receive)
+        fields, error = backend.parse_translation_request(data)
+        if not error:
+            scheduling, error = backend.request_scheduling(data)
+        if error:
+            return await send_json(scope, send, error[0], error[1])
+        text, input_language, output_language = fields
+        backend.gemini_request.set(scheduling)
+        backend.request_user.set(user_id)
+
+        translated_text = await translate_text_async(text, input_language, output_language)
+        body = await asyncio.to_thread(
+            backend.complete_translation, text, input_language, output_language, translated_text,
+            user_id=user_id)
+        await send_json(scope, send, body)
+    except RequestError as e:
+        await send_json(scope, send, {'error': str(e)}, e.status)
+    except backend.SchedulerRejected as e:
+        await send_json(scope, send, {'error': str(e), 'reason': e.reason}, 503,
+                        [(b'retry-after', str(e.retry_after).encode('ascii'))])
+    except Exception as e:
+        await send_json(scope, send, {'error': str(e)}, 500)
+
+
+async def timed_route(handler, scope, receive, send):
+    """Run a native route, recording the same request metrics as the Flask routes"""
+    started = time.perf_counter()
+    status = 500
+
+    async def send_with_status(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            backend.http_request_seconds.observe(time.perf_counter() - started, scope['path'], scope['method'])
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_with_status)
+    finally:
+        backend.http_requests.inc(scope['path'], scope['method'], str(status))
+
+
+ROUTES = {
+    ('POST', '/translate'): translate,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=ASGI_BLOCKING_THREADS, thread_name_prefix='asgi-blocking'))
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await gemini_async.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http':
+        handler = ROUTES.get((scope['method'], scope['path']))
+        if handler is not None:
+            return await timed_route(handler, scope, receive, send)
+    await flask_app(scope, receive, send)
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+AUDIO_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def make_audio_id(text, language):
+    """Content id for the audio of ``text`` spoken in ``language``"""
+    raw = f"{language}\x1f{text}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+class AudioStore:
+    """Content-addressed MP3 store with a disk-size cap and LRU eviction
+
+    Files live at ``<root>/<audio_id>.mp3``. Several worker processes may share
+    the directory: each keeps its own LRU index and the background sweeper
+    re-syncs it with what is on disk, using file mtimes as the shared recency
+    signal.
+
+    Read-only directories (a phrase pack's pre-rendered audio) can be
+    ``attach``-ed: their files are served like stored ones but never
+    touched, counted against the cap or evicted.
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, orphan_age=3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.orphan_age = orphan_age
+        os.makedirs(root, exist_ok=True)
+        self._index = OrderedDict()  # audio_id -> size in bytes
+        self._attached = []
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.orphans_removed = 0
+        self.sweep()
+
+    def path_for(self, audio_id):
+        if not AUDIO_ID_PATTERN.match(audio_id or ''):
+            raise ValueError(f"Invalid audio id: {audio_id}")
+        return os.path.join(self.root, f"{audio_id}.mp3")
+
+    def attach(self, directory):
+        """Also serve ``<directory>/<audio_id>.mp3`` files, read-only"""
+        self._attached.append(directory)
+
+    def _attached_path(self, audio_id):
+        for directory in self._attached:
+            path = os.path.join(directory, f"{audio_id}.mp3")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _track(self, audio_id, size):
+        previous = self._index.pop(audio_id, None)
+        if previous is not None:
+            self._total_bytes -= previous
+        self._index[audio_id] = size
+        self._total_bytes += size
+
+    def _untrack(self, audio_id):
+        size = self._index.pop(audio_id, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def get(self, audio_id):
+        """Path of a stored MP3, or None if it is not (or no longer) on disk"""
+        try:
+            path = self.path_for(audio_id)
+        except ValueError:
+            return None
+        if not os.path.exists(path):
+            with self._lock:
+                self._untrack(audio_id)
+            return self._attached_path(audio_id)
+        try:
+            # mtime doubles as the LRU timestamp shared between workers
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            if audio_id in self._index:
+                self._index.move_to_end(audio_id)
+            else:
+                self._track(audio_id, os.path.getsize(path))
+        return path
+
+    def contains(self, audio_id):
+        try:
+            return os.path.exists(self.path_for(audio_id)) or self._attached_path(audio_id) is not None
+        except ValueError:
+            return False
+
+    def get_or_create(self, text, language, synthesize):
+        """Return (audio_id, path), calling ``synthesize(text, language, path)`` on a miss"""
+        audio_id = make_audio_id(text, language)
+        path = self.get(audio_id)
+        if path is not None:
+            with self._lock:
+                self.hits += 1
+            return audio_id, path
+
+        with self._lock:
+            self.misses += 1
+        path = self.path_for(audio_id)
+        temp_path = os.path.join(self.root, f"{audio_id}.{uuid.uuid4().hex}.tmp")
+        try:
+            synthesize(text, language, temp_path)
+            # Atomic publish: readers never see a half-written MP3
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        with self._lock:
+            self._track(audio_id, os.path.getsize(path))
+        self._evict(keep=audio_id)
+        return audio_id, path
+
+    def _evict(self, keep=None):
+        victims = []
+        with self._lock:
+            for audio_id in list(self._index):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if audio_id == keep:
+                    continue
+                victims.append(audio_id)
+                self._untrack(audio_id)
+                self.evictions += 1
+        for audio_id in victims:
+            try:
+                os.unlink(self.path_for(audio_id))
+            except OSError:
+                pass
+
+    def sweep(self):
+        """Re-sync the index with the directory and remove orphaned files
+
+        Orphans are temp files left behind by crashed syntheses and anything
+        else in the directory that is not a valid audio entry.
+        """
+        now = time.time()
+        found = []
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            audio_id, ext = os.path.splitext(entry.name)
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if ext == '.mp3' and AUDIO_ID_PATTERN.match(audio_id):
+                found.append((stat.st_mtime, audio_id, stat.st_size))
+            elif now - stat.st_mtime > self.orphan_age:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    continue
+                with self._lock:
+                    self.orphans_removed += 1
+
+        found.sort()
+        with self._lock:
+            self._index.clear()
+            self._total_bytes = 0
+            for _, audio_id, size in found:
+                self._track(audio_id, size)
+        self._evict()
+
+    def start_sweeper(self, interval=300):
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"⚠️ Warning: Audio store sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name='audio-store-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'orphans_removed': self.orphans_removed,
+            }
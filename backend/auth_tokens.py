@@ -0,0 +1,239 @@
+import hashlib
+import threading
+import time
+
+import jwt
+
+from translation_cache import LRUCache
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+
+
+class TokenError(Exception):
+    """The token is malformed, badly signed, expired or revoked"""
+
+
+class TokenExpired(TokenError):
+    """The token is past its expiry"""
+
+
+class TokenRevoked(TokenError):
+    """The token, or its login session, was revoked"""
+
+
+def token_id(token):
+    """Short stable identifier of a token, used as cache and revocation key"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+
+
+class JWKSCache:
+    """Signing keys fetched from a JWKS endpoint, refreshed every ``ttl`` seconds
+
+    An unknown ``kid`` triggers an early refresh (at most once per
+    ``min_refresh`` seconds) so rotated keys are picked up without waiting.
+    Asymmetric algorithms need PyJWT with the cryptography extra.
+    """
+
+    def __init__(self, url, ttl=600, min_refresh=30, fetch=None, clock=time.monotonic):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._fetch = fetch or self._http_fetch
+        self._clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _http_fetch(url):
+        import requests
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+        return response.json()
+
+    def _refresh(self):
+        keys = {}
+        for jwk in self._fetch(self.url).get('keys', []):
+            try:
+                keys[jwk.get('kid')] = jwt.PyJWK(jwk)
+            except Exception:
+                continue  # key type or algorithm this installation cannot use
+        self._keys = keys
+        self._fetched_at = self._clock()
+
+    def get(self, kid):
+        with self._lock:
+            age = None if self._fetched_at is None else self._clock() - self._fetched_at
+            if age is None or age >= self.ttl or (kid not in self._keys and age >= self.min_refresh):
+                self._refresh()
+            return self._keys.get(kid)
+
+
+class TokenVerifier:
+    """Verify Supabase access tokens in-process
+
+    Tokens are decoded with PyJWT: HS256 tokens against the project's JWT
+    secret, asymmetrically signed ones against the project's JWKS. Without
+    either, ``remote(token)`` (e.g. a Supabase
+    ``get_user`` call) vouches for the token instead of a signature check
+    and returns the user's claims. Verified claims are kept in a bounded LRU
+    keyed by the token, so a repeat request costs a hash and a dict lookup
+    rather than a signature check or a network call. Expiry is re-checked
+    on every hit.
+
+    Revocations go to the shared key-value store (so every worker sees
+    them) until the token would have expired anyway. Cached tokens are
+    re-checked against it at most every ``revocation_check_interval``
+    seconds; revocations made in this process apply at once (cached tokens
+    are indexed by login session so revoking one only evicts its own).
+    """
+
+    def __init__(self, secret=None, jwks=None, remote=None, audience='authenticated', issuer=None, leeway=30,
+                 cache_size=10000, store=None, revocation_check_interval=5.0, clock=time.time):
+        if not secret and jwks is None and remote is None:
+            raise ValueError("A JWT secret, a JWKS source or a remote check is required")
+        self.secret = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.jwks = jwks
+        self.remote = remote if not secret and jwks is None else None
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.store = store
+        self.revocation_check_interval = revocation_check_interval
+        self._clock = clock
+        # token id -> (claims, next revocation check)
+        self._cache = LRUCache(max_size=cache_size, ttl=None)
+        # session id -> ids of its cached tokens
+        self._sessions = LRUCache(max_size=cache_size, ttl=None)
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rejected = 0
+
+    def _signing_key(self, token):
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise TokenError(f"Malformed token: {e}")
+        algorithm = header.get('alg')
+        if algorithm == 'HS256':
+            if not self.secret:
+                raise TokenError("HS256 token but no JWT secret configured")
+            return self.secret, algorithm
+        if algorithm in ASYMMETRIC_ALGORITHMS and self.jwks is not None:
+            try:
+                key = self.jwks.get(header.get('kid'))
+            except Exception as e:
+                raise TokenError(f"Could not load signing keys: {e}")
+            if key is None:
+                raise TokenError("Unknown signing key")
+            # decode() refuses a key of the wrong type for algorithm
+            return key.key, algorithm
+        raise TokenError(f"Unsupported token algorithm: {algorithm}")
+
+    def _decode(self, token):
+        """Claims of a token whose signature, expiry, audience and issuer check out"""
+        options = {'require': ['exp'], 'verify_aud': bool(self.audience)}
+        if self.remote is not None:
+            # remote() vouches for the token; PyJWT still checks its claims
+            key, algorithms = None, None
+            options.update(verify_signature=False, verify_exp=True, verify_nbf=True,
+                           verify_iss=bool(self.issuer))
+        else:
+            key, algorithm = self._signing_key(token)
+            algorithms = [algorithm]
+        try:
+            claims = jwt.decode(token, key, algorithms=algorithms, audience=self.audience or None,
+                                issuer=self.issuer, leeway=self.leeway, options=options)
+        except jwt.ExpiredSignatureError:
+            raise TokenExpired("Token expired")
+        except jwt.PyJWTError as e:
+            raise TokenError(str(e))
+        if self.remote is not None:
+            claims.update(self.remote(token))
+        return claims
+
+    def _check_expiry(self, claims, now):
+        """Re-check a cached token's expiry"""
+        if now > claims['exp'] + self.leeway:
+            raise TokenExpired("Token expired")
+
+    @staticmethod
+    def _revocation_keys(tid, claims):
+        keys = [f'revoked:token:{tid}']
+        if claims.get('session_id'):
+            keys.append(f"revoked:session:{claims['session_id']}")
+        return keys
+
+    def _count(self, key):
+        with self._lock:
+            setattr(self, key, getattr(self, key) + 1)
+
+    def _remember(self, tid, claims, next_check):
+        self._cache.set(tid, (claims, next_check))
+        session_id = claims.get('session_id')
+        if session_id:
+            with self._lock:
+                tids = self._sessions.get(session_id)
+                if tids is None:
+                    tids = set()
+                    self._sessions.set(session_id, tids)
+                tids.add(tid)
+
+    def _is_revoked(self, tid, claims):
+        if self.store is None:
+            return False
+        return any(self.store.get(key) is not None for key in self._revocation_keys(tid, claims))
+
+    def verify(self, token):
+        """Claims of a valid token; raises TokenError otherwise"""
+        now = self._clock()
+        tid = token_id(token)
+        cached = self._cache.get(tid)
+        try:
+            if cached is not None:
+                claims, next_check = cached
+                self._check_expiry(claims, now)
+            else:
+                claims = self._decode(token)
+                next_check = 0
+            if now >= next_check:
+                if self._is_revoked(tid, claims):
+                    raise TokenRevoked("Token revoked")
+                self._remember(tid, claims, now + self.revocation_check_interval)
+        except TokenError:
+            self._cache.delete(tid)
+            self._count('rejected')
+            raise
+        self._count('verified')
+        return claims
+
+    def revoke(self, token, session=True):
+        """Reject token (and, with session, every token of its login session) from now on
+
+        Returns the token's claims, or None for a token that is expired or
+        already revoked, so logging out twice is harmless.
+        """
+        try:
+            claims = self.verify(token)
+        except (TokenExpired, TokenRevoked):
+            return None
+        tid = token_id(token)
+        self._cache.delete(tid)
+        if session and claims.get('session_id'):
+            # Other tokens of the session would pass until their next revocation check
+            with self._lock:
+                tids = self._sessions.get(claims['session_id']) or set()
+                self._sessions.delete(claims['session_id'])
+            for other in tids:
+                self._cache.delete(other)
+        if self.store is not None:
+            ttl = max(1, int(claims['exp'] + self.leeway - self._clock()) + 1)
+            keys = self._revocation_keys(tid, claims)
+            for key in keys if session else keys[:1]:
+                self.store.set(key, '1', ttl)
+        return claims
+
+    def stats(self):
+        with self._lock:
+            counts = {'verified': self.verified, 'rejected': self.rejected}
+        return {**counts, 'cache': self._cache.stats()}
@@ -0,0 +1,76 @@
+import json
+import re
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for prompt budgeting"""
+    return len(text) // 4 + 1
+
+
+def pack_segments(segments, token_budget=3000, max_per_pack=50, overhead=8):
+    """Group segment indices into packs whose estimated size fits the token budget
+
+    Order is preserved within and across packs. A segment that is larger than
+    the budget on its own gets a pack to itself.
+    """
+    packs = []
+    current = []
+    used = 0
+    for index, segment in enumerate(segments):
+        cost = estimate_tokens(segment) + overhead
+        if current and (used + cost > token_budget or len(current) >= max_per_pack):
+            packs.append(current)
+            current = []
+            used = 0
+        current.append(index)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_batch_prompt(segments, input_language_name, output_language_name, glossary_section=''):
+    """Prompt asking for a JSON array of {"id", "translation"} objects
+
+    ``glossary_section`` lists required term renderings, one per line.
+    """
+    items = [{'id': i, 'text': text} for i, text in enumerate(segments)]
+    required = f"Translate these terms exactly as given:\n{glossary_section}\n" if glossary_section else ''
+    return f"""Translate each medical text segment below from {input_language_name} to {output_language_name}.
+Maintain medical terminology accuracy and consider healthcare context and medicines or different conditions. Do not change the terms or anything.
+Translate every segment independently. Do not merge, split or omit segments.
+{required}
+Input is a JSON array of objects with "id" and "text".
+Respond with only a JSON array of objects with "id" (copied from the input) and "translation".
+
+{json.dumps(items, ensure_ascii=False)}"""
+
+
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def parse_batch_response(response_text, count):
+    """Map segment id -> translation from a batch response
+
+    Ids that are missing, duplicated or out of range are left out, so the
+    caller can retry just those segments.
+    """
+    payload = json.loads(_FENCE.sub('', response_text.strip()))
+    if isinstance(payload, dict):
+        payload = payload.get('translations', [])
+    if not isinstance(payload, list):
+        raise ValueError("Batch response is not a JSON array")
+
+    translations = {}
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        segment_id = item.get('id')
+        translation = item.get('translation')
+        if isinstance(segment_id, str) and segment_id.isdigit():
+            segment_id = int(segment_id)
+        if (isinstance(segment_id, int) and 0 <= segment_id < count
+                and isinstance(translation, str) and translation.strip()
+                and segment_id not in translations):
+            translations[segment_id] = translation.strip()
+    return translations
@@ -0,0 +1,92 @@
+"""Glossary matcher benchmark
+
+Builds a synthetic glossary (default 150k terms of one to three words) and
+times tagging and checking texts of a few sizes:
+
+    python bench/bench_glossary.py --terms 150000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from glossary import Glossary  # noqa: E402
+
+SYLLABLES = ['ab', 'ac', 'al', 'am', 'an', 'ar', 'ci', 'co', 'de', 'di', 'do', 'ex', 'fen', 'ga', 'hy',
+             'in', 'ka', 'la', 'lo', 'ma', 'mi', 'mo', 'na', 'ne', 'ol', 'pa', 'pro', 'ra', 're', 'ri',
+             'sa', 'so', 'ta', 'te', 'ti', 'to', 'tri', 'ul', 'va', 'vi', 'xa', 'zo', 'zol', 'zine']
+
+
+def word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def build_terms(count, rng):
+    terms = set()
+    while len(terms) < count:
+        terms.add(' '.join(word(rng) for _ in range(rng.choice((1, 1, 2, 3)))))
+    return sorted(terms)
+
+
+def make_text(words, terms, rng, term_rate=0.1):
+    out = []
+    while len(out) < words:
+        if rng.random() < term_rate:
+            out.extend(rng.choice(terms).split())
+        else:
+            out.append(rng.choice(('take', 'the', 'patient', 'with', 'daily', 'mg', '250', 'after', 'meals')))
+    return ' '.join(out)
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, default=150000)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    terms = build_terms(args.terms, rng)
+    entries = [(term, term.upper()) for term in terms]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    glossary = Glossary()
+    glossary.set_terms('en', 'es', entries)
+    build_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"build: {len(terms)} terms, {glossary.stats()['states']} states, "
+          f"{build_seconds:.2f} s, peak {peak / 1e6:.0f} MB")
+
+    for words in (20, 200, 2000):
+        texts = [make_text(words, terms, rng) for _ in range(50)]
+        tag_times, check_times = [], []
+        tagged = 0
+        for i in range(args.iterations):
+            text = texts[i % len(texts)]
+            started = time.perf_counter()
+            found = glossary.tag(text, 'en', 'es')
+            tag_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            glossary.check(text, text, 'en', 'es', found)
+            check_times.append(time.perf_counter() - started)
+            tagged += len(found)
+        print(f"{words:>5} words: tag p50 {statistics.median(tag_times) * 1e3:.3f} ms "
+              f"p99 {percentile(tag_times, 0.99) * 1e3:.3f} ms | "
+              f"check p50 {statistics.median(check_times) * 1e3:.3f} ms | "
+              f"{tagged / args.iterations:.1f} terms/text")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""Load test the API against local stand-ins for Gemini, gTTS and Speech
+
+Replays a weighted mix of /translate, /speech-to-text, /history and auth
+(resend and verify OTP) requests from concurrent clients and reports
+throughput, client-side p50/p95/p99 per route, server-side p50/p95/p99
+per stage (from the /metrics histograms) and resident memory growth.
+
+By default the app is imported in-process with the fake Gemini server,
+``SPEECH_BACKEND=fake``, ``TTS_BACKEND=fake`` and a throwaway SQLite
+database, so no Google or Supabase access is needed:
+
+    python bench/load.py --requests 2000 --concurrency 16 --gemini-latency 0.3
+    python bench/load.py --database postgresql   # DB_HOST, DB_NAME, ... from the environment
+
+``--url`` drives an already running server instead (start it with the same
+fakes, e.g. ``python -m fakes.gemini --latency 0.3`` and
+``GEMINI_API_BASE=http://127.0.0.1:8081 SPEECH_BACKEND=fake TTS_BACKEND=fake``);
+pass ``--pid`` to track its memory and ``--jwt-secret`` if it verifies tokens.
+
+Results can be saved as a named baseline and later runs compared to it:
+
+    python bench/load.py --save-baseline main
+    python bench/load.py --compare main   # exit status 1 on a regression
+"""
+import argparse
+import base64
+import gc
+import hashlib
+import hmac
+import io
+import json
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+DEFAULT_MIX = 'translate=60,history=20,speech=10,auth=10'
+JWT_SECRET = 'bench-secret'
+LANGUAGES = ['es', 'fr', 'de', 'ar', 'ur']
+PHRASES = [
+    'Take two tablets every eight hours after meals',
+    'Do you have any allergies to penicillin or other antibiotics?',
+    'The patient reports chest pain radiating to the left arm',
+    'Blood pressure is 140 over 90, heart rate 88',
+    'Please fast for twelve hours before the blood test',
+    'Apply the ointment twice daily to the affected area',
+    'Have you had a fever, cough or shortness of breath?',
+    'Your MRI results will be ready in three days',
+]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of a process from /proc, or None where that is unavailable"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def make_token(secret, user_id, ttl=3600):
+    """HS256 access token shaped like Supabase's"""
+    def segment(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).rstrip(b'=').decode('ascii')
+    signing_input = f"{segment({'alg': 'HS256', 'typ': 'JWT'})}." \
+                    f"{segment({'sub': user_id, 'aud': 'authenticated', 'exp': int(time.time()) + ttl})}"
+    signature = hmac.new(secret.encode('utf-8'), signing_input.encode('ascii'), hashlib.sha256).digest()
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode('ascii')}"
+
+
+def make_wav(seconds, sample_rate=16000):
+    """Silent 16-bit mono PCM WAV"""
+    data = b'\x00\x00' * int(seconds * sample_rate)
+    header = b'RIFF' + struct.pack('<I', 36 + len(data)) + b'WAVE' + \
+        b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16) + \
+        b'data' + struct.pack('<I', len(data))
+    return header + data
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class InProcessClient:
+    """Requests through the Flask test client (one per thread)"""
+
+    def __init__(self, app_module):
+        self.app_module = app_module
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app_module.app.test_client()
+        return client
+
+    def request(self, method, path, json_body=None, files=None, headers=None):
+        if files:
+            data = {name: (io.BytesIO(content), filename) for name, (filename, content) in files.items()}
+            response = self._client().open(path, method=method, data=data, headers=headers,
+                                           content_type='multipart/form-data')
+        else:
+            response = self._client().open(path, method=method, json=json_body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+    def metrics_text(self):
+        return self.app_module.metrics.render()
+
+
+class HTTPClient:
+    """Requests to a running server (one keep-alive session per thread)"""
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+
+    def request(self, method, path, json_body=None, files=None, headers=None):
+        response = self._session().request(method, self.base_url + path, json=json_body, files=files,
+                                           headers=headers, timeout=120)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    def metrics_text(self):
+        return self._requests.get(self.base_url + '/metrics', timeout=30).text
+
+
+class Workload:
+    """Generates requests; ``repeat`` is the share of translations reusing an earlier text"""
+
+    def __init__(self, client, secret, users=50, repeat=0.5, audio_seconds=2.0):
+        self.client = client
+        self.secret = secret
+        self.tokens = [make_token(secret, f'bench-user-{i}') for i in range(users)] if secret else []
+        self.repeat = repeat
+        self.audio = make_wav(audio_seconds)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _next_id(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def _call(self, route, method, path, json_body=None, files=None, headers=None):
+        started = time.perf_counter()
+        status, body = self.client.request(method, path, json_body, files=files, headers=headers)
+        return route, status, body, time.perf_counter() - started
+
+    def _headers(self, rng):
+        return {'Authorization': f'Bearer {rng.choice(self.tokens)}'} if self.tokens else None
+
+    def translate(self, rng):
+        phrase = rng.choice(PHRASES)
+        text = phrase if rng.random() < self.repeat else f'{phrase} (visit {self._next_id()})'
+        body = {'text': text, 'inputLanguage': 'en', 'outputLanguage': rng.choice(LANGUAGES)}
+        return [self._call('/translate', 'POST', '/translate', body, headers=self._headers(rng))]
+
+    def history(self, rng):
+        return [self._call('/history', 'GET', '/history?limit=20', headers=self._headers(rng))]
+
+    def speech(self, rng):
+        files = {'audio': ('recording.wav', self.audio)}
+        return [self._call('/speech-to-text', 'POST', '/speech-to-text', files=files)]
+
+    def auth(self, rng):
+        email = f'bench-{self._next_id()}@example.com'
+        resend = self._call('/auth/resend-otp', 'POST', '/auth/resend-otp', {'email': email})
+        otp = (resend[2] or {}).get('otp', '000000')
+        return [resend, self._call('/auth/verify-otp', 'POST', '/auth/verify-otp', {'email': email, 'otp': otp})]
+
+
+OPERATIONS = ('translate', 'history', 'speech', 'auth')
+
+_BUCKET_LINE = re.compile(r'^stage_duration_seconds_bucket\{stage="([^"]*)",le="([^"]*)"\} (\S+)$')
+
+
+def stage_buckets(metrics_text):
+    """{stage: [(upper bound, cumulative count)]} from a /metrics scrape"""
+    stages = defaultdict(list)
+    for line in metrics_text.splitlines():
+        match = _BUCKET_LINE.match(line)
+        if match:
+            stage, le, count = match.groups()
+            stages[stage].append((float('inf') if le == '+Inf' else float(le), float(count)))
+    return stages
+
+
+def bucket_quantile(buckets, q):
+    """Quantile estimated by linear interpolation inside its bucket, as Prometheus does"""
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return 0.0
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float('inf'):
+                return lower_bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / ((count - lower_count) or 1)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_report(before, after):
+    report = {}
+    for stage, buckets in after.items():
+        previous = dict(before.get(stage, []))
+        delta = [(bound, count - previous.get(bound, 0)) for bound, count in buckets]
+        if delta and delta[-1][1] > 0:
+            report[stage] = {
+                'count': int(delta[-1][1]),
+                **{f'p{int(q * 100)}_ms': round(bucket_quantile(delta, q) * 1e3, 2) for q in (0.5, 0.95, 0.99)},
+            }
+    return report
+
+
+def run_load(workload, mix, requests, concurrency, seed):
+    """Run requests operations over concurrency threads; returns (samples, errors, elapsed)"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            operation = rng.choices(names, weights)[0]
+            try:
+                results = getattr(workload, operation)(rng)
+            except Exception as e:
+                with lock:
+                    errors[operation] += 1
+                print(f"⚠️ Warning: {operation} failed: {e}")
+                continue
+            with lock:
+                for route, status, _, elapsed in results:
+                    samples[route].append(elapsed)
+                    if status >= 500:
+                        errors[route] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - started
+
+
+def start_in_process(args, workdir):
+    """Import the app configured against fakes and a scratch database; returns (client, fake Gemini)"""
+    from fakes.gemini import FakeGeminiServer
+    gemini = FakeGeminiServer(latency=args.gemini_latency, jitter=args.gemini_jitter,
+                              fail_rate=args.gemini_fail_rate).start()
+    os.environ.update({
+        'GOOGLE_API_KEY': 'bench',
+        'GEMINI_API_BASE': gemini.url,
+        'SPEECH_BACKEND': 'fake',
+        'FAKE_SPEECH_LATENCY': str(args.speech_latency),
+        'TTS_BACKEND': 'fake',
+        'FAKE_TTS_LATENCY': str(args.tts_latency),
+        'DATABASE_TYPE': 'local' if args.database == 'sqlite' else args.database,
+        'SUPABASE_URL': '',
+        'SUPABASE_JWT_SECRET': JWT_SECRET,
+        'AUDIO_CACHE_DIR': os.path.join(workdir, 'audio'),
+        'KV_SQLITE_PATH': os.path.join(workdir, 'kv_store.db'),
+        'GLOSSARY_DIR': os.path.join(workdir, 'glossary'),
+        'TRANSLATE_LIMIT_PER_IP': '1000000000',
+        'OTP_RESEND_LIMIT_PER_IP': '1000000000',
+        'METRICS_DIR': '',
+    })
+    # The local database is chat_history.db in the working directory
+    os.chdir(workdir)
+    import app as app_module
+    return InProcessClient(app_module), gemini
+
+
+def summarize(args, samples, errors, elapsed, stages, rss_before, rss_after):
+    total = sum(len(values) for values in samples.values())
+    return {
+        'config': {key: getattr(args, key) for key in ('mix', 'requests', 'concurrency', 'repeat', 'database',
+                                                        'gemini_latency', 'tts_latency', 'speech_latency')},
+        'requests': total,
+        'errors': sum(errors.values()),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'routes': {
+            route: {
+                'count': len(values),
+                'errors': errors.get(route, 0),
+                **{f'p{int(q * 100)}_ms': round(percentile(values, q) * 1e3, 2) for q in (0.5, 0.95, 0.99)},
+            }
+            for route, values in sorted(samples.items())
+        },
+        'stages': stages,
+        'memory': {
+            'rss_before_mb': round(rss_before / 2 ** 20, 1) if rss_before else None,
+            'rss_after_mb': round(rss_after / 2 ** 20, 1) if rss_after else None,
+            'growth_mb': round((rss_after - rss_before) / 2 ** 20, 1) if rss_before and rss_after else None,
+        },
+    }
+
+
+def print_report(result):
+    print(f"{result['requests']} requests in {result['elapsed_s']} s: "
+          f"{result['throughput_rps']} req/s, {result['errors']} errors")
+    print(f"{'route':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, row in result['routes'].items():
+        print(f"{route:<22}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    if result['stages']:
+        print(f"{'stage':<22}{'count':>7}{'':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, row in sorted(result['stages'].items()):
+            print(f"{stage:<22}{row['count']:>7}{'':>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    memory = result['memory']
+    if memory['growth_mb'] is not None:
+        print(f"memory: {memory['rss_before_mb']} MB -> {memory['rss_after_mb']} MB "
+              f"({memory['growth_mb']:+} MB)")
+
+
+def compare(result, baseline, tolerance, memory_tolerance_mb):
+    """Regressions of result against baseline, as printable lines"""
+    regressions = []
+    if result['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        regressions.append(f"throughput {result['throughput_rps']} req/s < baseline {baseline['throughput_rps']}")
+    for section in ('routes', 'stages'):
+        for name, row in result[section].items():
+            before = baseline.get(section, {}).get(name)
+            if before is None:
+                continue
+            for key in ('p95_ms', 'p99_ms'):
+                # A few milliseconds either way is thread scheduling noise
+                if row[key] > before[key] * (1 + tolerance) and row[key] - before[key] > 5.0:
+                    regressions.append(f"{section[:-1]} {name} {key} {row[key]} > baseline {before[key]}")
+    growth, baseline_growth = result['memory']['growth_mb'], baseline['memory']['growth_mb']
+    if growth is not None and baseline_growth is not None and growth > baseline_growth + memory_tolerance_mb:
+        regressions.append(f"memory growth {growth} MB > baseline {baseline_growth} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='drive a running server instead of the in-process app')
+    parser.add_argument('--pid', help='process id of the --url server, to track its memory')
+    parser.add_argument('--jwt-secret', help='SUPABASE_JWT_SECRET of the --url server, to send access tokens')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'operation weights (default {DEFAULT_MIX})')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=100, help='operations run before measuring')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--repeat', type=float, default=0.5, help='share of translations of an already seen text')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--database', default='sqlite', choices=('sqlite', 'postgresql', 'mysql'))
+    parser.add_argument('--gemini-latency', type=float, default=0.2)
+    parser.add_argument('--gemini-jitter', type=float, default=0.1)
+    parser.add_argument('--gemini-fail-rate', type=float, default=0.0)
+    parser.add_argument('--tts-latency', type=float, default=0.3)
+    parser.add_argument('--speech-latency', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the result to this file')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    parser.add_argument('--memory-tolerance', type=float, default=20.0, help='allowed extra growth in MB')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    gemini = None
+    if args.url:
+        client = HTTPClient(args.url)
+        secret = args.jwt_secret
+        pid = args.pid
+    else:
+        client, gemini = start_in_process(args, tempfile.mkdtemp(prefix='translation-bench-'))
+        secret = JWT_SECRET
+        pid = 'self'
+    workload = Workload(client, secret, users=args.users, repeat=args.repeat)
+
+    try:
+        if args.warmup:
+            run_load(workload, mix, args.warmup, args.concurrency, args.seed + 1)
+        gc.collect()
+        rss_before = rss_bytes(pid) if pid else None
+        stages_before = stage_buckets(client.metrics_text())
+        samples, errors, elapsed = run_load(workload, mix, args.requests, args.concurrency, args.seed)
+        stages = stage_report(stages_before, stage_buckets(client.metrics_text()))
+        gc.collect()
+        rss_after = rss_bytes(pid) if pid else None
+    finally:
+        if gemini is not None:
+            gemini.stop()
+
+    result = summarize(args, samples, errors, elapsed, stages, rss_before, rss_after)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+        if baseline['config'] != result['config']:
+            print("⚠️ Warning: baseline was recorded with a different configuration")
+        regressions = compare(result, baseline, args.tolerance, args.memory_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against baseline {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Build the phrase pack: standard phrases pre-translated and pre-rendered
+
+Reads phrase lists (one phrase per line, blank lines and ``#`` comments
+ignored), translates every phrase into each target language with the
+app's own batch translation (glossary, caches and Gemini scheduling
+included) and renders the audio of every translation, then writes the
+memory-mapped pack the server loads at startup (see phrase_pack.py):
+
+    python build_phrase_pack.py phrases/clinical.txt --source en
+    python build_phrase_pack.py phrases/*.txt --targets es,fr,ar,ur --output packs/phrases.pack
+
+Rebuilds are incremental: translations already in the existing pack are
+kept, so only new or changed phrases reach Gemini, and audio is rendered
+only for translations without a file yet. Entries for phrases no longer
+listed (or languages not targeted) are dropped along with their audio.
+``--refresh`` ignores the existing pack, e.g. after a glossary change.
+
+Gemini calls run at bulk priority, so a build sharing a quota with the
+live service only uses its spare capacity. Restart the server to pick up
+a new pack.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from audio_store import AudioStore, make_audio_id
+from phrase_pack import DEFAULT_PATH, PhrasePack, PhrasePackError, audio_dir_for, key_digest, write_pack
+
+
+def read_phrases(paths):
+    phrases = []
+    seen = set()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                phrase = line.strip()
+                if phrase and not phrase.startswith('#') and phrase not in seen:
+                    seen.add(phrase)
+                    phrases.append(phrase)
+    return phrases
+
+
+def load_previous(path, refresh):
+    """Entries of the pack being replaced, or {} to translate everything"""
+    if refresh or not os.path.exists(path):
+        return {}
+    try:
+        pack = PhrasePack(path)
+    except (OSError, PhrasePackError) as e:
+        print(f"⚠️ Warning: Ignoring existing pack: {e}")
+        return {}
+    try:
+        return dict(pack.items())
+    finally:
+        pack.close()
+
+
+def translate_target(app, phrases, source, target, previous):
+    """Translations of phrases into target: returns ({digest: text}, reused, translated, failed)"""
+    # Each executor thread starts from an empty context, so set the priority here
+    app.gemini_request.set(('bulk', None))
+    entries = {}
+    missing = []
+    for phrase in phrases:
+        digest = key_digest(phrase, source, target)
+        if digest in previous:
+            entries[digest] = previous[digest]
+        else:
+            missing.append(phrase)
+    failed = 0
+    for start in range(0, len(missing), app.BATCH_MAX_SEGMENTS):
+        segments = missing[start:start + app.BATCH_MAX_SEGMENTS]
+        for phrase, (translated_text, error) in zip(segments, app.translate_batch(segments, source, target)):
+            if translated_text is None:
+                failed += 1
+                print(f"⚠️ Warning: {source}->{target} failed for {phrase!r}: {error}")
+                continue
+            entries[key_digest(phrase, source, target)] = translated_text
+    return entries, len(phrases) - len(missing), len(missing) - failed, failed
+
+
+def render_audio(app, store, items, concurrency):
+    """Render every (text, language) not in the store yet; returns (rendered, failed)"""
+    unsupported = set()
+
+    def render(item):
+        text, language = item
+        if language in unsupported:
+            return None
+        try:
+            store.get_or_create(text, language, app.synthesize_speech)
+            return True
+        except ValueError as e:
+            # gTTS has no voice for the language
+            if language not in unsupported:
+                unsupported.add(language)
+                print(f"⚠️ Warning: No audio for {language}, skipping the language: {e}")
+        except Exception as e:
+            print(f"⚠️ Warning: Audio for {language} failed for {text!r}: {e}")
+        return False
+
+    todo = [item for item in items if not store.contains(make_audio_id(*item))]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(render, todo))
+    return results.count(True), len(todo) - results.count(True)
+
+
+def prune_audio(directory, keep):
+    removed = 0
+    for entry in os.scandir(directory):
+        audio_id, ext = os.path.splitext(entry.name)
+        if ext == '.mp3' and audio_id not in keep:
+            os.unlink(entry.path)
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('phrases', nargs='+', help='phrase list files, one phrase per line')
+    parser.add_argument('--source', default='en', help='language of the phrase lists')
+    parser.add_argument('--targets', help='comma-separated target languages (default: all supported)')
+    parser.add_argument('--output', default=os.getenv('PHRASE_PACK_PATH') or DEFAULT_PATH)
+    parser.add_argument('--concurrency', type=int, default=4, help='languages translated (and audio rendered) at once')
+    parser.add_argument('--refresh', action='store_true', help='translate every phrase again')
+    parser.add_argument('--no-audio', action='store_true', help='skip pre-rendering audio')
+    args = parser.parse_args()
+
+    # Translate through Gemini, not through the pack being rebuilt
+    os.environ['PHRASE_PACK_PATH'] = ''
+    import app
+
+    if args.source not in app.SUPPORTED_LANGUAGES:
+        raise SystemExit(f"Unsupported source language: {args.source}")
+    targets = args.targets.split(',') if args.targets else \
+        [language for language in app.SUPPORTED_LANGUAGES if language != args.source]
+    unknown = [language for language in targets if language not in app.SUPPORTED_LANGUAGES]
+    if unknown:
+        raise SystemExit(f"Unsupported target languages: {', '.join(unknown)}")
+
+    phrases = read_phrases(args.phrases)
+    previous = load_previous(args.output, args.refresh)
+    print(f"Building {len(phrases)} phrases x {len(targets)} languages "
+          f"({len(previous)} translations in the existing pack)")
+    started = time.perf_counter()
+
+    entries = {}
+    audio_items = []
+    reused = translated = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        results = executor.map(lambda target: (target, translate_target(app, phrases, args.source, target, previous)),
+                               targets)
+        for target, (target_entries, target_reused, target_translated, target_failed) in results:
+            entries.update(target_entries)
+            audio_items.extend((text, target) for text in target_entries.values())
+            reused += target_reused
+            translated += target_translated
+            failed += target_failed
+            print(f"  {args.source}->{target}: {len(target_entries)} phrases")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    write_pack(args.output, entries)
+    print(f"✅ Wrote {len(entries)} translations to {args.output} ({os.path.getsize(args.output)} bytes): "
+          f"{reused} reused, {translated} translated, {failed} failed")
+
+    if not args.no_audio:
+        audio_dir = audio_dir_for(args.output)
+        store = AudioStore(audio_dir, max_bytes=float('inf'))
+        rendered, audio_failed = render_audio(app, store, audio_items, max(1, args.concurrency))
+        removed = prune_audio(audio_dir, {make_audio_id(text, language) for text, language in audio_items})
+        print(f"✅ Audio in {audio_dir}: {rendered} rendered, {audio_failed} failed, {removed} stale removed")
+
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
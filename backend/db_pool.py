@@ -0,0 +1,360 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available before the checkout timeout"""
+
+
+class PooledConnection:
+    """Proxy around a DB-API connection that returns it to its pool on close()
+
+    Used as a context manager it commits on success, rolls back on error and
+    then releases the connection, so ``with get_db_connection() as conn`` keeps
+    working for every backend. A ``nested`` checkout shares the transaction
+    of an outer one on the same connection and leaves the commit to it.
+    """
+
+    def __init__(self, pool, conn, nested=False):
+        self._pool = pool
+        self._conn = conn
+        self._nested = nested
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.putconn(self._conn)
+
+    def discard(self):
+        """Drop the underlying connection instead of returning it to the pool"""
+        if not self._released:
+            self._released = True
+            self._pool.putconn(self._conn, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._nested:
+            self.close()
+            return False
+        if exc_type is None:
+            try:
+                self._conn.commit()
+            except Exception:
+                self.discard()
+                raise
+        else:
+            try:
+                self._conn.rollback()
+            except Exception:
+                # The block's own exception is the one worth reporting
+                self.discard()
+        self.close()
+        return False
+
+
+def _select_one(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool for network databases (postgresql/supabase, mysql)
+
+    Idle connections are kept LIFO so the warmest one is reused first.
+    A connection that has been idle longer than ``check_after`` seconds is
+    health-checked on checkout and transparently replaced if it is dead.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=30.0,
+                 check_after=5.0, max_idle=300.0, health_check=_select_one, name='db'):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.name = name
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self._health_check = health_check
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()  # (conn, released_at)
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._counters = {
+            'created': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+        }
+        self._wait_time_total = 0.0
+
+    def _check_fork(self):
+        # Connections inherited from a parent process share its sockets, so a
+        # forked worker must start with an empty pool rather than reuse them.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def warm_up(self):
+        """Open ``min_size`` connections ahead of the first request"""
+        conns = []
+        try:
+            for _ in range(self.min_size):
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._counters['created'] += 1
+        return conn
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            released_at = None
+            with self._cond:
+                self._check_fork()
+                if not self._idle and self._size >= self.max_size:
+                    self._counters['waits'] += 1
+                    self._waiting += 1
+                    wait_started = time.monotonic()
+                    try:
+                        while not self._idle and self._size >= self.max_size:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self._counters['timeouts'] += 1
+                                raise PoolTimeout(
+                                    f"Timed out after {self.timeout}s waiting for a {self.name} connection")
+                            self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                        self._wait_time_total += time.monotonic() - wait_started
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                conn = self._open()
+            elif not self._is_healthy(conn, released_at):
+                continue
+
+            with self._cond:
+                self._in_use += 1
+                self._counters['checkouts'] += 1
+            return conn
+
+    def _is_healthy(self, conn, released_at):
+        idle_for = time.monotonic() - released_at
+        if idle_for > self.max_idle:
+            self._drop(conn)
+            return False
+        if self._health_check is None or idle_for < self.check_after:
+            return True
+        try:
+            self._health_check(conn)
+            return True
+        except Exception:
+            with self._cond:
+                self._counters['health_check_failures'] += 1
+            self._drop(conn)
+            return False
+
+    def _drop(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+
+    def putconn(self, conn, discard=False):
+        if self._pid != os.getpid():
+            # Belongs to the parent's pool; never touch its socket here.
+            return
+        if not discard:
+            try:
+                # Never hand out a connection with an open transaction.
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+        if discard:
+            self._drop(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def connection(self):
+        return PooledConnection(self, self.getconn())
+
+    def closeall(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'name': self.name,
+                'kind': 'shared',
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'utilization': round(self._in_use / self.max_size, 3),
+                'wait_time_total': round(self._wait_time_total, 6),
+                **self._counters,
+            }
+
+
+class ThreadLocalPool:
+    """One SQLite connection per thread
+
+    sqlite3 connections may not be shared between threads, so instead of a
+    shared queue each thread keeps its own connection open and reuses it.
+    A checkout made while the thread already holds its connection gets the
+    same connection as a nested checkout: only the outermost release
+    commits (as a context manager) and rolls back.
+    """
+
+    def __init__(self, connect, check_after=5.0, health_check=_select_one, name='sqlite'):
+        self.name = name
+        self._connect = connect
+        self.check_after = check_after
+        self._health_check = health_check
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._counters = {
+            'created': 0,
+            'checkouts': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+        }
+        self._in_use = 0
+
+    def warm_up(self):
+        self.putconn(self.getconn())
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            self._counters[key] += delta
+
+    def _depth(self):
+        return getattr(self._local, 'depth', 0)
+
+    def getconn(self):
+        if self._pid != os.getpid():
+            self._reset_state()
+        if self._depth():
+            self._local.depth += 1
+            self._count('checkouts')
+            return self._local.conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._health_check is not None:
+            if time.monotonic() - self._local.released_at >= self.check_after:
+                try:
+                    self._health_check(conn)
+                except Exception:
+                    self._count('health_check_failures')
+                    self._forget(conn)
+                    conn = None
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.released_at = time.monotonic()
+            self._count('created')
+        with self._lock:
+            self._counters['checkouts'] += 1
+            self._in_use += 1
+        self._local.depth = 1
+        return conn
+
+    def _forget(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._local.conn = None
+        self._count('discarded')
+
+    def putconn(self, conn, discard=False):
+        self._local.depth = max(0, self._depth() - 1)
+        if self._local.depth > 0:
+            # An inner release; the outer checkout still owns the transaction
+            return
+        with self._lock:
+            self._in_use -= 1
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            if getattr(self._local, 'conn', None) is conn:
+                self._forget(conn)
+            return
+        self._local.released_at = time.monotonic()
+
+    def connection(self):
+        nested = self._pid == os.getpid() and self._depth() > 0
+        return PooledConnection(self, self.getconn(), nested=nested)
+
+    def closeall(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._forget(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'kind': 'thread_local',
+                'in_use': self._in_use,
+                **self._counters,
+            }
@@ -0,0 +1,116 @@
+import re
+
+from batch_translation import estimate_tokens
+
+# Paragraphs are separated by blank lines; the separator is kept for reassembly
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n\s*')
+# Sentence ends: terminal punctuation followed by whitespace, or CJK terminal punctuation
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+|(?<=[。！？；])\s*|(?<=[۔؟])\s*')
+
+
+def split_paragraphs(text):
+    """List of (paragraph, separator) pairs covering text, separators being the blank lines after each"""
+    pieces = []
+    position = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        pieces.append((text[position:match.start()], match.group()))
+        position = match.end()
+    pieces.append((text[position:], ''))
+    return [(paragraph, separator) for paragraph, separator in pieces if paragraph.strip()]
+
+
+def split_sentences(paragraph):
+    """List of (sentence, separator) pairs covering paragraph"""
+    pieces = []
+    position = 0
+    for match in _SENTENCE_END.finditer(paragraph):
+        if match.end() == len(paragraph):
+            break
+        if match.start() > position:
+            pieces.append((paragraph[position:match.start()], match.group()))
+            position = match.end()
+    pieces.append((paragraph[position:], ''))
+    return pieces
+
+
+def split_words(sentence, token_budget):
+    """Split a sentence longer than the budget at word boundaries"""
+    pieces = []
+    current = []
+    used = 0
+    for word in sentence.split(' '):
+        cost = estimate_tokens(word)
+        if current and used + cost > token_budget:
+            pieces.append((' '.join(current), ' '))
+            current = []
+            used = 0
+        current.append(word)
+        used += cost
+    pieces.append((' '.join(current), ''))
+    return pieces
+
+
+def _chunk(text):
+    """(chunk, separator) pair of text, its trailing whitespace being the separator"""
+    chunk = text.rstrip()
+    return chunk, text[len(chunk):]
+
+
+def chunk_document(text, token_budget=800):
+    """Split a document into (chunk, separator) pairs of at most ~token_budget estimated tokens
+
+    Adjacent paragraphs are packed into one chunk while they fit the budget
+    (the blank lines between them stay inside the chunk), so a document of
+    short paragraphs costs a few Gemini calls rather than one per paragraph.
+    Longer paragraphs are packed sentence by sentence and a sentence longer
+    than the budget is split between words. Joining each chunk with its
+    separator gives back the document.
+    """
+    chunks = []
+    packed = ''
+    for paragraph, paragraph_separator in split_paragraphs(text.strip()):
+        if estimate_tokens(paragraph) <= token_budget:
+            if packed and estimate_tokens(packed + paragraph) > token_budget:
+                chunks.append(_chunk(packed))
+                packed = ''
+            packed += paragraph + paragraph_separator
+            continue
+        if packed:
+            chunks.append(_chunk(packed))
+            packed = ''
+
+        units = []
+        for sentence, separator in split_sentences(paragraph):
+            if estimate_tokens(sentence) > token_budget:
+                words = split_words(sentence, token_budget)
+                words[-1] = (words[-1][0], separator)
+                units.extend(words)
+            else:
+                units.append((sentence, separator))
+
+        current = ''
+        for sentence, separator in units:
+            if current and estimate_tokens(current.rstrip() + sentence) > token_budget:
+                chunks.append(_chunk(current))
+                current = ''
+            current += sentence + separator
+        # The paragraph's last unit has no separator of its own; the paragraph break follows it
+        chunks.append((current.rstrip(), paragraph_separator))
+    if packed:
+        chunks.append(_chunk(packed))
+    return chunks
+
+
+def context_tail(text, max_chars=300):
+    """Last whole sentences of text that fit in max_chars, used as context for the next chunk"""
+    tail = ''
+    for sentence, separator in reversed(split_sentences(text)):
+        candidate = sentence + separator + tail
+        if len(candidate) > max_chars:
+            break
+        tail = candidate
+    if not tail:
+        # A single long sentence: keep its end, starting at a word boundary
+        tail = text[-max_chars:]
+        tail = tail[tail.find(' ') + 1:] if ' ' in tail else tail
+    return tail.strip()
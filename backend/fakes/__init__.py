@@ -0,0 +1 @@
+"""Local stand-ins for the upstream services, for tests and benchmarks"""
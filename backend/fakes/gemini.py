@@ -0,0 +1,146 @@
+"""Fake Gemini REST server
+
+Answers ``POST /models/<model>:generateContent`` and
+``:streamGenerateContent?alt=sse`` with deterministic pseudo-translations.
+Latency, failure rate and scripted status codes are configurable so retry,
+timeout and circuit-breaker behaviour can be exercised locally.
+
+    python -m fakes.gemini --port 8081 --latency 0.2
+    GEMINI_API_BASE=http://127.0.0.1:8081 gunicorn app:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BATCH_ITEMS = re.compile(r'(\[\{"id".*\}\])\s*$', re.S)
+_SINGLE_TEXT = re.compile(r'Text:\s*(.*?)\s*Provide only the translation', re.S)
+
+
+def default_responder(prompt):
+    """Pseudo-translate a prompt built by the app: "[tr] <text>" per segment"""
+    batch = _BATCH_ITEMS.search(prompt)
+    if batch:
+        items = json.loads(batch.group(1))
+        return json.dumps([{'id': item['id'], 'translation': f"[tr] {item['text']}"} for item in items],
+                          ensure_ascii=False)
+    single = _SINGLE_TEXT.search(prompt)
+    return f"[tr] {single.group(1) if single else prompt}"
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, fail_rate=0.0,
+                 fail_status=503, statuses=None, retry_after=None, chunk_size=16, responder=None):
+        super().__init__((host, port), FakeGeminiHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        # Scripted statuses returned by the next requests, e.g. [503, 429, 200]
+        self.statuses = list(statuses or [])
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.responder = responder or default_responder
+        self.requests = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_status(self):
+        with self._lock:
+            if self.statuses:
+                return self.statuses.pop(0)
+        if self.fail_rate and random.random() < self.fail_rate:
+            return self.fail_status
+        return 200
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-gemini', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        with server._lock:
+            server.requests.append({'path': self.path, 'payload': payload})
+
+        delay = server.latency + (random.uniform(0, server.jitter) if server.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        status = server.next_status()
+        if status != 200:
+            headers = {'Retry-After': str(server.retry_after)} if server.retry_after is not None else None
+            self._send_json(status, {'error': {'code': status, 'message': 'fake upstream failure'}}, headers)
+            return
+
+        prompt = payload['contents'][0]['parts'][0]['text']
+        text = server.responder(prompt)
+        if ':streamGenerateContent' in self.path:
+            self._stream(text)
+        elif ':generateContent' in self.path:
+            self._send_json(200, {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]})
+        else:
+            self._send_json(404, {'error': {'code': 404, 'message': 'unknown method'}})
+
+    def _stream(self, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        size = self.server.chunk_size
+        for start in range(0, len(text), size):
+            chunk = {'candidates': [{'content': {'parts': [{'text': text[start:start + size]}], 'role': 'model'}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode('utf-8'))
+            self.wfile.flush()
+        self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Gemini generateContent server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency up to this many seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--fail-status', type=int, default=503)
+    parser.add_argument('--retry-after', type=float, default=None)
+    args = parser.parse_args()
+    server = FakeGeminiServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                              fail_rate=args.fail_rate, fail_status=args.fail_status,
+                              retry_after=args.retry_after)
+    print(f"Fake Gemini listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
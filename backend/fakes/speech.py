@@ -0,0 +1,72 @@
+"""Fake Google Cloud Speech client
+
+Implements the parts of ``speech.SpeechClient`` the app uses (``recognize``
+and ``streaming_recognize``) without network access. Every
+``bytes_per_word`` bytes of audio become one word of transcript; interim
+results are emitted while a phrase is building up and a final result closes
+each phrase. Select it with ``SPEECH_BACKEND=fake``; ``FAKE_SPEECH_LATENCY``
+and ``FAKE_SPEECH_CHUNK_LATENCY`` set its delays.
+"""
+import os
+import time
+from types import SimpleNamespace
+
+
+def _result(transcript, is_final, stability=0.0):
+    return SimpleNamespace(
+        alternatives=[SimpleNamespace(transcript=transcript, confidence=0.9 if is_final else 0.0)],
+        is_final=is_final,
+        stability=stability,
+    )
+
+
+class FakeSpeechClient:
+    def __init__(self, bytes_per_word=16000, words_per_phrase=8, latency=0.0, chunk_latency=0.0):
+        self.bytes_per_word = bytes_per_word
+        self.words_per_phrase = words_per_phrase
+        # latency: per call; chunk_latency: per streaming request consumed
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(latency=float(os.getenv('FAKE_SPEECH_LATENCY', '0')),
+                   chunk_latency=float(os.getenv('FAKE_SPEECH_CHUNK_LATENCY', '0')))
+
+    def _words(self, byte_count, start=0):
+        return [f"word{start + i + 1}" for i in range(byte_count // self.bytes_per_word)]
+
+    def recognize(self, config=None, audio=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        words = self._words(len(audio.content))
+        results = []
+        for start in range(0, len(words), self.words_per_phrase):
+            results.append(_result(' '.join(words[start:start + self.words_per_phrase]) + ' ', True))
+        return SimpleNamespace(results=results)
+
+    def streaming_recognize(self, config=None, requests=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        interim = getattr(config, 'interim_results', False)
+        received = 0
+        emitted = 0
+        phrase = []
+        for request in requests:
+            if self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            received += len(request.audio_content)
+            new_words = received // self.bytes_per_word - emitted
+            for _ in range(new_words):
+                emitted += 1
+                phrase.append(f"word{emitted}")
+                if len(phrase) >= self.words_per_phrase:
+                    yield SimpleNamespace(results=[_result(' '.join(phrase) + ' ', True)])
+                    phrase = []
+                elif interim:
+                    yield SimpleNamespace(results=[_result(' '.join(phrase), False, 0.5)])
+        if phrase:
+            yield SimpleNamespace(results=[_result(' '.join(phrase) + ' ', True)])
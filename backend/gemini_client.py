@@ -0,0 +1,335 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(GeminiError):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast for ``reset_timeout`` seconds. Then a single probe is let
+    through (half-open): success closes the circuit, failure re-opens it,
+    and any other answer from upstream (a 429) also ends the probe.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_answered(self):
+        """Upstream answered but is rate limiting: it is up, so a half-open probe closes the circuit"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+            }
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_text(result):
+    """Text of the first candidate in a generateContent response, or None"""
+    candidates = result.get('candidates') or []
+    if not candidates:
+        return None
+    parts = candidates[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts)
+
+
+class _GeminiBase:
+    """Retry, backoff and circuit-breaker policy shared by the sync and async clients"""
+
+    def __init__(self, api_key, model='gemini-2.0-flash', base_url=DEFAULT_BASE_URL,
+                 connect_timeout=5.0, read_timeout=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=20.0, max_retry_after=60.0, breaker=None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'retries': 0,
+            'errors': 0,
+            'rate_limited': 0,
+            'short_circuited': 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retrying workers from synchronizing
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _url(self, method):
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def _headers(self, api_key=None):
+        return {
+            "Content-Type": "application/json",
+            "x-goog-api-key": api_key or self.api_key,
+        }
+
+    def _start_attempt(self):
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError("API Error: Gemini circuit breaker is open", status_code=503)
+        self._count('requests')
+
+    def _transport_error(self, error, attempt):
+        """Record a connection error or timeout; returns the retry delay or raises"""
+        self.breaker.record_failure()
+        self._count('errors')
+        if attempt >= self.max_retries:
+            raise GeminiError(f"API Error: {error.__class__.__name__} - {error}")
+        self._count('retries')
+        return self._backoff(attempt)
+
+    def _error_status(self, status_code, text, headers, attempt):
+        """Record a non-200 response; returns the retry delay or raises"""
+        self._count('errors')
+        if status_code not in RETRYABLE_STATUSES:
+            # The upstream answered; a 4xx is our problem, not an outage
+            self.breaker.record_success()
+            raise GeminiError(f"API Error: {status_code} - {text}", status_code=status_code)
+        if status_code == 429:
+            self._count('rate_limited')
+            self.breaker.record_answered()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            raise GeminiError(f"API Error: {status_code} - {text}", status_code=status_code)
+        self._count('retries')
+        delay = parse_retry_after(headers.get('Retry-After'))
+        if delay is None:
+            return self._backoff(attempt)
+        return min(delay, self.max_retry_after)
+
+    @staticmethod
+    def build_payload(prompt, generation_config=None):
+        payload = {
+            "contents": [
+                {
+                    "parts": [
+                        {
+                            "text": prompt
+                        }
+                    ]
+                }
+            ]
+        }
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return payload
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {**counters, 'circuit': self.breaker.stats()}
+
+
+class GeminiClient(_GeminiBase):
+    """Gemini REST client with a pooled keep-alive session, timeouts, retries and a circuit breaker
+
+    ``base_url`` can point at a local fake server (see ``fakes.gemini``).
+    """
+
+    def __init__(self, api_key, pool_size=20, session=None, sleep=time.sleep, **kwargs):
+        super().__init__(api_key, **kwargs)
+        self._sleep = sleep
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    def _post(self, method, payload, stream=False, params=None, api_key=None):
+        url = self._url(method)
+        headers = self._headers(api_key)
+        attempt = 0
+        while True:
+            self._start_attempt()
+            try:
+                response = self.session.post(url, headers=headers, json=payload, params=params,
+                                             timeout=(self.connect_timeout, self.read_timeout), stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self._transport_error(e, attempt)
+            except BaseException:
+                # Any other failure (bad encoding, invalid URL, interrupt) still counts,
+                # so a half-open probe cannot leave the breaker stuck
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response
+                try:
+                    delay = self._error_status(response.status_code, response.text, response.headers, attempt)
+                finally:
+                    response.close()
+            attempt += 1
+            self._sleep(delay)
+
+    def generate(self, payload, api_key=None):
+        """POST a raw generateContent payload and return the decoded JSON response"""
+        response = self._post('generateContent', payload, api_key=api_key)
+        return response.json()
+
+    def generate_content(self, prompt, generation_config=None):
+        """Send a single prompt and return the text of the first candidate"""
+        result = self.generate(self.build_payload(prompt, generation_config))
+        text = extract_text(result)
+        if text is None:
+            raise GeminiError("No translation result received")
+        return text
+
+    def stream_generate_content(self, prompt, generation_config=None):
+        """Yield text fragments from streamGenerateContent as they arrive"""
+        payload = self.build_payload(prompt, generation_config)
+        with self._post('streamGenerateContent', payload, stream=True, params={'alt': 'sse'}) as response:
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    text = extract_text(json.loads(line[len('data:'):]))
+                    if text:
+                        yield text
+            except Exception:
+                # The stream broke off (or was garbled) after a 200; a consumer that
+                # stops early raises GeneratorExit instead and is not counted
+                self.breaker.record_failure()
+                raise
+
+
+class AsyncGeminiClient(_GeminiBase):
+    """asyncio counterpart of GeminiClient built on an httpx.AsyncClient
+
+    Shares the retry/backoff policy and can share a CircuitBreaker with the
+    sync client. Call ``aclose()`` on shutdown.
+    """
+
+    def __init__(self, api_key, pool_size=100, client=None, **kwargs):
+        super().__init__(api_key, **kwargs)
+        if client is None:
+            import httpx
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            )
+        self.client = client
+
+    async def generate(self, payload, api_key=None):
+        """POST a raw generateContent payload and return the decoded JSON response"""
+        import httpx
+        url = self._url('generateContent')
+        headers = self._headers(api_key)
+        attempt = 0
+        while True:
+            self._start_attempt()
+            try:
+                response = await self.client.post(url, headers=headers, json=payload)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                delay = self._transport_error(e, attempt)
+            except BaseException:
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response.json()
+                delay = self._error_status(response.status_code, response.text, response.headers, attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def generate_content(self, prompt, generation_config=None):
+        """Send a single prompt and return the text of the first candidate"""
+        result = await self.generate(self.build_payload(prompt, generation_config))
+        text = extract_text(result)
+        if text is None:
+            raise GeminiError("No translation result received")
+        return text
+
+    async def aclose(self):
+        await self.client.aclose()
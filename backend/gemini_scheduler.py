@@ -0,0 +1,230 @@
+import asyncio
+import bisect
+import itertools
+import math
+import threading
+import time
+
+# Highest first; the index is the queue rank
+PRIORITIES = ('urgent', 'normal', 'bulk')
+
+# Share of each budget a priority must leave untouched, so bulk work runs
+# dry first and urgent requests always find some quota
+DEFAULT_RESERVES = {'urgent': 0.0, 'normal': 0.1, 'bulk': 0.3}
+
+
+class SchedulerRejected(Exception):
+    """The Gemini call was not admitted: shed for more urgent work, or it could not start in time"""
+
+    def __init__(self, message, reason, retry_after=1):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """``per_minute`` units refilled continuously, holding at most a minute's worth"""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._clock = clock
+        self.level = self.capacity
+        self._updated = clock()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount, floor=0.0):
+        """Seconds until amount can be taken leaving at least floor (refill() first)"""
+        # A request larger than the whole budget waits for a full bucket rather than forever
+        needed = min(amount, self.capacity) + floor
+        if needed > self.capacity:
+            needed = self.capacity
+        return max(0.0, needed - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ('rank', 'seq', 'tokens', 'deadline', 'enqueued', 'rejected')
+
+    def __init__(self, rank, seq, tokens, deadline, enqueued):
+        self.rank = rank
+        self.seq = seq
+        self.tokens = tokens
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.rejected = None
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class GeminiScheduler:
+    """Admission control for Gemini calls under a requests- and tokens-per-minute quota
+
+    Callers ``acquire`` before calling Gemini, giving a priority, the
+    estimated token cost and optionally a deadline (clock time by which the
+    call must start). Waiting calls are admitted strictly in priority order,
+    FIFO within a priority, as the token buckets refill; each priority may
+    only draw a bucket down to its reserve.
+
+    A call whose estimated wait already overruns its deadline is rejected
+    at once instead of timing out in the queue. When the queue is full a
+    newcomer displaces the lowest-priority, most recent waiter if it
+    outranks it, and is rejected otherwise. Rejections raise
+    SchedulerRejected. With no quota configured every call is admitted
+    immediately.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_queue=200, reserves=None,
+                 poll_interval=0.02, observe_wait=None, clock=time.monotonic):
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self.max_queue = max_queue
+        self.reserves = {**DEFAULT_RESERVES, **(reserves or {})}
+        self.poll_interval = poll_interval
+        self.observe_wait = observe_wait
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._waiting = []  # sorted by (rank, seq)
+        self._seq = itertools.count()
+        self.counters = {priority: {'admitted': 0, 'deadline': 0, 'shed': 0, 'queue_full': 0}
+                         for priority in PRIORITIES}
+        self.wait_seconds = {priority: 0.0 for priority in PRIORITIES}
+
+    def _buckets(self, tokens):
+        return [(bucket, amount) for bucket, amount in ((self.requests, 1), (self.tokens, tokens))
+                if bucket is not None]
+
+    def _refill(self, now):
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.refill(now)
+
+    def _estimate(self, waiter):
+        """Rough seconds until waiter is admitted: everyone ahead of it has to be paid for first"""
+        ahead = self._waiting[:bisect.bisect_left(self._waiting, waiter)]
+        reserve = self.reserves[PRIORITIES[waiter.rank]]
+        estimate = 0.0
+        for bucket, amount in self._buckets(waiter.tokens):
+            needed = amount + sum(1 if bucket is self.requests else other.tokens for other in ahead)
+            estimate = max(estimate, max(0.0, needed + reserve * bucket.capacity - bucket.level) / bucket.rate)
+        return estimate
+
+    def _reject(self, priority, reason, message, retry_after=1):
+        self.counters[priority][reason] += 1
+        raise SchedulerRejected(message, reason, max(1, math.ceil(retry_after)))
+
+    def _enqueue(self, priority, tokens, deadline):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        now = self._clock()
+        waiter = _Waiter(PRIORITIES.index(priority), next(self._seq), tokens, deadline, now)
+        self._refill(now)
+        if len(self._waiting) >= self.max_queue:
+            victim = self._waiting[-1]
+            if victim.rank <= waiter.rank:
+                self._reject(priority, 'queue_full', "Translation queue is full, please try again later")
+            self._waiting.pop()
+            victim.rejected = 'shed'
+            self._cond.notify_all()
+        if deadline is not None:
+            estimate = self._estimate(waiter)
+            if now + estimate > deadline:
+                self._reject(priority, 'deadline', "Translation quota exhausted, please try again later",
+                             estimate)
+        bisect.insort(self._waiting, waiter)
+        return waiter
+
+    def _poll(self, waiter):
+        """Admit waiter if it heads the queue and the budget allows
+
+        Returns 0 once admitted, else the seconds worth waiting (None: until
+        notified). Raises SchedulerRejected if it was shed or its deadline passed.
+        """
+        priority = PRIORITIES[waiter.rank]
+        if waiter.rejected is not None:
+            self._reject(priority, waiter.rejected, "Translation request shed for more urgent work")
+        now = self._clock()
+        if waiter.deadline is not None and now >= waiter.deadline:
+            self._waiting.remove(waiter)
+            self._cond.notify_all()
+            self._reject(priority, 'deadline', "Translation quota exhausted, please try again later")
+        if self._waiting[0] is not waiter:
+            return None
+        self._refill(now)
+        reserve = self.reserves[priority]
+        delay = max([bucket.time_until(amount, reserve * bucket.capacity)
+                     for bucket, amount in self._buckets(waiter.tokens)] or [0.0])
+        if delay > 0:
+            return delay
+        for bucket, amount in self._buckets(waiter.tokens):
+            bucket.take(amount)
+        self._waiting.pop(0)
+        waited = now - waiter.enqueued
+        self.counters[priority]['admitted'] += 1
+        self.wait_seconds[priority] += waited
+        self._cond.notify_all()
+        if self.observe_wait is not None:
+            self.observe_wait(priority, waited)
+        return 0
+
+    def _timeout(self, waiter, delay):
+        timeouts = [value for value in (delay, None if waiter.deadline is None
+                                        else waiter.deadline - self._clock()) if value is not None]
+        return max(0.0, min(timeouts)) if timeouts else None
+
+    def acquire(self, priority='normal', tokens=1, deadline=None):
+        """Block until a Gemini call of this priority and estimated token cost may start"""
+        with self._cond:
+            waiter = self._enqueue(priority, tokens, deadline)
+            while True:
+                delay = self._poll(waiter)
+                if delay == 0:
+                    return
+                self._cond.wait(self._timeout(waiter, delay))
+
+    async def acquire_async(self, priority='normal', tokens=1, deadline=None):
+        """acquire() for coroutines; waits by polling the queue every poll_interval"""
+        with self._cond:
+            waiter = self._enqueue(priority, tokens, deadline)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._poll(waiter)
+                    if delay == 0:
+                        return
+                    timeout = self._timeout(waiter, min(delay or self.poll_interval, self.poll_interval))
+                await asyncio.sleep(timeout)
+        except asyncio.CancelledError:
+            with self._cond:
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+                    self._cond.notify_all()
+            raise
+
+    def throttle(self, seconds):
+        """Upstream answered 429 anyway (the quota is shared): admit nothing for about this long"""
+        if self.requests is None:
+            return
+        with self._cond:
+            self._refill(self._clock())
+            self.requests.level = -self.requests.rate * seconds
+
+    def stats(self):
+        with self._cond:
+            self._refill(self._clock())
+            depth = {priority: 0 for priority in PRIORITIES}
+            for waiter in self._waiting:
+                depth[PRIORITIES[waiter.rank]] += 1
+            return {
+                'requests_available': round(self.requests.level, 2) if self.requests is not None else None,
+                'tokens_available': round(self.tokens.level) if self.tokens is not None else None,
+                'queue_depth': depth,
+                'counters': {priority: dict(counts) for priority, counts in self.counters.items()},
+                'wait_seconds_total': {priority: round(value, 6) for priority, value in self.wait_seconds.items()},
+            }
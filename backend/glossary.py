@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+import unicodedata
+
+from translation_cache import normalize_text
+
+# Words are runs of word characters; CJK ideographs and kana are one token each
+# since those scripts do not separate words with spaces
+_TOKEN = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿]|\w+')
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def tokenize(text):
+    """List of (token, start, end) with casefolded tokens and character offsets into text"""
+    return [(m.group().casefold(), m.start(), m.end()) for m in _TOKEN.finditer(text)]
+
+
+def term_key(text):
+    """Casefolded token sequence a term is matched on"""
+    return tuple(token for token, _, _ in tokenize(normalize_text(text)))
+
+
+def numbers(text):
+    """Numbers in text with native digits mapped to ASCII and ',' decimals to '.'"""
+    found = []
+    for match in _NUMBER.finditer(text):
+        value = ''.join(str(unicodedata.digit(ch)) if ch.isdigit() else '.' for ch in match.group())
+        found.append(value)
+    return found
+
+
+class TermMatcher:
+    """Aho-Corasick automaton over word tokens
+
+    The trie is built on tokens rather than characters, so a match always
+    covers whole words and a 100k-term glossary needs only a few hundred
+    thousand states. Scanning a text is one pass over its tokens, whatever
+    the number of terms.
+    """
+
+    def __init__(self, keys):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]  # state -> ((length, key index), ...) of terms ending there
+        for index, key in enumerate(keys):
+            if key:
+                self._insert(key, index)
+        self._link()
+
+    def _insert(self, key, index):
+        state = 0
+        for token in key:
+            next_state = self.goto[state].get(token)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][token] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            state = next_state
+        self.out[state] = ((len(key), index),)
+
+    def _link(self):
+        # Breadth-first so a state's failure link is final before its children use it
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for token, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(token, 0)
+                self.fail[child] = target if target != child else 0
+                if self.out[self.fail[child]]:
+                    self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    @property
+    def states(self):
+        return len(self.goto)
+
+    def iter_matches(self, tokens):
+        """Yield (first token, last token, key index) for every term occurrence, overlapping included"""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length, index in out[state]:
+                yield position - length + 1, position, index
+
+    def find(self, tokens):
+        """Leftmost-longest, non-overlapping matches as sorted (first token, last token, key index)"""
+        matches = sorted(self.iter_matches(tokens), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        covered_until = -1
+        for first, last, index in matches:
+            if first > covered_until:
+                selected.append((first, last, index))
+                covered_until = last
+        return selected
+
+
+class TermTable:
+    """Source term -> required target term for one (input, output) language pair"""
+
+    def __init__(self, entries):
+        self.sources = []
+        self.targets = []
+        self.target_keys = []
+        seen = {}
+        keys = []
+        for source, target in entries:
+            key = term_key(source)
+            if not key or not target.strip():
+                continue
+            if key in seen:
+                # Later entries override earlier ones
+                self.targets[seen[key]] = target.strip()
+                self.target_keys[seen[key]] = term_key(target)
+                continue
+            seen[key] = len(keys)
+            keys.append(key)
+            self.sources.append(source.strip())
+            self.targets.append(target.strip())
+            self.target_keys.append(term_key(target))
+        self.matcher = TermMatcher(keys)
+
+    def __len__(self):
+        return len(self.sources)
+
+
+class Glossary:
+    """Per-language-pair medical term tables
+
+    ``tag`` finds glossary terms in a source text, ``prompt_section`` turns
+    them into required renderings for the prompt and ``check`` reports the
+    ones a translation did not use, plus numbers (doses, strengths) that did
+    not survive translation.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def set_terms(self, input_language, output_language, entries):
+        """Replace the term table of a language pair with (source, target) entries"""
+        table = TermTable(entries)
+        with self._lock:
+            self._tables[(input_language, output_language)] = table
+        return len(table)
+
+    def load_dir(self, path):
+        """Load every ``<input>.<output>.tsv`` file in path; returns the number of terms
+
+        Each line is ``source<TAB>target``; blank lines and lines starting
+        with '#' are skipped.
+        """
+        total = 0
+        for name in sorted(os.listdir(path)):
+            parts = name.split('.')
+            if len(parts) != 3 or parts[2] != 'tsv':
+                continue
+            with open(os.path.join(path, name), encoding='utf-8') as f:
+                entries = [line.rstrip('\n').split('\t', 1) for line in f
+                           if line.strip() and not line.startswith('#') and '\t' in line]
+            total += self.set_terms(parts[0], parts[1], entries)
+        return total
+
+    def table(self, input_language, output_language):
+        return self._tables.get((input_language, output_language))
+
+    def tag(self, text, input_language, output_language):
+        """Glossary terms found in text as (start, end, source, target), in order of appearance"""
+        table = self.table(input_language, output_language)
+        if table is None:
+            return []
+        tokens = tokenize(text)
+        return [(tokens[first][1], tokens[last][2], table.sources[index], table.targets[index])
+                for first, last, index in table.matcher.find([token for token, _, _ in tokens])]
+
+    @staticmethod
+    def prompt_section(terms):
+        """Required renderings for the prompt, one line per distinct term"""
+        lines = []
+        seen = set()
+        for _, _, source, target in terms:
+            if source not in seen:
+                seen.add(source)
+                lines.append(f'- "{source}" → "{target}"')
+        return '\n'.join(lines)
+
+    def check(self, text, translated_text, input_language, output_language, terms=None):
+        """Terminology violations in a translation as a list of dicts
+
+        ``terms`` are the tags of text, when the caller already has them.
+        """
+        if terms is None:
+            terms = self.tag(text, input_language, output_language)
+        violations = []
+        if terms:
+            output = ' ' + ' '.join(token for token, _, _ in tokenize(translated_text)) + ' '
+            seen = set()
+            for _, _, source, target in terms:
+                if source in seen:
+                    continue
+                seen.add(source)
+                if ' ' + ' '.join(term_key(target)) + ' ' not in output:
+                    violations.append({'type': 'term', 'source': source, 'expected': target})
+        missing = set(numbers(text)) - set(numbers(translated_text))
+        for value in sorted(missing):
+            violations.append({'type': 'number', 'expected': value})
+        return violations
+
+    def stats(self):
+        with self._lock:
+            tables = dict(self._tables)
+        return {
+            'language_pairs': len(tables),
+            'terms': sum(len(table) for table in tables.values()),
+            'states': sum(table.matcher.states for table in tables.values()),
+        }
@@ -0,0 +1,155 @@
+import re
+
+_TERM = re.compile(r'\w+')
+MAX_TERMS = 16
+
+# InnoDB does not index these (innodb_ft_min_token_size and the default
+# stopword list), so requiring one would match no rows at all
+MYSQL_MIN_TOKEN_SIZE = 3
+MYSQL_STOPWORDS = frozenset((
+    'a about an are as at be by com de en for from how i in is it la of on or that the this to was '
+    'what when where who will with und www'
+).split())
+
+
+def search_terms(query):
+    """Words of a search box query, lowercased; operators and punctuation are dropped"""
+    return [term.lower() for term in _TERM.findall(query)][:MAX_TERMS]
+
+
+def match_expression(dialect, terms):
+    """Full-text query matching rows that contain every term, the last one as a prefix
+
+    The prefix lets a half-typed last word ("metf") still match while the
+    user is typing.
+    """
+    if dialect == 'sqlite':
+        # FTS5: quoted strings are literal tokens, juxtaposition means AND
+        return ' '.join(f'"{term}"' for term in terms[:-1]) + (' ' if len(terms) > 1 else '') + f'"{terms[-1]}"*'
+    if dialect == 'mysql':
+        # InnoDB boolean mode: + marks a required word, * a prefix; words InnoDB
+        # does not index are left optional
+        def required(term):
+            indexed = len(term) >= MYSQL_MIN_TOKEN_SIZE and term not in MYSQL_STOPWORDS
+            return f'+{term}' if indexed else term
+        return ' '.join(required(term) for term in terms[:-1]) + (' ' if len(terms) > 1 else '') + \
+            f'{required(terms[-1])}*'
+    # to_tsquery: & is AND, :* a prefix
+    return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+
+def ensure_search_index(cursor, dialect, migrate=False):
+    """Create the full-text index over original_text and translated_text if it is missing
+
+    SQLite gets an external-content FTS5 table kept in sync by triggers,
+    Postgres a generated tsvector column with a GIN index and MySQL a
+    FULLTEXT index; all three are maintained by the database on insert.
+
+    On Postgres adding the stored column rewrites the whole table under an
+    exclusive lock, and on MySQL the first FULLTEXT index rebuilds it, so
+    with rows in the table this only happens with ``migrate``. Returns
+    whether the index exists.
+    """
+    if dialect == 'sqlite':
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history_fts'")
+        exists = cursor.fetchone() is not None
+        cursor.executescript('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+                original_text, translated_text, content='chat_history', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+                INSERT INTO chat_history_fts (rowid, original_text, translated_text)
+                VALUES (new.id, new.original_text, new.translated_text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+                INSERT INTO chat_history_fts (chat_history_fts, rowid, original_text, translated_text)
+                VALUES ('delete', old.id, old.original_text, old.translated_text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF original_text, translated_text
+            ON chat_history BEGIN
+                INSERT INTO chat_history_fts (chat_history_fts, rowid, original_text, translated_text)
+                VALUES ('delete', old.id, old.original_text, old.translated_text);
+                INSERT INTO chat_history_fts (rowid, original_text, translated_text)
+                VALUES (new.id, new.original_text, new.translated_text);
+            END;
+        ''')
+        if not exists:
+            # Index the rows written before the FTS table existed
+            cursor.execute("INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')")
+    elif dialect == 'mysql':
+        cursor.execute('''
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'chat_history'
+              AND index_name = 'idx_chat_history_fulltext'
+        ''')
+        if cursor.fetchone() is not None:
+            return True
+        if not migrate and not _is_empty(cursor):
+            return False
+        cursor.execute('ALTER TABLE chat_history ADD FULLTEXT INDEX idx_chat_history_fulltext (original_text, translated_text)')
+    else:
+        cursor.execute('''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'chat_history' AND column_name = 'search_vector'
+        ''')
+        has_column = cursor.fetchone() is not None
+        cursor.execute('''
+            SELECT 1 FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = 'chat_history' AND indexname = 'idx_chat_history_search'
+        ''')
+        has_index = cursor.fetchone() is not None
+        if has_column and has_index:
+            return True
+        if not migrate and not _is_empty(cursor):
+            return False
+        if not has_column:
+            # 'simple' does no stemming, which suits a table holding many languages
+            cursor.execute('''
+                ALTER TABLE chat_history ADD COLUMN search_vector tsvector
+                GENERATED ALWAYS AS (to_tsvector('simple', original_text || ' ' || translated_text)) STORED
+            ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_search ON chat_history USING GIN (search_vector)')
+    return True
+
+
+def _is_empty(cursor):
+    cursor.execute('SELECT 1 FROM chat_history LIMIT 1')
+    return cursor.fetchone() is None
+
+
+def search_query(dialect, param, expression, conditions, values, limit, offset):
+    """(sql, params) selecting matching history rows, best match first
+
+    ``conditions`` are extra filters on the ``h`` (chat_history) alias with
+    ``values`` as their parameters.
+    """
+    columns = 'h.id, h.date, h.original_text, h.translated_text, h.input_language, h.output_language, h.audio_path'
+    where = ''.join(f' AND {condition}' for condition in conditions)
+    params = [expression, *values, limit, offset]
+    if dialect == 'sqlite':
+        sql = f'''
+            SELECT {columns}
+            FROM chat_history_fts JOIN chat_history h ON h.id = chat_history_fts.rowid
+            WHERE chat_history_fts MATCH {param}{where}
+            ORDER BY bm25(chat_history_fts), h.id DESC
+            LIMIT {param} OFFSET {param}
+        '''
+    elif dialect == 'mysql':
+        match = f'MATCH (h.original_text, h.translated_text) AGAINST ({param} IN BOOLEAN MODE)'
+        sql = f'''
+            SELECT {columns}, {match} AS score
+            FROM chat_history h
+            WHERE {match}{where}
+            ORDER BY score DESC, h.id DESC
+            LIMIT {param} OFFSET {param}
+        '''
+        params = [expression] + params
+    else:
+        sql = f'''
+            SELECT {columns}
+            FROM chat_history h, to_tsquery('simple', {param}) query
+            WHERE h.search_vector @@ query{where}
+            ORDER BY ts_rank(h.search_vector, query) DESC, h.id DESC
+            LIMIT {param} OFFSET {param}
+        '''
+    return sql, params
@@ -0,0 +1,211 @@
+import queue
+import threading
+import time
+
+
+class _Ack:
+    """Completion signal for a durable submit"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class HistoryWriter:
+    """Write-behind queue for chat_history rows
+
+    Requests hand their rows to ``submit`` and a background thread writes
+    them with ``write_rows`` (one executemany and one commit) per batch of up
+    to ``batch_size`` rows, or after ``flush_interval`` seconds, whichever
+    comes first. Under load many requests share one transaction and one
+    fsync, and no request waits on the database.
+
+    With ``durable=True`` ``submit`` blocks until the batch holding its rows
+    is committed and raises if the write failed or was not confirmed within
+    its timeout (TimeoutError; the rows may still be committed later, so
+    they are not written again inline). Batches then do not wait
+    for ``flush_interval``: whatever queued up during the previous commit is
+    written together (group commit).
+
+    Rows that cannot be written after ``max_attempts`` tries, or that are
+    still queued when ``close`` gives up, are passed to
+    ``on_drop(rows, error)`` so each one can be logged. With ``key(row)``
+    (e.g. the row's user), ``wait_written(key)`` lets a reader wait for
+    that key's queued rows to reach the database first.
+    """
+
+    def __init__(self, write_rows, batch_size=200, flush_interval=0.05, max_queue=10000,
+                 durable=False, max_attempts=3, retry_delay=0.5, on_drop=None, key=None):
+        self.write_rows = write_rows
+        self.on_drop = on_drop
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durable = durable
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        self._unwritten = {}  # key -> queued or in-flight row count
+        self._closed = False
+        self.rows_written = 0
+        self.batches = 0
+        self.rows_dropped = 0
+        self.write_errors = 0
+        self.inline_writes = 0
+        self.commit_timeouts = 0
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            setattr(self, key, getattr(self, key) + delta)
+
+    def submit(self, rows, timeout=5.0):
+        """Queue rows for writing; durable writers return only once they are committed
+
+        timeout bounds the wait for queue space and, when durable, the wait
+        for the commit.
+        """
+        if not rows:
+            return
+        ack = _Ack() if self.durable else None
+        if self._closed:
+            self._write_inline(rows)
+            return
+        self._track(rows, 1)
+        try:
+            self._queue.put((rows, ack), timeout=timeout)
+        except queue.Full:
+            self._track(rows, -1)
+            # The writer cannot keep up; write in the request rather than lose rows
+            self._write_inline(rows)
+            return
+        if ack is not None:
+            if not ack.done.wait(timeout):
+                self._count('commit_timeouts')
+                raise TimeoutError(f"History rows not committed within {timeout}s")
+            if ack.error is not None:
+                raise ack.error
+
+    def _track(self, rows, delta):
+        if self.key is None:
+            return
+        with self._settled:
+            for row in rows:
+                key = self.key(row)
+                count = self._unwritten.get(key, 0) + delta
+                if count:
+                    self._unwritten[key] = count
+                else:
+                    del self._unwritten[key]
+            if delta < 0:
+                self._settled.notify_all()
+
+    def wait_written(self, key, timeout=None):
+        """Wait until no row of key is queued or being written; False on timeout"""
+        with self._settled:
+            return self._settled.wait_for(lambda: key not in self._unwritten, timeout)
+
+    def _drop(self, rows, error):
+        self._count('rows_dropped', len(rows))
+        if self.on_drop is not None:
+            try:
+                self.on_drop(rows, error)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not report dropped history rows: {e}")
+        else:
+            print(f"⚠️ Warning: Dropped {len(rows)} history rows: {error}")
+
+    def _write_inline(self, rows):
+        self._count('inline_writes')
+        self.write_rows(rows)
+        self._count('rows_written', len(rows))
+
+    def _collect(self, first):
+        """Gather queued items into one batch, waiting at most flush_interval after the first"""
+        items = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + (0 if self.durable else self.flush_interval)
+        while size < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Close requested: put the marker back so the loop sees it after this batch
+                self._queue.put(None)
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _write_batch(self, items):
+        rows = [row for item_rows, _ in items for row in item_rows]
+        error = None
+        for attempt in range(self.max_attempts):
+            try:
+                self.write_rows(rows)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                self._count('write_errors')
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(self.retry_delay * (2 ** attempt))
+        if error is None:
+            self._count('rows_written', len(rows))
+            self._count('batches')
+        else:
+            self._drop(rows, RuntimeError(f"{self.max_attempts} failed writes, last: {error}"))
+        self._track(rows, -1)
+        for _, ack in items:
+            if ack is not None:
+                ack.error = error
+                ack.done.set()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._write_batch(self._collect(first))
+
+    def close(self, timeout=10.0):
+        """Write everything still queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            return
+        # The writer is stuck; whatever is still queued will not be written
+        error = TimeoutError(f"History writer did not finish within {timeout}s of closing")
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                rows, ack = item
+                self._drop(rows, error)
+                self._track(rows, -1)
+                if ack is not None:
+                    ack.error = error
+                    ack.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'durable': self.durable,
+                'queued': self._queue.qsize(),
+                'rows_written': self.rows_written,
+                'batches': self.batches,
+                'rows_dropped': self.rows_dropped,
+                'write_errors': self.write_errors,
+                'inline_writes': self.inline_writes,
+                'commit_timeouts': self.commit_timeouts,
+            }
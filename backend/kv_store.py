@@ -0,0 +1,233 @@
+import heapq
+import threading
+import time
+
+
+class MemoryKVStore:
+    """Single-process key-value store with per-key TTL
+
+    Expiry times are kept in a min-heap next to the dict, so every call
+    drops the entries that have expired since the last one in
+    O(log n) each, and memory stays bounded by the live keys instead of
+    growing until someone reads a stale entry. Heap entries whose key was
+    overwritten or deleted are skipped when they surface.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._data = {}  # key -> (value, expires_at)
+        self._expiry = []  # (expires_at, key) min-heap
+        self._lock = threading.Lock()
+        self.expirations = 0
+
+    def _purge(self, now):
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(expiry)
+            entry = self._data.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._data[key]
+                self.expirations += 1
+
+    def _set(self, key, value, ttl, now):
+        expires_at = now + ttl
+        self._data[key] = (value, expires_at)
+        heapq.heappush(self._expiry, (expires_at, key))
+
+    def get(self, key):
+        with self._lock:
+            self._purge(self._clock())
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = self._clock()
+            self._purge(now)
+            self._set(key, value, ttl, now)
+
+    def delete(self, key, value=None):
+        """Remove key (only if it still holds value, when given); True if something was removed"""
+        with self._lock:
+            self._purge(self._clock())
+            entry = self._data.get(key)
+            if entry is None or (value is not None and entry[0] != value):
+                return False
+            del self._data[key]
+            return True
+
+    def incr(self, key, amount=1, ttl=60):
+        """Add amount to an integer counter, creating it with the given TTL; returns the new value"""
+        with self._lock:
+            now = self._clock()
+            self._purge(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self._set(key, amount, ttl, now)
+                return amount
+            value = int(entry[0]) + amount
+            self._data[key] = (value, entry[1])
+            return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'keys': len(self._data),
+                'expirations': self.expirations,
+            }
+
+
+class DatabaseKVStore:
+    """Key-value store in a kv_store table, shared by every worker using the database
+
+    Expired rows are ignored on read and deleted in bulk at most once per
+    ``sweep_interval`` seconds, through the indexed expires_at column.
+    """
+
+    def __init__(self, get_connection, dialect, sweep_interval=60.0, clock=time.time, name='database'):
+        self._get_connection = get_connection
+        self.dialect = dialect
+        self.param = '?' if dialect == 'sqlite' else '%s'
+        self.sweep_interval = sweep_interval
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self.expirations = 0
+
+    def ensure_schema(self):
+        if self.dialect == 'mysql':
+            statements = ['''
+                CREATE TABLE IF NOT EXISTS kv_store (
+                    kv_key VARCHAR(255) PRIMARY KEY,
+                    kv_value TEXT NOT NULL,
+                    expires_at DOUBLE NOT NULL,
+                    INDEX idx_kv_store_expires_at (expires_at)
+                )
+            ''']
+        else:
+            statements = ['''
+                CREATE TABLE IF NOT EXISTS kv_store (
+                    kv_key VARCHAR(255) PRIMARY KEY,
+                    kv_value TEXT NOT NULL,
+                    expires_at DOUBLE PRECISION NOT NULL
+                )
+            ''', 'CREATE INDEX IF NOT EXISTS idx_kv_store_expires_at ON kv_store (expires_at)']
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+
+    def _maybe_sweep(self, cursor, now):
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        cursor.execute(f'DELETE FROM kv_store WHERE expires_at <= {self.param}', (now,))
+        if cursor.rowcount and cursor.rowcount > 0:
+            self.expirations += cursor.rowcount
+
+    def get(self, key):
+        p = self.param
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT kv_value FROM kv_store WHERE kv_key = {p} AND expires_at > {p}',
+                           (key, self._clock()))
+            row = cursor.fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key, value, ttl):
+        p = self.param
+        now = self._clock()
+        if self.dialect == 'sqlite':
+            query = f'INSERT OR REPLACE INTO kv_store VALUES ({p}, {p}, {p})'
+        elif self.dialect == 'mysql':
+            query = f'REPLACE INTO kv_store VALUES ({p}, {p}, {p})'
+        else:
+            query = f'''
+                INSERT INTO kv_store VALUES ({p}, {p}, {p})
+                ON CONFLICT (kv_key) DO UPDATE SET kv_value = EXCLUDED.kv_value, expires_at = EXCLUDED.expires_at
+            '''
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            self._maybe_sweep(cursor, now)
+            cursor.execute(query, (key, str(value), now + ttl))
+
+    def delete(self, key, value=None):
+        """Remove key (only if it still holds value, when given); True if something was removed
+
+        With a value this is a compare-and-delete, so of two workers consuming
+        the same one-time code only one succeeds.
+        """
+        p = self.param
+        query = f'DELETE FROM kv_store WHERE kv_key = {p} AND expires_at > {p}'
+        params = (key, self._clock())
+        if value is not None:
+            query += f' AND kv_value = {p}'
+            params += (str(value),)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.rowcount > 0
+
+    def incr(self, key, amount=1, ttl=60):
+        """Atomically add amount to an integer counter, restarting it once expired; returns the new value"""
+        p = self.param
+        now = self._clock()
+        if self.dialect == 'mysql':
+            query = f'''
+                INSERT INTO kv_store VALUES ({p}, {p}, {p})
+                ON DUPLICATE KEY UPDATE
+                    kv_value = IF(expires_at <= {p}, VALUES(kv_value), CAST(kv_value AS SIGNED) + {p}),
+                    expires_at = IF(expires_at <= {p}, VALUES(expires_at), expires_at)
+            '''
+            params = (key, str(amount), now + ttl, now, amount, now)
+        else:
+            integer = 'INTEGER' if self.dialect == 'sqlite' else 'BIGINT'
+            query = f'''
+                INSERT INTO kv_store VALUES ({p}, {p}, {p})
+                ON CONFLICT (kv_key) DO UPDATE SET
+                    kv_value = CASE WHEN kv_store.expires_at <= {p} THEN EXCLUDED.kv_value
+                               ELSE CAST(CAST(kv_store.kv_value AS {integer}) + {p} AS TEXT) END,
+                    expires_at = CASE WHEN kv_store.expires_at <= {p} THEN EXCLUDED.expires_at
+                                 ELSE kv_store.expires_at END
+            '''
+            params = (key, str(amount), now + ttl, now, amount, now)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            self._maybe_sweep(cursor, now)
+            cursor.execute(query, params)
+            cursor.execute(f'SELECT kv_value FROM kv_store WHERE kv_key = {p}', (key,))
+            return int(cursor.fetchone()[0])
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'dialect': self.dialect,
+            'expirations': self.expirations,
+        }
+
+
+class RateLimiter:
+    """Fixed-window request counter on a key-value store
+
+    Each (key, window) pair is one counter that expires with its window, so
+    the store only ever holds counters for the current window.
+    """
+
+    def __init__(self, store, name, limit, window, clock=time.time):
+        self.store = store
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+
+    def hit(self, key):
+        """Count one request for key; returns (allowed, retry_after seconds)"""
+        now = self._clock()
+        window_index = int(now // self.window)
+        count = self.store.incr(f'rl:{self.name}:{key}:{window_index}', 1, self.window)
+        if count <= self.limit:
+            return True, 0
+        return False, max(1, int((window_index + 1) * self.window - now + 0.999))
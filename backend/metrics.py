@@ -0,0 +1,300 @@
+import bisect
+import glob
+import json
+import os
+import secrets
+import threading
+import time
+
+# Latency buckets in seconds, from a cache hit up to a slow upstream call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class _Timer:
+    """Context manager observing its own duration, and counting exceptions in errors"""
+
+    __slots__ = ('histogram', 'labels', 'errors', 'started')
+
+    def __init__(self, histogram, labels, errors):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        # A generator closed early by its consumer did not fail
+        if exc_type is not None and self.errors is not None and not issubclass(exc_type, GeneratorExit):
+            self.errors.inc(*self.labels)
+        return False
+
+
+class Histogram:
+    """Bucketed observations per label set
+
+    An observation is a bisect and three increments under the metric's
+    lock; buckets are stored non-cumulative and summed up when rendered.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._values = {}  # labels -> [bucket counts (+Inf last), sum, count]
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels, errors=None):
+        """Time a block: ``with histogram.time('gemini', errors=error_counter): ...``"""
+        return _Timer(self, labels, errors)
+
+    def samples(self):
+        with self._lock:
+            return [[list(labels), [list(counts), total, count]]
+                    for labels, (counts, total, count) in self._values.items()]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+class Registry:
+    """Metrics of one process, exported in the Prometheus text format
+
+    Besides the counters and histograms updated by request code, collector
+    functions are called at export time to turn component stats (caches,
+    pools, queues, upstream clients) into samples.
+
+    With ``directory`` set, every process writes a snapshot of its metrics
+    there every few seconds and on exit, and ``render`` merges all of them:
+    counters and histograms are summed over every worker that ever wrote
+    (so totals survive a worker restart), gauges over the workers whose
+    snapshot is younger than ``stale_after`` seconds. Snapshot files carry a
+    random per-process suffix, so a restarted worker that gets an old pid
+    back does not overwrite its predecessor's totals. The directory should
+    be emptied when the service is redeployed.
+    """
+
+    def __init__(self, directory=None, stale_after=60.0):
+        self.directory = directory
+        self.stale_after = stale_after
+        self._metrics = []
+        self._collectors = []
+        self._ratios = []
+        self._writer = None
+        self._write_interval = None
+        self._snapshot_name = self._new_snapshot_name()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """Register collect() -> iterable of (name, kind, help, labels dict, value); usable as a decorator"""
+        self._collectors.append(collect)
+        return collect
+
+    def ratio(self, name, help, numerator, denominators):
+        """Gauge numerator / sum(denominators) per label set, computed after worker totals are merged"""
+        self._ratios.append((name, help, numerator, tuple(denominators)))
+
+    def snapshot(self):
+        metrics = {}
+        for metric in self._metrics:
+            entry = {'type': metric.kind, 'help': metric.help, 'labelnames': list(metric.labelnames),
+                     'samples': metric.samples()}
+            if metric.kind == 'histogram':
+                entry['buckets'] = list(metric.buckets)
+            metrics[metric.name] = entry
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue  # a broken component must not take the whole export down
+            for name, kind, help, labels, value in samples:
+                entry = metrics.setdefault(name, {'type': kind, 'help': help, 'labelnames': list(labels),
+                                                  'samples': []})
+                entry['samples'].append([[str(labels[key]) for key in entry['labelnames']], value])
+        return {'pid': os.getpid(), 'time': time.time(), 'metrics': metrics}
+
+    @staticmethod
+    def _new_snapshot_name():
+        return f'metrics-{os.getpid()}-{secrets.token_hex(4)}.json'
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, self._snapshot_name)
+
+    def write_snapshot(self):
+        if not self.directory:
+            return None
+        snapshot = self.snapshot()
+        path = self._snapshot_path()
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp_path, path)
+        return snapshot
+
+    def start_writer(self, interval=5.0):
+        """Write this process's snapshot every interval seconds (no-op without a directory)"""
+        if not self.directory or self._writer is not None:
+            return
+        self._write_interval = interval
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    print(f"⚠️ Warning: Could not write metrics snapshot: {e}")
+
+        self._writer = threading.Thread(target=run, name='metrics-writer', daemon=True)
+        self._writer.start()
+
+    def _after_fork(self):
+        # Start a forked worker from zero with its own snapshot file and writer thread
+        for metric in self._metrics:
+            metric._reset()
+        self._snapshot_name = self._new_snapshot_name()
+        interval = self._write_interval
+        self._writer = None
+        if interval is not None:
+            self.start_writer(interval)
+
+    def gather(self):
+        """Snapshots of every process to export, this one first"""
+        own = self.write_snapshot() if self.directory else self.snapshot()
+        snapshots = [own]
+        if not self.directory:
+            return snapshots
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if path == self._snapshot_path():
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # being replaced or removed right now
+        return snapshots
+
+    def merge(self, snapshots):
+        """One metric table summed over snapshots; gauges only from live processes"""
+        now = time.time()
+        merged = {}
+        for snapshot in snapshots:
+            live = now - snapshot.get('time', 0) <= self.stale_after
+            for name, entry in snapshot['metrics'].items():
+                if entry['type'] == 'gauge' and not live:
+                    continue
+                target = merged.setdefault(name, {**entry, 'samples': {}})
+                for labels, value in entry['samples']:
+                    key = tuple(labels)
+                    current = target['samples'].get(key)
+                    if current is None:
+                        target['samples'][key] = value
+                    elif entry['type'] == 'histogram':
+                        counts = [a + b for a, b in zip(current[0], value[0])]
+                        target['samples'][key] = [counts, current[1] + value[1], current[2] + value[2]]
+                    else:
+                        target['samples'][key] = current + value
+        for name, help, numerator, denominators in self._ratios:
+            if numerator not in merged:
+                continue
+            labelnames = merged[numerator]['labelnames']
+            samples = {}
+            for key, value in merged[numerator]['samples'].items():
+                total = sum(merged.get(denominator, {'samples': {}})['samples'].get(key, 0)
+                            for denominator in denominators)
+                if total:
+                    samples[key] = round(value / total, 6)
+            merged[name] = {'type': 'gauge', 'help': help, 'labelnames': labelnames, 'samples': samples}
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, entry in sorted(self.merge(self.gather()).items()):
+            lines.append(f'# HELP {name} {_escape(entry["help"])}')
+            lines.append(f'# TYPE {name} {entry["type"]}')
+            labelnames = entry['labelnames']
+            for labels, value in sorted(entry['samples'].items()):
+                if entry['type'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}')
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(entry['buckets']) + [float('inf')], counts):
+                    cumulative += bucket_count
+                    le = (('le', _format_value(float(bound))),)
+                    lines.append(f'{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labelnames, labels)} {_format_value(float(total))}')
+                lines.append(f'{name}_count{_format_labels(labelnames, labels)} {count}')
+        return '\n'.join(lines) + '\n'
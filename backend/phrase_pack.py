@@ -0,0 +1,129 @@
+import mmap
+import os
+import struct
+import threading
+
+from translation_cache import make_cache_key
+
+# Where build_phrase_pack.py writes by default and the server looks at startup
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packs', 'phrases.pack')
+
+MAGIC = b'PHRPACK\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sII')  # magic, version, entry count
+ENTRY = struct.Struct('<16sII')  # key digest, text offset, text length (bytes)
+DIGEST_SIZE = 16
+
+
+class PhrasePackError(Exception):
+    """The file is not a phrase pack this version can read"""
+
+
+def key_digest(text, input_language, output_language):
+    """First 16 bytes of the translation cache key, so the pack and cache agree on what "the same text" is"""
+    return bytes.fromhex(make_cache_key(text, input_language, output_language))[:DIGEST_SIZE]
+
+
+def audio_dir_for(path):
+    """Directory holding the pre-rendered audio of the pack at path"""
+    return os.path.splitext(path)[0] + '-audio'
+
+
+def write_pack(path, entries):
+    """Write {key digest: translated text} to path, replacing any previous pack atomically
+
+    Layout: header, entries sorted by digest, then the UTF-8 texts. Lookups
+    binary-search the entry table in place, so loading costs one mmap.
+    """
+    digests = sorted(entries)
+    texts = [entries[digest].encode('utf-8') for digest in digests]
+    offset = HEADER.size + ENTRY.size * len(digests)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(digests)))
+        for digest, text in zip(digests, texts):
+            f.write(ENTRY.pack(digest, offset, len(text)))
+            offset += len(text)
+        for text in texts:
+            f.write(text)
+    os.replace(temp_path, path)
+
+
+class PhrasePack:
+    """Read-only, memory-mapped table of pre-translated phrases
+
+    Built offline by build_phrase_pack.py. The file is mapped rather than
+    read, so worker processes share its pages and a lookup is a binary
+    search over the entry table without decoding anything else.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.audio_dir = audio_dir_for(path)
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap cannot map an empty file
+                raise PhrasePackError(f"{path} is empty")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise PhrasePackError(f"{path} is too short to be a phrase pack")
+        magic, version, self._count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise PhrasePackError(f"{path} is not a version {VERSION} phrase pack")
+        if len(self._mmap) < HEADER.size + ENTRY.size * self._count:
+            raise PhrasePackError(f"{path} is truncated")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._count
+
+    def _digest_at(self, index):
+        start = HEADER.size + ENTRY.size * index
+        return self._mmap[start:start + DIGEST_SIZE]
+
+    def _text_at(self, index):
+        _, offset, length = ENTRY.unpack_from(self._mmap, HEADER.size + ENTRY.size * index)
+        return self._mmap[offset:offset + length].decode('utf-8')
+
+    def find(self, digest):
+        """Translated text stored under digest, or None"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._digest_at(middle) < digest:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._digest_at(low) == digest:
+            return self._text_at(low)
+        return None
+
+    def get(self, text, input_language, output_language):
+        translated_text = self.find(key_digest(text, input_language, output_language))
+        with self._lock:
+            if translated_text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return translated_text
+
+    def items(self):
+        """(digest, translated text) for every entry, for incremental rebuilds"""
+        for index in range(self._count):
+            yield self._digest_at(index), self._text_at(index)
+
+    def close(self):
+        self._mmap.close()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': self._count,
+                'bytes': len(self._mmap),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+
+
+class _Call:
+    """One in-flight call and the outcome its followers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait and get the same result (or exception) instead of repeating
+    the upstream call. Nothing is cached: once the call returns, the next
+    caller for the key runs it again.
+
+    With a shared ``store`` (see kv_store) the leader of each process also
+    takes a per-key lock there, so only one worker calls upstream. The
+    holder publishes its result under the key for ``result_ttl`` seconds and
+    the other workers poll for it (or for ``recheck()`` to find it in a
+    shared cache). A lock left by a crashed worker expires after
+    ``lock_ttl`` seconds, and a worker that waited ``wait_timeout`` seconds
+    calls upstream itself. Results must be strings to cross workers.
+    """
+
+    def __init__(self, name, store=None, lock_ttl=30, result_ttl=60, wait_timeout=60.0, poll_interval=0.05):
+        self.name = name
+        self.store = store
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            'calls': 0,
+            'coalesced': 0,
+            'shared_from_worker': 0,
+            'lock_timeouts': 0,
+            'store_errors': 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def do(self, key, fn, recheck=None):
+        """fn() for the first caller of key; concurrent callers share its outcome"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.counters['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = self._shared(key, fn, recheck)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _keys(self, key):
+        return f'sf:{self.name}:lock:{key}', f'sf:{self.name}:result:{key}'
+
+    def _store_error(self, e):
+        self._count('store_errors')
+        print(f"⚠️ Warning: Shared single-flight lock unavailable, calling upstream: {e}")
+
+    def _shared(self, key, fn, recheck):
+        """Run fn once across workers, or pick up the result of the worker that did"""
+        if self.store is None:
+            self._count('calls')
+            return fn()
+        lock_key, result_key = self._keys(key)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                value = self.store.get(result_key)
+                if value is not None:
+                    self._count('shared_from_worker')
+                    return value
+                acquired = self.store.incr(lock_key, 1, self.lock_ttl) == 1
+            except Exception as e:
+                self._store_error(e)
+                self._count('calls')
+                return fn()
+            if acquired:
+                return self._run_locked(fn, lock_key, result_key)
+            if recheck is not None:
+                value = recheck()
+                if value is not None:
+                    self._count('shared_from_worker')
+                    return value
+            if time.monotonic() >= deadline:
+                self._count('lock_timeouts')
+                self._count('calls')
+                return fn()
+            time.sleep(self.poll_interval)
+
+    def _run_locked(self, fn, lock_key, result_key):
+        self._count('calls')
+        try:
+            value = fn()
+            try:
+                self.store.set(result_key, value, self.result_ttl)
+            except Exception as e:
+                self._store_error(e)
+            return value
+        finally:
+            try:
+                self.store.delete(lock_key)
+            except Exception as e:
+                self._store_error(e)
+
+    async def do_async(self, key, fn, recheck=None):
+        """Coroutine counterpart of do(): fn() returns an awaitable, recheck is a blocking call
+
+        The call runs as its own task, so a caller that disconnects does not
+        cancel it for the others; the shared store is used from the default
+        executor.
+        """
+        task = self._async_calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._shared_async(key, fn, recheck))
+            self._async_calls[key] = task
+            task.add_done_callback(lambda _: self._async_calls.pop(key, None))
+        else:
+            self._count('coalesced')
+        return await asyncio.shield(task)
+
+    async def _shared_async(self, key, fn, recheck):
+        if self.store is None:
+            self._count('calls')
+            return await fn()
+        lock_key, result_key = self._keys(key)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                value = await asyncio.to_thread(self.store.get, result_key)
+                if value is not None:
+                    self._count('shared_from_worker')
+                    return value
+                acquired = await asyncio.to_thread(self.store.incr, lock_key, 1, self.lock_ttl) == 1
+            except Exception as e:
+                self._store_error(e)
+                self._count('calls')
+                return await fn()
+            if acquired:
+                break
+            if recheck is not None:
+                value = await asyncio.to_thread(recheck)
+                if value is not None:
+                    self._count('shared_from_worker')
+                    return value
+            if time.monotonic() >= deadline:
+                self._count('lock_timeouts')
+                self._count('calls')
+                return await fn()
+            await asyncio.sleep(self.poll_interval)
+        self._count('calls')
+        try:
+            value = await fn()
+            try:
+                await asyncio.to_thread(self.store.set, result_key, value, self.result_ttl)
+            except Exception as e:
+                self._store_error(e)
+            return value
+        finally:
+            try:
+                await asyncio.to_thread(self.store.delete, lock_key)
+            except Exception as e:
+                self._store_error(e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'shared_store': self.store is not None,
+                'in_flight': len(self._calls) + len(self._async_calls),
+                **self.counters,
+            }
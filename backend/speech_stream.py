@@ -0,0 +1,99 @@
+import struct
+
+from google.cloud import speech
+
+# 16 kHz mono LINEAR16 is 32000 bytes per second; 16 KB is ~0.5 s per request
+STREAM_CHUNK_SIZE = 16 * 1024
+# Google closes a streaming session after ~305 s of audio, so roll over before that
+STREAM_MAX_SECONDS = 240
+
+
+def iter_chunks(fileobj, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield successive chunks from a binary file-like object"""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_wav_header(chunk):
+    """Return (sample_rate, data_offset) for a RIFF/WAVE prefix, or (None, 0)
+
+    Only the first chunk is inspected; the header has to fit in it.
+    """
+    if len(chunk) < 12 or chunk[:4] != b'RIFF' or chunk[8:12] != b'WAVE':
+        return None, 0
+    sample_rate = None
+    offset = 12
+    while offset + 8 <= len(chunk):
+        chunk_id = chunk[offset:offset + 4]
+        chunk_size = struct.unpack('<I', chunk[offset + 4:offset + 8])[0]
+        if chunk_id == b'fmt ' and offset + 16 <= len(chunk):
+            sample_rate = struct.unpack('<I', chunk[offset + 12:offset + 16])[0]
+        if chunk_id == b'data':
+            return sample_rate, offset + 8
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return sample_rate, 0
+
+
+def audio_stream(chunks):
+    """Split off a WAV header: returns (sample_rate or None, iterator of raw PCM chunks)"""
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    sample_rate, offset = read_wav_header(first)
+
+    def pcm():
+        if first[offset:]:
+            yield first[offset:]
+        yield from chunks
+
+    return sample_rate, pcm()
+
+
+def recognition_config(language_code, sample_rate=16000):
+    return speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=sample_rate,
+        language_code=language_code,
+    )
+
+
+def streaming_transcribe(client, chunks, language_code, interim_results=True):
+    """Feed audio chunks to streaming_recognize and yield results as they arrive
+
+    Yields dicts with ``transcript``, ``is_final`` and ``stability``. Audio
+    longer than STREAM_MAX_SECONDS is split across consecutive streaming
+    sessions, so recordings of any length can be transcribed without holding
+    them in memory.
+    """
+    sample_rate, pcm = audio_stream(chunks)
+    sample_rate = sample_rate or 16000
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=recognition_config(language_code, sample_rate),
+        interim_results=interim_results,
+    )
+    max_bytes = sample_rate * 2 * STREAM_MAX_SECONDS
+    pending = next(pcm, None)
+
+    def session_requests():
+        nonlocal pending
+        sent = 0
+        while pending is not None and sent < max_bytes:
+            chunk = pending
+            yield speech.StreamingRecognizeRequest(audio_content=chunk)
+            sent += len(chunk)
+            pending = next(pcm, None)
+
+    while pending is not None:
+        responses = client.streaming_recognize(config=streaming_config, requests=session_requests())
+        for response in responses:
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                yield {
+                    'transcript': result.alternatives[0].transcript,
+                    'is_final': result.is_final,
+                    'stability': result.stability,
+                }
+
@@ -0,0 +1,34 @@
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+# The backend modules import each other by their flat names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def backend(tmp_path_factory):
+    """The Flask app on a local SQLite database in a scratch directory"""
+    directory = tmp_path_factory.mktemp('app')
+    env = {
+        'DATABASE_TYPE': 'local',
+        'GOOGLE_API_KEY': 'test',
+        'REQUIRE_AUTH': 'false',
+        'HISTORY_WRITE_MODE': 'sync',
+        'TRANSLATION_MEMORY': 'true',
+        'TM_SHARED': 'false',
+        'PHRASE_PACK_PATH': '',
+        'AUDIO_CACHE_DIR': str(directory / 'audio'),
+        'KV_SQLITE_PATH': str(directory / 'kv_store.db'),
+    }
+    cwd = os.getcwd()
+    # The local database lives in the working directory
+    os.chdir(directory)
+    try:
+        with mock.patch.dict(os.environ, env):
+            import app
+            yield app
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,245 @@
+import json
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_translations_only_coalesce_within_a_user(backend, monkeypatch):
+    release = threading.Event()
+    callers = []
+
+    def gemini_translate(text, input_language, output_language, context=None):
+        callers.append(backend.request_user.get())
+        release.wait(5)
+        return f'{text} for {backend.request_user.get()}'
+
+    monkeypatch.setattr(backend, 'gemini_translate', gemini_translate)
+    # Alice's private memory must never answer Bob's request
+    memory = backend.translation_memory
+    memory.exact('flight text', 'en', 'es', scope='alice')  # loads alice's index
+    memory.add('flight text', 'alice only', 'en', 'es', scope='alice')
+    assert memory.exact('flight text', 'en', 'es', scope='alice') == 'alice only'
+    results = {}
+
+    def translate(slot, user):
+        backend.request_user.set(user)
+        results[slot] = backend.translate_text('flight text', 'en', 'fr')
+
+    stats = backend.translation_flight.stats
+    coalesced = stats()['coalesced']
+    threads = [threading.Thread(target=translate, args=(slot, user))
+               for slot, user in enumerate(['bob', 'bob', 'carol'])]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: stats()['in_flight'] == 2 and stats()['coalesced'] == coalesced + 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(callers) == ['bob', 'carol']
+    assert results[2] == 'flight text for carol'
+
+    backend.request_user.set('bob')
+    try:
+        assert backend.translate_text('flight text', 'en', 'es') != 'alice only'
+    finally:
+        backend.request_user.set(backend.ANONYMOUS_USER_ID)
+
+
+def test_history_cursor_round_trip(backend):
+    cursor = backend.encode_history_cursor('2024-05-01T10:00:00', 42)
+    assert backend.decode_history_cursor(cursor) == ('2024-05-01T10:00:00', 42)
+    for bad in ('not-a-cursor', backend.encode_search_cursor(3)):
+        with pytest.raises(ValueError):
+            backend.decode_history_cursor(bad)
+
+
+def test_history_pages_follow_the_keyset_cursor(backend, client):
+    # Two rows share a date, so the id has to break the tie
+    dates = ['2024-05-01T10:00:00', '2024-05-01T10:00:00', '2024-05-02T09:00:00',
+             '2024-05-03T08:00:00', '2024-05-04T07:00:00']
+    backend.insert_history_rows([(date, f'text {i}', f'texto {i}', 'en', 'es', None, 'cursor-user')
+                                 for i, date in enumerate(dates)])
+    with mock.patch.object(backend, 'resolve_user', return_value=('cursor-user', None)):
+        seen = []
+        response = client.get('/history?limit=2')
+        while True:
+            seen.extend(entry['original_text'] for entry in response.json)
+            cursor = response.headers.get('X-Next-Cursor')
+            if cursor is None:
+                break
+            response = client.get(f'/history?limit=2&cursor={cursor}')
+        assert seen == ['text 4', 'text 3', 'text 2', 'text 1', 'text 0']
+        assert client.get('/history?cursor=bogus').status_code == 400
+
+
+def test_audio_supports_etag_and_ranges(backend, client):
+    def synthesize(text, language, path):
+        with open(path, 'wb') as f:
+            f.write(b'0123456789')
+
+    audio_id, _ = backend.audio_store.get_or_create('hello', 'en', synthesize)
+    response = client.get(f'/audio/{audio_id}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{audio_id}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Last-Modified' not in response.headers
+
+    assert client.get(f'/audio/{audio_id}', headers={'If-None-Match': f'"{audio_id}"'}).status_code == 304
+    partial = client.get(f'/audio/{audio_id}', headers={'Range': 'bytes=2-5'})
+    assert partial.status_code == 206
+    assert partial.data == b'2345'
+    assert partial.headers['Content-Range'] == 'bytes 2-5/10'
+
+
+def test_unknown_audio_is_not_found(client):
+    assert client.get('/audio/0123456789abcdef0123456789abcdef').status_code == 404
+
+
+def test_logout_is_idempotent(backend, client, monkeypatch):
+    import jwt
+    from auth_tokens import TokenVerifier
+    from kv_store import MemoryKVStore
+
+    monkeypatch.setattr(backend, 'token_verifier', TokenVerifier(secret='test-secret', store=MemoryKVStore()))
+    monkeypatch.setattr(backend, 'supabase', None)
+    claims = {'sub': 'user-1', 'aud': 'authenticated', 'exp': int(time.time()) + 600, 'session_id': 's1'}
+    headers = {'Authorization': f"Bearer {jwt.encode(claims, 'test-secret', algorithm='HS256')}"}
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    assert client.get('/history', headers=headers).status_code == 401
+
+
+def test_empty_phrase_pack_is_treated_as_missing(backend, tmp_path, monkeypatch):
+    path = tmp_path / 'phrases.pack'
+    path.touch()
+    monkeypatch.setattr(backend, 'PHRASE_PACK_PATH', str(path))
+    assert backend.load_phrase_pack() is None
+
+
+def test_batch_translates_unique_segments_in_one_prompt(backend, client, monkeypatch):
+    prompts, single = [], []
+
+    def generate_content(prompt, generation_config=None):
+        prompts.append(prompt)
+        # Leaves the third segment out, so it is retried on its own
+        return '[{"id": 0, "translation": "batch fiebre"}, {"id": 1, "translation": "batch dolor"}]'
+
+    def gemini_translate(text, input_language, output_language, context=None):
+        single.append(text)
+        return 'batch tos'
+
+    monkeypatch.setattr(backend, 'generate_content', generate_content)
+    monkeypatch.setattr(backend, 'gemini_translate', gemini_translate)
+    response = client.post('/translate/batch', json={
+        'segments': ['batch fever', 'batch pain', 'batch fever', 'batch cough'],
+        'inputLanguage': 'en', 'outputLanguage': 'es'})
+    assert response.status_code == 200
+    assert [result['translated_text'] for result in response.json['results']] == \
+        ['batch fiebre', 'batch dolor', 'batch fiebre', 'batch tos']
+    assert len(prompts) == 1 and single == ['batch cough']
+    assert response.json['translated'] == 4 and response.json['failed'] == 0
+
+    response = client.post('/translate/batch', json={
+        'segments': ['batch fever', ' '], 'inputLanguage': 'en', 'outputLanguage': 'es'})
+    assert response.status_code == 400
+
+
+def sse_events(body):
+    events = []
+    for block in body.decode('utf-8').strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class FakeTTSPool:
+    def submit(self, text, language):
+        return '0' * 32
+
+    def status(self, audio_id):
+        return 'ready', None
+
+    def ensure(self, audio_id, timeout):
+        return 'ready', None
+
+
+def test_stream_sends_chunks_then_translation_audio_and_done(backend, client, monkeypatch):
+    monkeypatch.setattr(backend, 'stream_content', lambda prompt: iter(['Tome ', 'dos ', 'tabletas ']))
+    monkeypatch.setattr(backend, 'tts_pool', FakeTTSPool())
+    response = client.post('/translate/stream', json={
+        'text': 'stream two tablets', 'inputLanguage': 'en', 'outputLanguage': 'es'})
+    assert response.mimetype == 'text/event-stream'
+    assert sse_events(response.data) == [
+        ('chunk', {'text': 'Tome '}),
+        ('chunk', {'text': 'dos '}),
+        ('chunk', {'text': 'tabletas '}),
+        ('translation', {'translated_text': 'Tome dos tabletas'}),
+        ('audio', {'audio_path': '0' * 32, 'audio_url': f"/audio/{'0' * 32}", 'audio_status': 'ready'}),
+        ('done', {}),
+    ]
+    # Now cached: one chunk with the whole translation
+    response = client.post('/translate/stream', json={
+        'text': 'stream two tablets', 'inputLanguage': 'en', 'outputLanguage': 'es'})
+    assert sse_events(response.data)[:2] == [
+        ('chunk', {'text': 'Tome dos tabletas'}),
+        ('translation', {'translated_text': 'Tome dos tabletas'}),
+    ]
+
+
+def test_stream_ends_with_an_error_event_when_gemini_breaks_off(backend, client, monkeypatch):
+    def stream_content(prompt):
+        yield 'Tome '
+        raise ConnectionError('stream reset')
+
+    monkeypatch.setattr(backend, 'stream_content', stream_content)
+    response = client.post('/translate/stream', json={
+        'text': 'stream broken', 'inputLanguage': 'en', 'outputLanguage': 'es'})
+    assert sse_events(response.data) == [
+        ('chunk', {'text': 'Tome '}),
+        ('error', {'error': 'Translation error: stream reset'}),
+    ]
+
+
+def test_history_includes_the_users_queued_rows(backend, client, monkeypatch):
+    from history_writer import HistoryWriter
+
+    writer = HistoryWriter(backend.write_history_rows, flush_interval=0.3, key=lambda row: row[6])
+    monkeypatch.setattr(backend, 'history_writer', writer)
+    monkeypatch.setattr(backend, 'gemini_translate', lambda text, *args, **kwargs: f'{text} (es)')
+    monkeypatch.setattr(backend, 'tts_pool', FakeTTSPool())
+    try:
+        response = client.post('/translate', json={'text': 'queued row', 'inputLanguage': 'en', 'outputLanguage': 'es'})
+        assert response.status_code == 200
+        assert client.get('/history?limit=1').json[0]['original_text'] == 'queued row'
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize('deadline_ms', [0, -250, 'soon', '500', True, float('nan'), float('inf'), [500]])
+def test_deadline_must_be_a_positive_number(backend, deadline_ms):
+    scheduling, error = backend.request_scheduling({'deadlineMs': deadline_ms})
+    assert scheduling is None
+    assert error == ({'error': 'deadlineMs must be a positive number'}, 400)
+
+
+def test_deadline_is_checked_before_translating(backend, client):
+    response = client.post('/translate', json={
+        'text': 'deadline', 'inputLanguage': 'en', 'outputLanguage': 'es', 'deadlineMs': 0})
+    assert response.status_code == 400
+    (priority, deadline), error = backend.request_scheduling({'deadlineMs': 1500})
+    assert error is None and 1.4 < deadline - time.monotonic() <= 1.5
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+
+class FakeTTSPool:
+    def submit(self, text, language):
+        return '0' * 32
+
+    def status(self, audio_id):
+        return 'pending', None
+
+
+@pytest.fixture
+def asgi(backend, monkeypatch):
+    import asgi
+    monkeypatch.setattr(backend, 'tts_pool', FakeTTSPool())
+    return asgi
+
+
+def call(app, method, path, body=b'', query=b''):
+    """Run one HTTP request through an ASGI app; returns (status, headers, body)"""
+    messages = []
+    chunks = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return chunks.pop(0) if chunks else {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode('ascii'), 'query_string': query,
+        'root_path': '', 'headers': [(b'content-type', b'application/json'), (b'host', b'testserver')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    start = next(message for message in messages if message['type'] == 'http.response.start')
+    data = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), data
+
+
+def test_translate_runs_natively_with_the_same_response(backend, asgi, monkeypatch):
+    async def generate_content(prompt, generation_config=None):
+        return ' Tome dos tabletas '
+
+    def gemini_translate(text, input_language, output_language, context=None):
+        return 'Tome dos tabletas'
+
+    monkeypatch.setattr(asgi.gemini_async, 'generate_content', generate_content)
+    monkeypatch.setattr(backend, 'gemini_translate', gemini_translate)
+    request = {'text': 'asgi two tablets', 'inputLanguage': 'en', 'outputLanguage': 'es'}
+    status, headers, body = call(asgi.app, 'POST', '/translate', json.dumps(request).encode('utf-8'))
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+    native = json.loads(body)
+    assert native['translated_text'] == 'Tome dos tabletas'
+    assert native['audio_status'] == 'pending'
+
+    # The Flask view answers the same (now cached) request identically
+    flask = backend.app.test_client().post('/translate', json=request)
+    assert flask.json == native
+
+
+def test_native_translate_validates_like_flask(asgi):
+    status, _, body = call(asgi.app, 'POST', '/translate', b'{not json')
+    assert status == 400 and json.loads(body) == {'error': 'Invalid JSON body'}
+    status, _, body = call(asgi.app, 'POST', '/translate', b'{"text": "x"}')
+    assert status == 400 and json.loads(body) == {'error': 'Missing required fields'}
+
+
+def test_other_routes_fall_back_to_flask(backend, asgi):
+    status, _, body = call(asgi.app, 'GET', '/languages')
+    assert status == 200
+    assert json.loads(body) == backend.app.test_client().get('/languages').json
+    status, _, _ = call(asgi.app, 'GET', '/translate')
+    assert status == 405
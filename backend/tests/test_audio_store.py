@@ -0,0 +1,88 @@
+import os
+import time
+
+import pytest
+
+from audio_store import AudioStore, make_audio_id
+
+
+def synthesize(size):
+    def write(text, language, path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+    return write
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / 'audio')
+
+
+def test_miss_synthesizes_once_then_hits(root):
+    store = AudioStore(root)
+    calls = []
+
+    def counting(text, language, path):
+        calls.append(text)
+        synthesize(10)(text, language, path)
+
+    audio_id, path = store.get_or_create('Take with food', 'es', counting)
+    assert audio_id == make_audio_id('Take with food', 'es')
+    assert store.get_or_create('Take with food', 'es', counting) == (audio_id, path)
+    assert calls == ['Take with food']
+    assert (store.stats()['hits'], store.stats()['misses']) == (1, 1)
+    assert os.listdir(root) == [f'{audio_id}.mp3']
+
+
+def test_least_recently_used_audio_is_evicted_over_the_cap(root):
+    store = AudioStore(root, max_bytes=25)
+    first, _ = store.get_or_create('one', 'es', synthesize(10))
+    second, _ = store.get_or_create('two', 'es', synthesize(10))
+    store.get(first)
+    third, _ = store.get_or_create('three', 'es', synthesize(10))
+    assert store.get(second) is None
+    assert store.contains(first) and store.contains(third)
+    assert store.stats()['evictions'] == 1
+    assert store.stats()['bytes'] == 20
+
+
+def test_failed_synthesis_leaves_no_files(root):
+    store = AudioStore(root)
+
+    def failing(text, language, path):
+        synthesize(10)(text, language, path)
+        raise RuntimeError('TTS unavailable')
+
+    with pytest.raises(RuntimeError):
+        store.get_or_create('one', 'es', failing)
+    assert os.listdir(root) == []
+
+
+def test_sweep_resyncs_the_index_and_removes_old_orphans(root):
+    store = AudioStore(root, max_bytes=15, orphan_age=60)
+    old = time.time() - 120
+    # Written by another worker: the older file is the one evicted
+    for name, mtime in (('a', old), ('b', time.time())):
+        path = store.path_for(make_audio_id(name, 'es'))
+        synthesize(10)(name, 'es', path)
+        os.utime(path, (mtime, mtime))
+    for name, mtime in (('stale.tmp', old), ('fresh.tmp', time.time())):
+        open(os.path.join(root, name), 'w').close()
+        os.utime(os.path.join(root, name), (mtime, mtime))
+    store.sweep()
+    assert set(os.listdir(root)) == {'fresh.tmp', f"{make_audio_id('b', 'es')}.mp3"}
+    stats = store.stats()
+    assert (stats['entries'], stats['evictions'], stats['orphans_removed']) == (1, 1, 1)
+
+
+def test_attached_audio_is_served_read_only(root, tmp_path):
+    pack_audio = tmp_path / 'pack'
+    pack_audio.mkdir()
+    audio_id = make_audio_id('Good morning', 'es')
+    (pack_audio / f'{audio_id}.mp3').write_bytes(b'mp3')
+    store = AudioStore(root, max_bytes=1)
+    store.attach(str(pack_audio))
+    assert store.get(audio_id) == str(pack_audio / f'{audio_id}.mp3')
+    assert store.get('not-an-id') is None
+    store.sweep()
+    assert store.contains(audio_id) and store.stats()['bytes'] == 0
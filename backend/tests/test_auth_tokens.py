@@ -0,0 +1,142 @@
+import time
+
+import jwt
+import pytest
+
+from auth_tokens import TokenError, TokenExpired, TokenVerifier
+from kv_store import MemoryKVStore
+
+SECRET = 'test-secret'
+# PyJWT checks expiry against the real time; the fake clock starts there
+NOW = int(time.time())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = float(NOW)
+
+    def __call__(self):
+        return self.now
+
+
+def make_token(secret=SECRET, **claims):
+    claims = {'sub': 'user-1', 'aud': 'authenticated', 'exp': NOW + 600, **claims}
+    return jwt.encode(claims, secret, algorithm='HS256')
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def verifier(clock):
+    return TokenVerifier(secret=SECRET, store=MemoryKVStore(clock=clock), leeway=0,
+                         revocation_check_interval=60, clock=clock)
+
+
+def test_verify_checks_signature_and_expiry(verifier, clock):
+    assert verifier.verify(make_token())['sub'] == 'user-1'
+    with pytest.raises(TokenError, match='Signature'):
+        verifier.verify(make_token(secret='other'))
+    with pytest.raises(TokenError, match='Audience'):
+        verifier.verify(make_token(aud='anon'))
+    with pytest.raises(TokenError, match='exp'):
+        verifier.verify(make_token(exp=None))
+    with pytest.raises(TokenExpired):
+        verifier.verify(make_token(exp=NOW - 10))
+    with pytest.raises(TokenError, match='Malformed'):
+        verifier.verify('not-a-token')
+    # A cached token expires by the verifier's own clock
+    clock.now = NOW + 601
+    with pytest.raises(TokenExpired):
+        verifier.verify(make_token())
+    assert verifier.stats()['verified'] == 1
+    assert verifier.stats()['rejected'] == 6
+
+
+def test_revoking_an_expired_token_is_a_no_op(verifier):
+    assert verifier.revoke(make_token(session_id='s1', exp=NOW - 10)) is None
+
+
+def test_revoking_twice_is_a_no_op(verifier):
+    token = make_token(session_id='s1')
+    assert verifier.revoke(token)['sub'] == 'user-1'
+    assert verifier.revoke(token) is None
+    with pytest.raises(TokenError, match='revoked'):
+        verifier.verify(token)
+
+
+def test_asymmetric_tokens_are_checked_against_the_jwks():
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    jwk = jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+
+    class JWKS:
+        def get(self, kid):
+            return jwt.PyJWK({**jwk, 'kid': 'k1', 'alg': 'ES256'}) if kid == 'k1' else None
+
+    verifier = TokenVerifier(jwks=JWKS())
+    claims = {'sub': 'user-1', 'aud': 'authenticated', 'exp': NOW + 600}
+    token = jwt.encode(claims, private_key, algorithm='ES256', headers={'kid': 'k1'})
+    assert verifier.verify(token)['sub'] == 'user-1'
+    with pytest.raises(TokenError, match='Unknown signing key'):
+        verifier.verify(jwt.encode(claims, private_key, algorithm='ES256', headers={'kid': 'k2'}))
+    with pytest.raises(TokenError, match='no JWT secret'):
+        verifier.verify(make_token())
+
+
+def test_revoke_rejects_the_session_on_every_worker(clock):
+    store = MemoryKVStore(clock=clock)
+    workers = [TokenVerifier(secret=SECRET, store=store, leeway=0, revocation_check_interval=60, clock=clock)
+               for _ in range(2)]
+    first, second = make_token(session_id='s1'), make_token(session_id='s1', iat=1)
+    for worker in workers:
+        worker.verify(second)
+    workers[0].revoke(first)
+    # Revoked here at once; elsewhere on the next revocation check
+    with pytest.raises(TokenError, match='revoked'):
+        workers[0].verify(second)
+    clock.now += 61
+    with pytest.raises(TokenError, match='revoked'):
+        workers[1].verify(second)
+
+
+def test_revoke_only_evicts_its_own_session(verifier):
+    mine, other = make_token(session_id='s1'), make_token(sub='user-2', session_id='s2')
+    verifier.verify(mine)
+    verifier.verify(other)
+    verifier.revoke(mine)
+    hits = verifier.stats()['cache']['hits']
+    assert verifier.verify(other)['sub'] == 'user-2'
+    assert verifier.stats()['cache']['hits'] == hits + 1
+
+
+def test_remote_check_is_cached_until_revoked(clock):
+    calls = []
+
+    def remote(token):
+        calls.append(token)
+        return {'sub': 'user-1', 'email': 'a@example.com'}
+
+    verifier = TokenVerifier(remote=remote, store=MemoryKVStore(clock=clock), leeway=0, clock=clock)
+    # Supabase vouches for the token, so its signature is never checked here
+    token = make_token(secret='unknown-to-us', session_id='s1')
+    assert verifier.verify(token)['email'] == 'a@example.com'
+    assert verifier.verify(token)['sub'] == 'user-1'
+    assert len(calls) == 1
+    verifier.revoke(token)
+    with pytest.raises(TokenError, match='revoked'):
+        verifier.verify(token)
+
+
+def test_remote_rejection_is_not_cached(clock):
+    def remote(token):
+        raise TokenError('Invalid token or user not found.')
+
+    verifier = TokenVerifier(remote=remote, clock=clock)
+    for _ in range(2):
+        with pytest.raises(TokenError, match='not found'):
+            verifier.verify(make_token())
+    assert verifier.stats()['rejected'] == 2
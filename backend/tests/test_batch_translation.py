@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from batch_translation import build_batch_prompt, estimate_tokens, pack_segments, parse_batch_response
+
+
+def test_packs_keep_order_within_the_budget():
+    segments = ['a' * 40] * 5  # 11 tokens + 8 overhead each
+    assert pack_segments(segments, token_budget=40) == [[0, 1], [2, 3], [4]]
+    assert pack_segments(segments, token_budget=1000, max_per_pack=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_oversized_segment_gets_a_pack_to_itself():
+    segments = ['short', 'x' * 400, 'short']
+    assert estimate_tokens(segments[1]) > 100
+    assert pack_segments(segments, token_budget=100) == [[0], [1], [2]]
+
+
+def test_prompt_lists_segments_by_id():
+    prompt = build_batch_prompt(['Fiebre', 'Dolor'], 'Spanish', 'English', '- fiebre => fever')
+    assert 'from Spanish to English' in prompt
+    assert '- fiebre => fever' in prompt
+    assert prompt.endswith(json.dumps([{'id': 0, 'text': 'Fiebre'}, {'id': 1, 'text': 'Dolor'}]))
+
+
+def test_response_keeps_only_usable_translations():
+    response = '```json\n' + json.dumps([
+        {'id': 0, 'translation': ' Fever '},
+        {'id': '1', 'translation': 'Pain'},
+        {'id': 1, 'translation': 'Ache'},  # duplicate
+        {'id': 2, 'translation': ''},
+        {'id': 7, 'translation': 'Out of range'},
+        'not an object',
+    ]) + '\n```'
+    assert parse_batch_response(response, 3) == {0: 'Fever', 1: 'Pain'}
+    assert parse_batch_response(json.dumps({'translations': [{'id': 0, 'translation': 'Fever'}]}), 1) == {0: 'Fever'}
+    with pytest.raises(ValueError):
+        parse_batch_response('"just text"', 1)
@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout, ThreadLocalPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / 'test.db')
+    pool = ThreadLocalPool(lambda: sqlite3.connect(path), check_after=0)
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE items (name TEXT)')
+    yield pool
+    pool.closeall()
+
+
+def count(pool):
+    with pool.connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+
+def test_nested_checkout_shares_the_connection(pool):
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner._conn is outer._conn
+    assert pool.stats()['in_use'] == 0
+
+
+def test_nested_release_does_not_commit_the_outer_transaction(pool):
+    with pytest.raises(RuntimeError):
+        with pool.connection() as outer:
+            outer.execute("INSERT INTO items VALUES ('a')")
+            with pool.connection() as inner:
+                inner.execute("INSERT INTO items VALUES ('b')")
+            raise RuntimeError('outer block fails')
+    assert count(pool) == 0
+
+
+def test_outermost_release_commits_nested_writes(pool):
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('a')")
+        with pool.connection() as inner:
+            inner.execute("INSERT INTO items VALUES ('b')")
+    assert count(pool) == 2
+
+
+def test_connection_is_reused_after_release(pool):
+    with pool.connection() as first:
+        conn = first._conn
+    with pool.connection() as second:
+        assert second._conn is conn
+    assert pool.stats()['created'] == 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise ConnectionError('server closed the connection')
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.broken = False
+        self.closed = False
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.broken:
+            raise ConnectionError('server closed the connection')
+        self.commits += 1
+
+    def rollback(self):
+        if self.broken:
+            raise ConnectionError('server closed the connection')
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDriver:
+    def __init__(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection(len(self.connections))
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.fixture
+def driver():
+    return FakeDriver()
+
+
+def make_pool(driver, **kwargs):
+    return ConnectionPool(driver.connect, **{'max_size': 2, 'timeout': 1.0, 'check_after': 0, **kwargs})
+
+
+def test_returned_connections_are_reused(driver):
+    pool = make_pool(driver)
+    with pool.connection() as conn:
+        first = conn.number
+    with pool.connection() as conn:
+        assert conn.number == first
+    assert len(driver.connections) == 1
+    assert driver.connections[0].commits == 2
+    stats = pool.stats()
+    assert (stats['size'], stats['in_use'], stats['idle'], stats['checkouts']) == (1, 0, 1, 2)
+
+
+def test_checkout_waits_for_a_connection_at_max_size(driver):
+    pool = make_pool(driver)
+    held = [pool.getconn(), pool.getconn()]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    waiter.join(0.05)
+    assert waiter.is_alive() and pool.stats()['waiting'] == 1
+    pool.putconn(held[0])
+    waiter.join(1)
+    assert got == [held[0]]
+    assert len(driver.connections) == 2 and pool.stats()['waits'] == 1
+
+
+def test_checkout_times_out_at_max_size(driver):
+    pool = make_pool(driver, max_size=1, timeout=0.05)
+    pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_broken_connections_are_dropped(driver):
+    pool = make_pool(driver)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    # The idle connection fails its health check and is replaced
+    replacement = pool.getconn()
+    assert replacement is not conn and conn.closed
+    # One that cannot roll back on release is not kept
+    replacement.broken = True
+    pool.putconn(replacement)
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['discarded']) == (0, 0, 2)
+    assert stats['health_check_failures'] == 1
+
+
+def test_failed_rollback_keeps_the_original_error(driver):
+    pool = make_pool(driver)
+    with pytest.raises(KeyError):
+        with pool.connection() as conn:
+            conn._conn.broken = True
+            raise KeyError('original')
+    assert driver.connections[0].closed
+    assert pool.stats()['size'] == 0
+
+
+def test_failed_commit_discards_the_connection(driver):
+    pool = make_pool(driver)
+    with pytest.raises(ConnectionError):
+        with pool.connection() as conn:
+            conn._conn.broken = True
+    stats = pool.stats()
+    assert (stats['size'], stats['in_use'], stats['discarded']) == (0, 0, 1)
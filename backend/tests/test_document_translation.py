@@ -0,0 +1,37 @@
+from document_translation import chunk_document, context_tail
+
+DOCUMENT = 'Take two tablets.\n\nDrink water.\n\n\nCall us if the pain returns. Rest today.\n'
+
+
+def reassemble(chunks):
+    return ''.join(chunk + separator for chunk, separator in chunks)
+
+
+def test_short_paragraphs_are_packed_into_one_chunk():
+    chunks = chunk_document(DOCUMENT, token_budget=800)
+    assert len(chunks) == 1
+    assert reassemble(chunks) == DOCUMENT.strip()
+
+
+def test_paragraphs_are_packed_up_to_the_budget():
+    paragraphs = [f'Paragraph {i} ' + 'word ' * 20 for i in range(10)]
+    text = '\n\n'.join(paragraph.strip() for paragraph in paragraphs)
+    chunks = chunk_document(text, token_budget=70)
+    assert 1 < len(chunks) < 10
+    assert reassemble(chunks) == text
+    # Chunks break between paragraphs, never inside one that fits
+    assert all(chunk.startswith('Paragraph') for chunk, _ in chunks)
+
+
+def test_long_paragraphs_are_split_between_sentences_and_words():
+    long_sentence = ' '.join(['medication'] * 60)
+    text = f'Short intro.\n\nFirst sentence here. {long_sentence}. Last one.'
+    chunks = chunk_document(text, token_budget=40)
+    assert reassemble(chunks) == text
+    assert chunks[0] == ('Short intro.', '\n\n')
+    assert len(chunks) > 3
+
+
+def test_context_tail_keeps_whole_sentences():
+    assert context_tail('One. Two. Three.', max_chars=12) == 'Two. Three.'
+    assert context_tail('word ' * 100, max_chars=20).startswith('word')
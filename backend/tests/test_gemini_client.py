@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+import requests
+
+from gemini_client import (AsyncGeminiClient, CircuitBreaker, CircuitOpenError, GeminiClient, GeminiError,
+                           parse_retry_after)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None, lines=()):
+        self.status_code = status_code
+        self._body = body or {}
+        self.text = str(self._body)
+        self.headers = headers or {}
+        self.lines = lines
+
+    def json(self):
+        return self._body
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            if isinstance(line, BaseException):
+                raise line
+            yield line
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeSession:
+    """Answers each post() with the next outcome: a response, or an exception to raise"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def ok(text='hola'):
+    return FakeResponse(200, {'candidates': [{'content': {'parts': [{'text': text}]}}]})
+
+
+def client(session, clock=None, **kwargs):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock or FakeClock())
+    return GeminiClient('key', session=session, sleep=lambda delay: None, breaker=breaker, **kwargs)
+
+
+def opened(gemini, clock):
+    """Trip gemini's breaker with two connection errors, then let the reset timeout pass"""
+    with pytest.raises(GeminiError):
+        gemini.generate_content('hi')
+    assert gemini.breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retries_transient_statuses():
+    session = FakeSession(FakeResponse(503), ok())
+    assert client(session).generate_content('hi') == 'hola'
+    assert session.calls == 2
+
+
+def test_client_errors_are_not_retried():
+    session = FakeSession(FakeResponse(400))
+    with pytest.raises(GeminiError) as raised:
+        client(session).generate_content('hi')
+    assert raised.value.status_code == 400
+    assert session.calls == 1
+
+
+def test_open_circuit_short_circuits():
+    session = FakeSession(requests.ConnectionError('down'), requests.ConnectionError('down'))
+    gemini = client(session, max_retries=1)
+    with pytest.raises(GeminiError):
+        gemini.generate_content('hi')
+    with pytest.raises(CircuitOpenError):
+        gemini.generate_content('hi')
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize('error', [
+    requests.exceptions.ChunkedEncodingError('truncated'),
+    requests.exceptions.ContentDecodingError('bad gzip'),
+    requests.exceptions.InvalidURL('bad url'),
+])
+def test_unexpected_error_during_half_open_probe_reopens_the_circuit(error):
+    clock = FakeClock()
+    session = FakeSession(requests.ConnectionError('down'), requests.ConnectionError('down'), error, ok())
+    gemini = client(session, clock=clock, max_retries=1)
+    with pytest.raises(GeminiError):
+        gemini.generate_content('hi')
+    clock.now = 30
+    with pytest.raises(type(error)):
+        gemini.generate_content('hi')
+    assert gemini.breaker.state == CircuitBreaker.OPEN
+    # Not stuck half open: the next probe goes through once the timeout passes again
+    clock.now = 60
+    assert gemini.generate_content('hi') == 'hola'
+    assert gemini.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_half_open_probe_closes_the_circuit():
+    clock = FakeClock()
+    down = requests.ConnectionError('down')
+    session = FakeSession(down, down, FakeResponse(429, headers={'Retry-After': '0'}), ok(), ok())
+    gemini = client(session, clock=clock, max_retries=1)
+    opened(gemini, clock)
+    assert gemini.generate_content('hi') == 'hola'
+    assert gemini.breaker.state == CircuitBreaker.CLOSED
+    assert gemini.generate_content('hi') == 'hola'
+
+
+def test_rate_limit_while_closed_does_not_reset_failures():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_answered()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_async_rate_limited_half_open_probe_closes_the_circuit():
+    class FakeAsyncClient:
+        def __init__(self, *outcomes):
+            self.outcomes = list(outcomes)
+
+        async def post(self, *args, **kwargs):
+            return self.outcomes.pop(0)
+
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    gemini = AsyncGeminiClient('key', client=FakeAsyncClient(FakeResponse(429, headers={'Retry-After': '0'}), ok()),
+                               breaker=breaker, max_retries=1)
+    assert asyncio.run(gemini.generate_content('hi')) == 'hola'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_broken_midway_counts_as_a_failure():
+    chunk = 'data: {"candidates": [{"content": {"parts": [{"text": "ho"}]}}]}'
+    broken = FakeResponse(200, lines=[chunk, requests.exceptions.ChunkedEncodingError('reset')])
+    gemini = client(FakeSession(broken))
+    stream = gemini.stream_generate_content('hi')
+    assert next(stream) == 'ho'
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        next(stream)
+    assert gemini.breaker.failures == 1
+
+
+def test_stream_closed_early_by_the_consumer_is_not_a_failure():
+    chunk = 'data: {"candidates": [{"content": {"parts": [{"text": "ho"}]}}]}'
+    gemini = client(FakeSession(FakeResponse(200, lines=[chunk, chunk])))
+    stream = gemini.stream_generate_content('hi')
+    assert next(stream) == 'ho'
+    stream.close()
+    assert gemini.breaker.failures == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('') is None
+    assert parse_retry_after('soon') is None
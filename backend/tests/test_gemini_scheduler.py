@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from gemini_scheduler import GeminiScheduler, SchedulerRejected, TokenBucket
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def queued(scheduler):
+    return sum(scheduler.stats()['queue_depth'].values())
+
+
+def drained(requests_per_minute=600, **kwargs):
+    """Scheduler with an empty request bucket refilling 10 per second"""
+    scheduler = GeminiScheduler(requests_per_minute, **kwargs)
+    scheduler.requests.level = 0
+    return scheduler
+
+
+def test_token_bucket_refills_up_to_a_minute():
+    bucket = TokenBucket(60, clock=lambda: 0.0)
+    bucket.take(60)
+    bucket.refill(30.0)
+    assert bucket.level == 30
+    assert bucket.time_until(40) == 10
+    bucket.refill(600.0)
+    assert bucket.level == 60
+    # More than the whole budget waits for a full bucket, not forever
+    assert bucket.time_until(500) == 0
+
+
+def test_without_quota_every_call_is_admitted():
+    scheduler = GeminiScheduler()
+    for _ in range(100):
+        scheduler.acquire('bulk', tokens=10_000)
+    assert scheduler.stats()['counters']['bulk']['admitted'] == 100
+
+
+def test_waiters_are_admitted_in_priority_order():
+    scheduler = drained(reserves={'normal': 0.0, 'bulk': 0.0})
+    order = []
+    threads = []
+    for priority in ('bulk', 'normal', 'urgent'):
+        thread = threading.Thread(target=lambda p=priority: (scheduler.acquire(p), order.append(p)))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: queued(scheduler) == len(threads))
+    for thread in threads:
+        thread.join(5)
+    assert order == ['urgent', 'normal', 'bulk']
+
+
+def test_reserves_hold_quota_back_from_lower_priorities():
+    scheduler = GeminiScheduler(100)
+    scheduler.requests.level = 20
+    scheduler.acquire('normal')
+    with pytest.raises(SchedulerRejected):
+        # Bulk must leave 30 of 100 untouched
+        scheduler.acquire('bulk', deadline=time.monotonic() + 0.05)
+    scheduler.acquire('urgent')
+
+
+def test_call_that_cannot_start_in_time_is_rejected_at_once():
+    scheduler = drained(60)
+    started = time.monotonic()
+    with pytest.raises(SchedulerRejected) as rejected:
+        scheduler.acquire('urgent', deadline=started + 0.5)
+    assert rejected.value.reason == 'deadline'
+    assert rejected.value.retry_after >= 1
+    assert time.monotonic() - started < 0.25
+
+
+def test_full_queue_sheds_the_least_urgent_waiter():
+    # Slow refill, so the urgent call is still queued when the next bulk call arrives
+    scheduler = drained(120, max_queue=1, reserves={'bulk': 0.0})
+    outcome = []
+
+    def bulk():
+        try:
+            scheduler.acquire('bulk')
+        except SchedulerRejected as e:
+            outcome.append(e.reason)
+
+    thread = threading.Thread(target=bulk)
+    thread.start()
+    wait_for(lambda: queued(scheduler) == 1)
+    urgent = threading.Thread(target=scheduler.acquire, args=('urgent',))
+    urgent.start()
+    thread.join(5)
+    assert outcome == ['shed']
+    with pytest.raises(SchedulerRejected) as rejected:
+        scheduler.acquire('bulk')
+    assert rejected.value.reason == 'queue_full'
+    urgent.join(5)
+    assert scheduler.stats()['counters']['urgent']['admitted'] == 1
+
+
+def test_throttle_pauses_admissions():
+    scheduler = GeminiScheduler(600)
+    scheduler.throttle(2)
+    assert scheduler.stats()['requests_available'] < 0
+    with pytest.raises(SchedulerRejected):
+        scheduler.acquire('urgent', deadline=time.monotonic() + 0.5)
@@ -0,0 +1,55 @@
+from glossary import Glossary, TermMatcher, numbers, term_key, tokenize
+
+
+def test_matcher_prefers_leftmost_longest_terms():
+    keys = [('blood',), ('blood', 'pressure'), ('high', 'blood', 'pressure'), ('pressure',)]
+    matcher = TermMatcher(keys)
+    tokens = [token for token, _, _ in tokenize('Check high blood pressure and blood sugar')]
+    assert matcher.find(tokens) == [(1, 3, 2), (5, 5, 0)]
+
+
+def test_matcher_follows_failure_links():
+    matcher = TermMatcher([('a', 'b', 'c'), ('b', 'd')])
+    assert matcher.find(['a', 'b', 'd']) == [(1, 2, 1)]
+
+
+def test_cjk_characters_are_single_tokens():
+    assert term_key('高血压') == ('高', '血', '压')
+    assert term_key('  Blood   PRESSURE ') == ('blood', 'pressure')
+
+
+def test_numbers_normalize_native_digits_and_decimal_commas():
+    assert numbers('Take 2,5 mg or ٣ tablets') == ['2.5', '3']
+
+
+def glossary():
+    terms = Glossary()
+    terms.set_terms('en', 'es', [('blood pressure', 'presión arterial'), ('tablet', 'comprimido'),
+                                 ('tablet', 'tableta')])
+    return terms
+
+
+def test_tag_reports_offsets_and_later_entries_override():
+    text = 'Your blood pressure is fine, take one tablet.'
+    tags = glossary().tag(text, 'en', 'es')
+    assert [(text[start:end], target) for start, end, _, target in tags] == \
+        [('blood pressure', 'presión arterial'), ('tablet', 'tableta')]
+    assert glossary().tag(text, 'en', 'fr') == []
+
+
+def test_check_reports_missing_terms_and_numbers():
+    terms = glossary()
+    text = 'Take 2 tablet for blood pressure.'
+    assert terms.check(text, 'Tome 2 tableta para la presión arterial.', 'en', 'es') == []
+    assert terms.check(text, 'Tome 3 pastillas para la presión arterial.', 'en', 'es') == [
+        {'type': 'term', 'source': 'tablet', 'expected': 'tableta'},
+        {'type': 'number', 'expected': '2'},
+    ]
+
+
+def test_load_dir_reads_language_pair_files(tmp_path):
+    (tmp_path / 'en.es.tsv').write_text('# comment\nfever\tfiebre\n\nno tab line\n', encoding='utf-8')
+    (tmp_path / 'README.md').write_text('ignored', encoding='utf-8')
+    terms = Glossary()
+    assert terms.load_dir(str(tmp_path)) == 1
+    assert terms.stats()['language_pairs'] == 1
@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from history_search import ensure_search_index, match_expression, search_query, search_terms
+
+
+def test_terms_drop_operators_and_punctuation():
+    assert search_terms('Metformin, 500mg -"twice" +daily*') == ['metformin', '500mg', 'twice', 'daily']
+    assert search_terms('?!') == []
+
+
+def test_match_expressions_require_every_term_and_prefix_the_last():
+    terms = ['take', 'metf']
+    assert match_expression('sqlite', terms) == '"take" "metf"*'
+    assert match_expression('postgresql', terms) == 'take & metf:*'
+    assert match_expression('mysql', terms) == '+take +metf*'
+
+
+def test_mysql_leaves_unindexed_words_optional():
+    assert match_expression('mysql', ['take', 'it', 'with', 'food']) == '+take it with +food*'
+    assert match_expression('mysql', ['mg']) == 'mg*'
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, original_text TEXT, translated_text TEXT,
+            input_language TEXT, output_language TEXT, audio_path TEXT, user_id TEXT
+        )
+    ''')
+    yield conn
+    conn.close()
+
+
+def add(conn, original, translated, user='alice'):
+    conn.execute('INSERT INTO chat_history (date, original_text, translated_text, input_language, output_language, '
+                 "user_id) VALUES ('2024-01-01', ?, ?, 'en', 'es', ?)", (original, translated, user))
+
+
+def search(conn, query, user='alice', limit=10, offset=0):
+    sql, params = search_query('sqlite', '?', match_expression('sqlite', search_terms(query)),
+                               ['h.user_id = ?'], [user], limit, offset)
+    return [row[2] for row in conn.execute(sql, params).fetchall()]
+
+
+def test_sqlite_index_covers_old_and_new_rows(conn):
+    add(conn, 'Take metformin twice daily', 'Tome metformina dos veces al día')
+    assert ensure_search_index(conn.cursor(), 'sqlite') is True
+    add(conn, 'Metformin with food', 'Metformina con comida')
+    add(conn, 'Metformin at night', 'Metformina por la noche', user='bob')
+    assert sorted(search(conn, 'metf')) == ['Metformin with food', 'Take metformin twice daily']
+    assert search(conn, 'metformin twice') == ['Take metformin twice daily']
+    assert search(conn, 'comida') == ['Metformin with food']
+    assert search(conn, 'metformin', limit=1, offset=1) != search(conn, 'metformin', limit=1)
+    # Running it again on every start is harmless
+    assert ensure_search_index(conn.cursor(), 'sqlite') is True
+    assert len(search(conn, 'metformin')) == 2
+
+
+class ScriptedCursor:
+    """Records statements; fetchone() answers from a list of canned rows"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append(' '.join(sql.split()))
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+
+def test_postgres_skips_the_table_rewrite_when_the_column_exists():
+    cursor = ScriptedCursor([(1,), (1,)])
+    assert ensure_search_index(cursor, 'postgresql') is True
+    assert not any(statement.startswith(('ALTER', 'CREATE')) for statement in cursor.statements)
+
+
+def test_postgres_only_rewrites_a_populated_table_when_migrating():
+    cursor = ScriptedCursor([None, None, (1,)])
+    assert ensure_search_index(cursor, 'postgresql') is False
+    assert not any(statement.startswith('ALTER') for statement in cursor.statements)
+
+    cursor = ScriptedCursor([None, None])
+    assert ensure_search_index(cursor, 'postgresql', migrate=True) is True
+    assert cursor.statements[-2].startswith('ALTER TABLE chat_history ADD COLUMN search_vector')
+    assert cursor.statements[-1].startswith('CREATE INDEX IF NOT EXISTS idx_chat_history_search')
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from history_writer import HistoryWriter
+
+
+class Database:
+    def __init__(self):
+        self.rows = []
+        self.batches = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, rows):
+        self.release.wait(5)
+        self.rows.extend(rows)
+        self.batches += 1
+
+
+def test_async_submits_are_written_in_batches():
+    database = Database()
+    database.release.clear()
+    writer = HistoryWriter(database, flush_interval=0.01)
+    for i in range(50):
+        writer.submit([(i,)])
+    database.release.set()
+    writer.close()
+    assert sorted(database.rows) == [(i,) for i in range(50)]
+    assert database.batches < 50
+    assert writer.stats()['rows_written'] == 50
+
+
+def test_durable_submit_returns_once_committed():
+    database = Database()
+    writer = HistoryWriter(database, durable=True)
+    writer.submit([('a',)])
+    assert database.rows == [('a',)]
+    writer.close()
+
+
+def test_durable_submit_raises_when_the_write_fails():
+    def fail(rows):
+        raise RuntimeError('disk full')
+
+    writer = HistoryWriter(fail, durable=True, max_attempts=2, retry_delay=0)
+    with pytest.raises(RuntimeError, match='disk full'):
+        writer.submit([('a',)])
+    assert writer.stats()['rows_dropped'] == 1
+    writer.close()
+
+
+def test_durable_submit_gives_up_waiting_for_a_stuck_commit():
+    database = Database()
+    database.release.clear()
+    writer = HistoryWriter(database, durable=True)
+    with pytest.raises(TimeoutError):
+        writer.submit([('a',)], timeout=0.05)
+    assert writer.stats()['commit_timeouts'] == 1
+    database.release.set()
+    writer.close()
+    # Committed late, and only once
+    assert database.rows == [('a',)]
+
+
+def test_every_dropped_row_is_reported():
+    dropped = []
+
+    def fail(rows):
+        raise RuntimeError('disk full')
+
+    writer = HistoryWriter(fail, max_attempts=2, retry_delay=0, on_drop=lambda rows, error: dropped.extend(rows))
+    writer.submit([('a',), ('b',)])
+    writer.close()
+    assert dropped == [('a',), ('b',)]
+    assert writer.stats()['rows_dropped'] == 2
+
+
+def test_rows_left_queued_by_a_stuck_close_are_reported():
+    database = Database()
+    database.release.clear()
+    dropped = []
+    writer = HistoryWriter(database, flush_interval=0, on_drop=lambda rows, error: dropped.extend(rows))
+    writer.submit([('a',)])
+    while writer.stats()['queued']:
+        pass  # until the writer is stuck on the first row
+    writer.submit([('b',)])
+    writer.close(timeout=0.05)
+    assert dropped == [('b',)]
+    database.release.set()
+
+
+def test_wait_written_covers_only_the_keys_rows():
+    database = Database()
+    database.release.clear()
+    writer = HistoryWriter(database, flush_interval=0, key=lambda row: row[0])
+    writer.submit([('alice', 1)])
+    assert writer.wait_written('bob', timeout=0)
+    assert not writer.wait_written('alice', timeout=0.05)
+    database.release.set()
+    assert writer.wait_written('alice', timeout=5)
+    assert database.rows == [('alice', 1)]
+    writer.close()
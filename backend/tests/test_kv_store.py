@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from db_pool import ThreadLocalPool
+from kv_store import DatabaseKVStore, MemoryKVStore, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, clock, tmp_path):
+    if request.param == 'memory':
+        yield MemoryKVStore(clock=clock)
+        return
+    path = str(tmp_path / 'kv.db')
+    pool = ThreadLocalPool(lambda: sqlite3.connect(path), check_after=0)
+    store = DatabaseKVStore(pool.connection, 'sqlite', clock=clock)
+    store.ensure_schema()
+    yield store
+    pool.closeall()
+
+
+def test_entries_expire_after_their_ttl(store, clock):
+    store.set('otp:a', '123456', 60)
+    assert store.get('otp:a') == '123456'
+    clock.now += 60
+    assert store.get('otp:a') is None
+    assert store.delete('otp:a') is False
+
+
+def test_incr_restarts_an_expired_counter(store, clock):
+    assert store.incr('hits', ttl=10) == 1
+    assert store.incr('hits', 2, ttl=10) == 3
+    # The window is not extended by later increments
+    clock.now += 10
+    assert store.incr('hits', ttl=10) == 1
+
+
+def test_delete_with_a_value_is_compare_and_delete(store):
+    store.set('otp:a', '123456', 60)
+    assert store.delete('otp:a', '000000') is False
+    assert store.delete('otp:a', '123456') is True
+    # A second consumer of the same code loses
+    assert store.delete('otp:a', '123456') is False
+
+
+def test_memory_store_drops_expired_keys_without_reads(clock):
+    store = MemoryKVStore(clock=clock)
+    for n in range(100):
+        store.set(f'key:{n}', n, 60)
+    store.set('key:0', 'kept', 600)
+    clock.now += 60
+    store.set('other', 1, 60)
+    assert store.stats()['keys'] == 2
+    assert store.stats()['expirations'] == 99
+
+
+def test_rate_limiter_counts_per_key_and_window(store, clock):
+    limiter = RateLimiter(store, 'otp', limit=2, window=60, clock=clock)
+    clock.now = 6000.0 + 15
+    assert limiter.hit('a@example.com') == (True, 0)
+    assert limiter.hit('a@example.com') == (True, 0)
+    assert limiter.hit('a@example.com') == (False, 45)
+    assert limiter.hit('b@example.com') == (True, 0)
+    clock.now += 45
+    assert limiter.hit('a@example.com') == (True, 0)
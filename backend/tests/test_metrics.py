@@ -0,0 +1,82 @@
+import os
+import time
+
+from metrics import Registry
+
+
+def snapshot(metrics, age=0):
+    return {'pid': 1, 'time': time.time() - age, 'metrics': metrics}
+
+
+def test_histogram_buckets_are_upper_bounds():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(1, 2, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value, '/translate')
+    assert histogram.samples() == [[['/translate'], [[2, 0, 1, 1], 14.5, 4]]]
+
+
+def test_merge_sums_counters_and_drops_stale_gauges():
+    registry = Registry(stale_after=60)
+    registry.ratio('hit_ratio', 'Share of hits', 'hits_total', ['hits_total', 'misses_total'])
+
+    def metrics(hits, misses, size):
+        return {
+            'hits_total': {'type': 'counter', 'help': 'Hits', 'labelnames': ['tier'], 'samples': [[['memory'], hits]]},
+            'misses_total': {'type': 'counter', 'help': 'Misses', 'labelnames': ['tier'],
+                             'samples': [[['memory'], misses]]},
+            'cache_size': {'type': 'gauge', 'help': 'Size', 'labelnames': [], 'samples': [[[], size]]},
+        }
+
+    # A worker that exited still counts towards totals, but not towards gauges
+    merged = registry.merge([snapshot(metrics(3, 1, 10)), snapshot(metrics(1, 3, 20), age=120)])
+    assert merged['hits_total']['samples'] == {('memory',): 4}
+    assert merged['misses_total']['samples'] == {('memory',): 4}
+    assert merged['cache_size']['samples'] == {(): 10}
+    assert merged['hit_ratio']['samples'] == {('memory',): 0.5}
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests "served"', ('route', 'status'))
+    requests.inc('/translate', '200')
+    requests.inc('/translate', '200')
+    registry.histogram('latency_seconds', 'Latency', buckets=(0.5,)).observe(0.25)
+    registry.collector(lambda: [('queue_depth', 'gauge', 'Queued jobs', {'queue': 'tts'}, 3)])
+    assert registry.render() == '\n'.join([
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.5"} 1',
+        'latency_seconds_bucket{le="+Inf"} 1',
+        'latency_seconds_sum 0.25',
+        'latency_seconds_count 1',
+        '# HELP queue_depth Queued jobs',
+        '# TYPE queue_depth gauge',
+        'queue_depth{queue="tts"} 3',
+        '# HELP requests_total Requests \\"served\\"',
+        '# TYPE requests_total counter',
+        'requests_total{route="/translate",status="200"} 2',
+    ]) + '\n'
+
+
+def test_processes_sharing_a_pid_keep_separate_snapshots(tmp_path):
+    # e.g. a restarted container worker that got its predecessor's pid back
+    registries = [Registry(directory=str(tmp_path)) for _ in range(2)]
+    for registry in registries:
+        registry.counter('requests_total', 'Requests').inc()
+        registry.write_snapshot()
+    assert len(os.listdir(tmp_path)) == 2
+    assert 'requests_total 2' in registries[0].render()
+
+
+def test_forked_worker_starts_from_zero(tmp_path):
+    registry = Registry(directory=str(tmp_path))
+    requests = registry.counter('requests_total', 'Requests')
+    requests.inc()
+    registry.write_snapshot()
+    registry._after_fork()
+    assert requests.samples() == []
+    # The parent's snapshot is kept and merged rather than overwritten
+    registry.write_snapshot()
+    assert len(os.listdir(tmp_path)) == 2
+    assert 'requests_total 1' in registry.render()
@@ -0,0 +1,68 @@
+import pytest
+
+from phrase_pack import HEADER, PhrasePack, PhrasePackError, audio_dir_for, key_digest, write_pack
+from translation_cache import make_cache_key
+
+
+@pytest.fixture
+def pack_path(tmp_path):
+    return str(tmp_path / 'phrases.pack')
+
+
+def test_written_pack_is_found_by_binary_search(pack_path):
+    phrases = {f'Take {n} tablets daily': f'Tome {n} tabletas al día' for n in range(100)}
+    write_pack(pack_path, {key_digest(source, 'en', 'es'): target for source, target in phrases.items()})
+    pack = PhrasePack(pack_path)
+    try:
+        assert len(pack) == 100
+        for source, target in phrases.items():
+            assert pack.get(source, 'en', 'es') == target
+        assert pack.get('Take 7 tablets daily', 'en', 'fr') is None
+        assert pack.stats()['hits'] == 100
+        assert pack.stats()['misses'] == 1
+    finally:
+        pack.close()
+
+
+def test_digest_agrees_with_the_translation_cache():
+    assert key_digest('  Good  morning ', 'en', 'es') == \
+        bytes.fromhex(make_cache_key('Good morning', 'en', 'es'))[:16]
+
+
+def test_non_ascii_texts_round_trip(pack_path):
+    entries = {key_digest('pain', 'en', 'ar'): 'ألم', key_digest('pain', 'en', 'zh'): '疼痛'}
+    write_pack(pack_path, entries)
+    pack = PhrasePack(pack_path)
+    try:
+        assert dict(pack.items()) == entries
+    finally:
+        pack.close()
+
+
+def test_rejects_files_that_are_not_packs(pack_path):
+    with open(pack_path, 'wb') as f:
+        f.write(b'not a phrase pack at all')
+    with pytest.raises(PhrasePackError):
+        PhrasePack(pack_path)
+    with open(pack_path, 'wb') as f:
+        f.write(b'short')
+    with pytest.raises(PhrasePackError):
+        PhrasePack(pack_path)
+
+
+def test_rejects_truncated_packs(pack_path):
+    write_pack(pack_path, {key_digest('pain', 'en', 'es'): 'dolor'})
+    with open(pack_path, 'r+b') as f:
+        f.truncate(HEADER.size + 4)
+    with pytest.raises(PhrasePackError, match='truncated'):
+        PhrasePack(pack_path)
+
+
+def test_audio_dir_sits_next_to_the_pack():
+    assert audio_dir_for('/srv/packs/phrases.pack') == '/srv/packs/phrases-audio'
+
+
+def test_empty_file_is_not_a_pack(pack_path):
+    open(pack_path, 'wb').close()
+    with pytest.raises(PhrasePackError, match='empty'):
+        PhrasePack(pack_path)
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from kv_store import MemoryKVStore
+from singleflight import SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight('test')
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'dolor'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', fetch))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    wait_for(lambda: flight.stats()['coalesced'] == 5)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert results == ['dolor'] * 6
+    assert len(calls) == 1
+    # Nothing is cached once the call is over
+    assert flight.do('k', lambda: 'again') == 'again'
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight('test')
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('upstream down')
+
+    def call():
+        try:
+            flight.do('k', fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    wait_for(lambda: flight.stats()['coalesced'] == 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ['upstream down'] * 2
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_workers_pick_up_the_result_published_through_the_store():
+    store = MemoryKVStore()
+    first, second = SingleFlight('test', store=store), SingleFlight('test', store=store, poll_interval=0.01)
+    assert first.do('k', lambda: 'dolor') == 'dolor'
+    assert second.do('k', lambda: pytest.fail('should reuse the published result')) == 'dolor'
+    assert second.stats()['shared_from_worker'] == 1
+
+
+def test_a_worker_waits_for_the_lock_holder_then_rechecks():
+    store = MemoryKVStore()
+    flight = SingleFlight('test', store=store, poll_interval=0.01)
+    # Another worker holds the lock and has filled the shared cache
+    store.incr('sf:test:lock:k', 1, 30)
+    assert flight.do('k', lambda: pytest.fail('should not call upstream'), recheck=lambda: 'cached') == 'cached'
+
+
+def test_stale_lock_times_out_into_a_direct_call():
+    store = MemoryKVStore()
+    flight = SingleFlight('test', store=store, wait_timeout=0.05, poll_interval=0.01)
+    store.incr('sf:test:lock:k', 1, 30)
+    assert flight.do('k', lambda: 'dolor') == 'dolor'
+    assert flight.stats()['lock_timeouts'] == 1
@@ -0,0 +1,41 @@
+import io
+import struct
+
+import speech_stream
+from fakes.speech import FakeSpeechClient
+from speech_stream import audio_stream, iter_chunks, read_wav_header, streaming_transcribe
+
+
+def make_wav(pcm, sample_rate=16000):
+    return (b'RIFF' + struct.pack('<I', 36 + len(pcm)) + b'WAVE' +
+            b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16) +
+            b'data' + struct.pack('<I', len(pcm)) + pcm)
+
+
+def test_read_wav_header():
+    assert read_wav_header(make_wav(b'\x00' * 10, 8000)) == (8000, 44)
+    assert read_wav_header(b'raw pcm bytes') == (None, 0)
+
+
+def test_audio_stream_strips_the_header():
+    pcm = bytes(range(200))
+    sample_rate, chunks = audio_stream(iter_chunks(io.BytesIO(make_wav(pcm)), chunk_size=64))
+    assert sample_rate == 16000
+    assert b''.join(chunks) == pcm
+
+
+def test_streaming_transcribe_final_results():
+    client = FakeSpeechClient(bytes_per_word=1000, words_per_phrase=2)
+    chunks = iter_chunks(io.BytesIO(make_wav(b'\x00' * 4000)), chunk_size=500)
+    results = list(streaming_transcribe(client, chunks, 'en-US', interim_results=False))
+    assert all(result['is_final'] for result in results)
+    assert ''.join(result['transcript'] for result in results).split() == ['word1', 'word2', 'word3', 'word4']
+
+
+def test_long_audio_rolls_over_to_new_sessions(monkeypatch):
+    monkeypatch.setattr(speech_stream, 'STREAM_MAX_SECONDS', 1)
+    client = FakeSpeechClient()
+    # 2.5 seconds of 16 kHz 16-bit audio: three sessions of at most one second each
+    chunks = iter_chunks(io.BytesIO(make_wav(b'\x00' * 80000)), chunk_size=16000)
+    list(streaming_transcribe(client, chunks, 'en-US'))
+    assert client.calls == 3
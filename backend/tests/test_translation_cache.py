@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+from db_pool import ThreadLocalPool
+from translation_cache import DatabaseCacheStore, LRUCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_ignores_whitespace_differences():
+    assert make_cache_key('  Take two\ttablets ', 'en', 'es') == make_cache_key('Take two tablets', 'en', 'es')
+    assert make_cache_key('Take two tablets', 'en', 'es') != make_cache_key('Take two tablets', 'en', 'fr')
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=0)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_expires_entries():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.set('a', 1)
+    clock.now = 11
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_database_store_counts_concurrent_lookups(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    pool = ThreadLocalPool(lambda: sqlite3.connect(path, timeout=10))
+    store = DatabaseCacheStore(pool.connection, 'sqlite')
+    store.ensure_schema()
+    store.set('hit', 'en', 'es', 'hola')
+
+    def lookups():
+        for _ in range(200):
+            store.get('hit')
+            store.get('miss')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = store.stats()
+    assert (stats['hits'], stats['misses'], stats['errors']) == (1600, 1600, 0)
+
+
+def test_cache_key_separates_translations_made_with_context():
+    plain = make_cache_key('It is fine.', 'en', 'es')
+    assert make_cache_key('It is fine.', 'en', 'es', context='The wound.') != plain
+    assert make_cache_key('It is fine.', 'en', 'es', context='') == plain
@@ -0,0 +1,69 @@
+from translation_memory import TranslationMemory, jaccard, shingles
+
+SOURCE = 'Take two tablets by mouth every morning with food'
+NEAR = 'Take two tablets by mouth every evening with food'
+
+
+def test_exact_match_ignores_whitespace():
+    memory = TranslationMemory()
+    memory.add(SOURCE, 'Tome dos tabletas', 'en', 'es', scope='alice')
+    assert memory.exact(f'  {SOURCE} ', 'en', 'es', scope='alice') == 'Tome dos tabletas'
+    assert memory.exact(SOURCE, 'en', 'fr', scope='alice') is None
+
+
+def test_fuzzy_finds_near_duplicates_only():
+    memory = TranslationMemory(threshold=0.5)
+    memory.add(SOURCE, 'Tome dos tabletas', 'en', 'es', scope='alice')
+    memory.add('Call the nurse if the pain gets worse', 'Llame a la enfermera', 'en', 'es', scope='alice')
+    matches = memory.fuzzy(NEAR, 'en', 'es', scope='alice')
+    assert [(source, translation) for _, source, translation in matches] == [(SOURCE, 'Tome dos tabletas')]
+    assert matches[0][0] == jaccard(shingles(NEAR), shingles(SOURCE))
+    # The segment itself is an exact hit, not a reference
+    assert memory.fuzzy(SOURCE, 'en', 'es', scope='alice') == []
+
+
+def test_users_only_see_their_own_history():
+    memory = TranslationMemory(threshold=0.5)
+    memory.add(SOURCE, 'Tome dos tabletas', 'en', 'es', scope='alice')
+    assert memory.exact(SOURCE, 'en', 'es', scope='bob') is None
+    assert memory.fuzzy(NEAR, 'en', 'es', scope='bob') == []
+    assert memory.fuzzy(NEAR, 'en', 'es', scope='alice')
+
+
+def test_shared_memory_pools_every_user():
+    memory = TranslationMemory(threshold=0.5, shared=True)
+    memory.load_rows([(7, SOURCE, 'Tome dos tabletas', 'en', 'es', 'alice')])
+    assert memory.exact(SOURCE, 'en', 'es', scope='bob') == 'Tome dos tabletas'
+    assert memory.fuzzy(NEAR, 'en', 'es', scope='bob')
+    assert memory.last_row_id == 7
+
+
+def test_fuzzy_ranks_candidates_by_shared_bands_before_truncating():
+    memory = TranslationMemory(threshold=0.5, max_candidates=1)
+    memory.add(NEAR, 'Tome dos tabletas por la noche', 'en', 'es')
+    # Later segments crowd the buckets the near duplicate shares with the query
+    for n in range(200):
+        memory.add(f'Take two tablets by mouth every {n} days', f'Tome dos tabletas cada {n} días', 'en', 'es')
+    matches = memory.fuzzy(SOURCE, 'en', 'es')
+    assert [source for _, source, _ in matches] == [NEAR]
+
+
+def test_indexes_are_loaded_once_per_user_and_pair():
+    calls = []
+
+    def loader(scope, input_language, output_language):
+        calls.append((scope, input_language, output_language))
+        return [(SOURCE, 'Tome dos tabletas')] if scope == 'alice' else []
+
+    memory = TranslationMemory(threshold=0.5, loader=loader)
+    # Rows for an index nobody has used yet are left to its loader
+    memory.load_rows([(3, NEAR, 'Tome dos tabletas por la noche', 'en', 'es', 'alice')])
+    assert memory.stats()['segments'] == 0
+    assert memory.exact(SOURCE, 'en', 'es', scope='alice') == 'Tome dos tabletas'
+    assert memory.fuzzy(NEAR, 'en', 'es', scope='alice')
+    assert memory.exact(SOURCE, 'en', 'es', scope='bob') is None
+    assert calls == [('alice', 'en', 'es'), ('bob', 'en', 'es')]
+    # Once loaded, an index takes new rows as they are synced
+    memory.load_rows([(4, NEAR, 'Tome dos tabletas por la noche', 'en', 'es', 'alice')])
+    assert memory.exact(NEAR, 'en', 'es', scope='alice') == 'Tome dos tabletas por la noche'
+    assert memory.last_row_id == 4
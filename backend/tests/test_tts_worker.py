@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from audio_store import AudioStore
+from kv_store import MemoryKVStore
+from singleflight import SingleFlight
+from tts_worker import DEFERRED, FAILED, PENDING, READY, UNKNOWN, TTSWorkerPool
+
+
+class Synthesizer:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, text, language, path):
+        self.calls += 1
+        self.release.wait(5)
+        with open(path, 'wb') as f:
+            f.write(f'{language}:{text}'.encode('utf-8'))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AudioStore(str(tmp_path / 'audio'))
+
+
+def evict(store, audio_id):
+    os.unlink(store.path_for(audio_id))
+
+
+def test_submit_renders_in_the_background(store):
+    synthesize = Synthesizer()
+    pool = TTSWorkerPool(store, synthesize, workers=1)
+    audio_id = pool.submit('hola', 'es')
+    assert pool.wait(audio_id, timeout=5) == (READY, None)
+    assert pool.submit('hola', 'es') == audio_id
+    assert synthesize.calls == 1
+
+
+def test_unknown_audio_id(store):
+    pool = TTSWorkerPool(store, Synthesizer(), workers=1)
+    assert pool.status('0' * 32) == (UNKNOWN, None)
+
+
+def test_evicted_ready_audio_is_not_reported_ready(store):
+    pool = TTSWorkerPool(store, Synthesizer(), workers=1)
+    audio_id = pool.submit('hola', 'es')
+    pool.wait(audio_id, timeout=5)
+    evict(store, audio_id)
+    assert pool.status(audio_id) == (DEFERRED, None)
+
+
+def test_ensure_renders_evicted_ready_audio_inline(store):
+    synthesize = Synthesizer()
+    pool = TTSWorkerPool(store, synthesize, workers=1)
+    audio_id = pool.submit('hola', 'es')
+    pool.wait(audio_id, timeout=5)
+    evict(store, audio_id)
+    assert pool.ensure(audio_id, timeout=5) == (READY, None)
+    assert store.get(audio_id) is not None
+    assert synthesize.calls == 2
+
+
+def test_submit_requeues_evicted_ready_audio(store):
+    synthesize = Synthesizer()
+    pool = TTSWorkerPool(store, synthesize, workers=1)
+    audio_id = pool.submit('hola', 'es')
+    pool.wait(audio_id, timeout=5)
+    evict(store, audio_id)
+    pool.submit('hola', 'es')
+    assert pool.wait(audio_id, timeout=5) == (READY, None)
+    assert synthesize.calls == 2
+
+
+def test_full_queue_defers_to_ensure(store):
+    synthesize = Synthesizer()
+    synthesize.release.clear()
+    pool = TTSWorkerPool(store, synthesize, workers=1, max_queue=1)
+    busy = pool.submit('one', 'es')
+    # Wait for the worker to take the first job so the second fills the queue
+    deadline = time.monotonic() + 5
+    while pool.stats()['queue_depth'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pool.submit('two', 'es')
+    deferred = pool.submit('three', 'es')
+    assert pool.status(deferred) == (DEFERRED, None)
+    assert pool.status(busy) == (PENDING, None)
+    synthesize.release.set()
+    assert pool.ensure(deferred, timeout=5) == (READY, None)
+
+
+def test_other_worker_waits_for_the_queuing_workers_render(tmp_path):
+    jobs = MemoryKVStore()
+    synthesize, other_synthesize = Synthesizer(), Synthesizer()
+    synthesize.release.clear()
+    queuing = TTSWorkerPool(AudioStore(str(tmp_path / 'audio')), synthesize, workers=1, job_store=jobs)
+    other = TTSWorkerPool(AudioStore(str(tmp_path / 'audio')), other_synthesize, workers=1, job_store=jobs,
+                          poll_interval=0.01)
+    audio_id = queuing.submit('hola', 'es')
+    assert other.status(audio_id) == (PENDING, None)
+    assert other.ensure(audio_id, timeout=0.05) == (PENDING, None)
+    threading.Timer(0.05, synthesize.release.set).start()
+    assert other.ensure(audio_id, timeout=5) == (READY, None)
+    assert other_synthesize.calls == 0
+
+
+def test_only_unrendered_jobs_publish_their_text(tmp_path):
+    jobs = MemoryKVStore()
+    synthesize = Synthesizer()
+    synthesize.release.clear()
+    pool = TTSWorkerPool(AudioStore(str(tmp_path / 'audio')), synthesize, workers=1, job_store=jobs)
+    audio_id = pool.submit('hola', 'es')
+    assert json.loads(jobs.get(f'tts:job:{audio_id}'))['text'] == 'hola'
+    synthesize.release.set()
+    pool.wait(audio_id, timeout=5)
+    assert json.loads(jobs.get(f'tts:job:{audio_id}')) == {'status': READY, 'error': None}
+
+
+def test_other_worker_renders_a_stale_or_deferred_job_once(tmp_path):
+    jobs = MemoryKVStore()
+    flight = SingleFlight('tts', store=jobs, poll_interval=0.01)
+    clock = FakeClock()
+    store = AudioStore(str(tmp_path / 'audio'))
+    # The queuing worker died before rendering its job
+    queuing = TTSWorkerPool(store, Synthesizer(), workers=0, job_store=jobs, clock=clock)
+    synthesize = Synthesizer()
+    others = [TTSWorkerPool(store, synthesize, workers=1, job_store=jobs, flight=flight, clock=clock)
+              for _ in range(3)]
+    audio_id = queuing.submit('hola', 'es')
+    assert others[0].ensure(audio_id, timeout=0) == (PENDING, None)
+    clock.now += 120
+    results = []
+    threads = [threading.Thread(target=lambda pool=pool: results.append(pool.ensure(audio_id, timeout=0)))
+               for pool in others]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == [(READY, None)] * 3
+    assert synthesize.calls == 1
+
+
+def test_failure_is_reported_until_it_expires(store):
+    calls = []
+
+    def broken(text, language, path):
+        calls.append(text)
+        raise RuntimeError('no voice')
+
+    clock = FakeClock()
+    pool = TTSWorkerPool(store, broken, workers=1, failure_ttl=300, clock=clock)
+    audio_id = pool.submit('hola', 'es')
+    pool.wait(audio_id, timeout=5)
+    for _ in range(3):
+        status, error = pool.ensure(audio_id, timeout=0)
+        assert status == FAILED and 'no voice' in error
+    assert len(calls) == 1
+    clock.now += 300
+    assert pool.ensure(audio_id, timeout=0)[0] == FAILED
+    assert len(calls) == 2
+
+
+def test_other_worker_sees_failures(tmp_path):
+    jobs = MemoryKVStore()
+
+    def broken(text, language, path):
+        raise RuntimeError('no voice')
+
+    queuing = TTSWorkerPool(AudioStore(str(tmp_path / 'audio')), broken, workers=1, job_store=jobs)
+    other = TTSWorkerPool(AudioStore(str(tmp_path / 'audio')), broken, workers=1, job_store=jobs)
+    audio_id = queuing.submit('hola', 'es')
+    queuing.wait(audio_id, timeout=5)
+    status, error = other.status(audio_id)
+    assert status == FAILED
+    assert 'no voice' in error
@@ -0,0 +1,209 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a size bound and per-entry TTL"""
+
+    def __init__(self, max_size=1024, ttl=3600, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def normalize_text(text):
+    """Canonical form of a source text used for cache keys"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def make_cache_key(text, input_language, output_language, context=None):
+    """Cache key of a translation; one made with context is kept apart from the plain translation"""
+    raw = f"{input_language}\x1f{output_language}\x1f{normalize_text(text)}"
+    if context:
+        raw += f"\x1e{normalize_text(context)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class DatabaseCacheStore:
+    """Persistent cache tier stored in the translation_cache table"""
+
+    def __init__(self, get_connection, dialect, ttl=30 * 24 * 3600):
+        self._get_connection = get_connection
+        self.dialect = dialect
+        self.param = '?' if dialect == 'sqlite' else '%s'
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _count(self, key):
+        with self._lock:
+            setattr(self, key, getattr(self, key) + 1)
+
+    def ensure_schema(self):
+        if self.dialect == 'mysql':
+            ddl = '''
+                CREATE TABLE IF NOT EXISTS translation_cache (
+                    cache_key CHAR(64) PRIMARY KEY,
+                    input_language VARCHAR(16) NOT NULL,
+                    output_language VARCHAR(16) NOT NULL,
+                    translated_text MEDIUMTEXT NOT NULL,
+                    created_at DOUBLE NOT NULL
+                )
+            '''
+        else:
+            ddl = '''
+                CREATE TABLE IF NOT EXISTS translation_cache (
+                    cache_key CHAR(64) PRIMARY KEY,
+                    input_language TEXT NOT NULL,
+                    output_language TEXT NOT NULL,
+                    translated_text TEXT NOT NULL,
+                    created_at DOUBLE PRECISION NOT NULL
+                )
+            '''
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(ddl)
+
+    def get(self, key):
+        p = self.param
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'SELECT translated_text, created_at FROM translation_cache WHERE cache_key = {p}',
+                    (key,))
+                row = cursor.fetchone()
+        except Exception as e:
+            self._count('errors')
+            print(f"⚠️ Warning: Translation cache read failed: {e}")
+            return None
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return row[0]
+
+    def set(self, key, input_language, output_language, translated_text):
+        p = self.param
+        values = (key, input_language, output_language, translated_text, time.time())
+        placeholders = ', '.join([p] * 5)
+        if self.dialect == 'sqlite':
+            query = f'INSERT OR REPLACE INTO translation_cache VALUES ({placeholders})'
+        elif self.dialect == 'mysql':
+            query = f'REPLACE INTO translation_cache VALUES ({placeholders})'
+        else:
+            query = f'''
+                INSERT INTO translation_cache VALUES ({placeholders})
+                ON CONFLICT (cache_key) DO UPDATE
+                SET translated_text = EXCLUDED.translated_text, created_at = EXCLUDED.created_at
+            '''
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, values)
+        except Exception as e:
+            self._count('errors')
+            print(f"⚠️ Warning: Translation cache write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'errors': self.errors,
+            }
+
+
+class TranslationCache:
+    """Two-tier translation cache: in-process LRU, then optional database store"""
+
+    def __init__(self, memory, store=None):
+        self.memory = memory
+        self.store = store
+
+    def get(self, text, input_language, output_language, context=None):
+        key = make_cache_key(text, input_language, output_language, context)
+        translated_text = self.memory.get(key)
+        if translated_text is not None or self.store is None:
+            return translated_text
+        translated_text = self.store.get(key)
+        if translated_text is not None:
+            self.memory.set(key, translated_text)
+        return translated_text
+
+    def set(self, text, input_language, output_language, translated_text, context=None):
+        key = make_cache_key(text, input_language, output_language, context)
+        self.memory.set(key, translated_text)
+        if self.store is not None:
+            self.store.set(key, input_language, output_language, translated_text)
+
+    def stats(self):
+        return {
+            'memory': self.memory.stats(),
+            'persistent': self.store.stats() if self.store is not None else None,
+        }
@@ -0,0 +1,236 @@
+import threading
+import zlib
+from collections import Counter
+
+from translation_cache import normalize_text
+
+_MASK = (1 << 32) - 1
+
+
+def shingles(text, size=4):
+    """Set of hashed character n-grams of the lowercased, whitespace-normalized text"""
+    text = normalize_text(text).lower()
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """One-permutation MinHash: a single pass over the shingles fills all slots
+
+    Each shingle hash is mixed, its low part picks a slot and the rest is the
+    value kept if it is the slot minimum. Empty slots borrow from the next
+    filled slot (rotation densification), so short texts still get a full
+    signature.
+    """
+
+    def __init__(self, num_perm=16, seed=0x9E3779B1):
+        self.num_perm = num_perm
+        self.seed = seed | 1
+
+    def signature(self, shingle_set):
+        k = self.num_perm
+        seed = self.seed
+        slots = [None] * k
+        for h in shingle_set:
+            h = (h * seed) & _MASK
+            h ^= h >> 15
+            slot = h % k
+            value = h // k
+            current = slots[slot]
+            if current is None or value < current:
+                slots[slot] = value
+        if None in slots:
+            filled = [i for i in range(k) if slots[i] is not None]
+            if not filled:
+                return tuple([0] * k)
+            for i in range(k):
+                if slots[i] is None:
+                    j = next((f for f in filled if f > i), filled[0])
+                    slots[i] = slots[j] + ((j - i) % k) * (_MASK + 1)
+        return tuple(slots)
+
+
+class PairIndex:
+    """Exact and LSH-bucketed fuzzy index for one scope and (input, output) language pair"""
+
+    def __init__(self, hasher, bands, rows):
+        self.hasher = hasher
+        self.bands = bands
+        self.rows = rows
+        self.exact = {}  # normalized source -> translation
+        self.sources = []  # entry id -> normalized source
+        self.buckets = {}  # (band, band signature) -> [entry ids]
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def add(self, source, translation, shingle_set=None):
+        if source in self.exact:
+            self.exact[source] = translation
+            return False
+        self.exact[source] = translation
+        entry_id = len(self.sources)
+        self.sources.append(source)
+        signature = self.hasher.signature(shingle_set or shingles(source))
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(entry_id)
+        return True
+
+    def candidates(self, shingle_set, limit, per_bucket):
+        """Up to limit entry ids sharing a band with shingle_set, those sharing the most bands first
+
+        Each bucket contributes only its ``per_bucket`` most recent entries, so
+        the cost stays bounded however large a bucket grows.
+        """
+        signature = self.hasher.signature(shingle_set)
+        bands_matched = Counter()
+        for key in self._band_keys(signature):
+            bands_matched.update(self.buckets.get(key, ())[-per_bucket:])
+        # More shared bands means a higher expected similarity; ties go to newer entries
+        ranked = sorted(bands_matched.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        return [entry_id for entry_id, _ in ranked[:limit]]
+
+
+class TranslationMemory:
+    """Translation memory over previously translated segments
+
+    Exact matches are a dict lookup on the normalized source. Near-duplicates
+    are found with MinHash LSH over character 4-gram shingles, then verified
+    with the exact Jaccard similarity of at most ``max_candidates`` segments
+    (those sharing the most LSH bands, each bucket contributing its
+    ``bucket_candidates`` newest), so a lookup costs one signature plus a
+    handful of bucket reads regardless of how many segments are indexed.
+
+    Segments are indexed per ``scope`` (the user whose history they come
+    from) and a lookup only sees its own scope's segments, so one user's
+    texts never surface in another user's results. ``shared=True`` ignores
+    scopes and pools every segment.
+
+    With a ``loader``, an index is built on its first lookup from
+    ``loader(scope, input_language, output_language)``, an iterable of
+    (source, translation) pairs, rather than from the whole history up
+    front; segments added for an index that is not loaded yet are left to
+    the loader.
+    """
+
+    def __init__(self, threshold=0.75, num_perm=16, bands=4, max_candidates=50, bucket_candidates=50,
+                 shared=False, loader=None):
+        if bands * (num_perm // bands) != num_perm:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_candidates = max_candidates
+        self.bucket_candidates = bucket_candidates
+        self.shared = shared
+        self.loader = loader
+        self.hasher = MinHasher(num_perm)
+        self._pairs = {}
+        self._lock = threading.RLock()
+        self.last_row_id = 0
+        self.size = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def _key(self, scope, input_language, output_language):
+        return (None if self.shared else scope, input_language, output_language)
+
+    def _index(self, scope, input_language, output_language):
+        """Index of a scope and language pair, loading it on first use; None if there is nothing to search"""
+        key = self._key(scope, input_language, output_language)
+        index = self._pairs.get(key)
+        if index is not None or self.loader is None:
+            return index
+        # Built outside the lock: loading runs a query and hashes every segment
+        index = PairIndex(self.hasher, self.bands, self.rows)
+        added = 0
+        for source, translation in self.loader(*key):
+            source = normalize_text(source or '')
+            translation = (translation or '').strip()
+            if source and translation and index.add(source, translation):
+                added += 1
+        with self._lock:
+            if key not in self._pairs:
+                self._pairs[key] = index
+                self.size += added
+            return self._pairs[key]
+
+    def add(self, source, translation, input_language, output_language, scope=None):
+        source = normalize_text(source)
+        translation = translation.strip()
+        if not source or not translation:
+            return
+        shingle_set = shingles(source)
+        key = self._key(scope, input_language, output_language)
+        with self._lock:
+            index = self._pairs.get(key)
+            if index is None:
+                if self.loader is not None:
+                    return
+                index = self._pairs[key] = PairIndex(self.hasher, self.bands, self.rows)
+            if index.add(source, translation, shingle_set):
+                self.size += 1
+
+    def exact(self, text, input_language, output_language, scope=None):
+        index = self._index(scope, input_language, output_language)
+        if index is None:
+            return None
+        translation = index.exact.get(normalize_text(text))
+        with self._lock:
+            if translation is not None:
+                self.exact_hits += 1
+        return translation
+
+    def fuzzy(self, text, input_language, output_language, limit=3, scope=None):
+        """Up to ``limit`` (similarity, source, translation) matches above the threshold, best first"""
+        index = self._index(scope, input_language, output_language)
+        if index is None:
+            return []
+        source = normalize_text(text)
+        query = shingles(source)
+        with self._lock:
+            candidate_ids = index.candidates(query, self.max_candidates, self.bucket_candidates)
+            candidates = [index.sources[i] for i in candidate_ids]
+        matches = []
+        for candidate in candidates:
+            if candidate == source:
+                continue
+            similarity = jaccard(query, shingles(candidate))
+            if similarity >= self.threshold:
+                matches.append((similarity, candidate, index.exact[candidate]))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        with self._lock:
+            if matches:
+                self.fuzzy_hits += 1
+            else:
+                self.misses += 1
+        return matches[:limit]
+
+    def load_rows(self, rows):
+        """Index (id, original_text, translated_text, input_language, output_language, scope) rows"""
+        for row_id, source, translation, input_language, output_language, scope in rows:
+            if source and translation:
+                self.add(source, translation, input_language, output_language, scope)
+            self.last_row_id = max(self.last_row_id, row_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'segments': self.size,
+                'shared': self.shared,
+                'indexes': len(self._pairs),
+                'threshold': self.threshold,
+                'last_row_id': self.last_row_id,
+                'exact_hits': self.exact_hits,
+                'fuzzy_hits': self.fuzzy_hits,
+                'misses': self.misses,
+            }
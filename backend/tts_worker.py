@@ -0,0 +1,266 @@
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from audio_store import make_audio_id
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+DEFERRED = 'deferred'  # queue was full; synthesized on first request instead
+UNKNOWN = 'unknown'
+
+
+class TTSJob:
+    def __init__(self, audio_id, text, language, queued_at=None):
+        self.audio_id = audio_id
+        self.text = text
+        self.language = language
+        self.queued_at = queued_at
+        self.status = PENDING
+        self.error = None
+        self.failed_at = None
+        self.done = threading.Event()
+
+
+class TTSWorkerPool:
+    """Background text-to-speech synthesis with a bounded queue
+
+    Jobs are keyed by the audio store content id, so submitting the same
+    (text, language) twice never synthesizes it twice. When the queue is full
+    the job is recorded as deferred and rendered on demand by ``ensure()``.
+    With a ``flight`` (singleflight.SingleFlight) renders are also coalesced
+    with other worker processes sharing its store.
+
+    With a shared ``job_store`` (see kv_store) every job's status is also
+    published there, so a worker process that did not queue a job reports
+    it too and waits for the queuing worker's render. The text (patient
+    data) is only published while the job is unrendered, for at most
+    ``pending_ttl`` seconds, so that another worker can render a deferred
+    job or one whose worker died (pending for over ``stale_after``
+    seconds); such renders should go through a flight sharing the store.
+    Rendered jobs keep only their status, for ``job_ttl`` seconds.
+
+    A failed render is reported as failed for ``failure_ttl`` seconds
+    before ``ensure()`` tries it again.
+    """
+
+    def __init__(self, store, synthesize, workers=2, max_queue=100, max_jobs=10000, flight=None,
+                 job_store=None, job_ttl=86400, pending_ttl=3600, stale_after=120, failure_ttl=300,
+                 poll_interval=0.1, clock=time.time):
+        self.store = store
+        self.synthesize = synthesize
+        self.flight = flight
+        self.job_store = job_store
+        self.job_ttl = job_ttl
+        self.pending_ttl = pending_ttl
+        self.stale_after = stale_after
+        self.failure_ttl = failure_ttl
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deferred = 0
+        self.failures = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f'tts-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _remember(self, job):
+        self._jobs[job.audio_id] = job
+        self._jobs.move_to_end(job.audio_id)
+        while len(self._jobs) > self.max_jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status == PENDING:
+                break
+            del self._jobs[oldest_id]
+
+    def _publish(self, job):
+        """Record the job in the shared job store for the other worker processes"""
+        if self.job_store is None:
+            return
+        record = {'status': job.status, 'error': job.error}
+        if job.status in (PENDING, DEFERRED):
+            # Another worker may have to render it; the text goes once it is rendered
+            record.update(text=job.text, language=job.language, queued_at=job.queued_at)
+            ttl = self.pending_ttl
+        else:
+            ttl = self.failure_ttl if job.status == FAILED else self.job_ttl
+        try:
+            self.job_store.set(f'tts:job:{job.audio_id}', json.dumps(record), ttl)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not publish TTS job {job.audio_id}: {e}")
+
+    def _shared_job(self, audio_id):
+        """The job another worker process published for audio_id, or None"""
+        if self.job_store is None:
+            return None
+        try:
+            value = self.job_store.get(f'tts:job:{audio_id}')
+        except Exception as e:
+            print(f"⚠️ Warning: Could not read TTS job {audio_id}: {e}")
+            return None
+        if value is None:
+            return None
+        record = json.loads(value)
+        job = TTSJob(audio_id, record.get('text'), record.get('language'), record.get('queued_at'))
+        job.status = record['status']
+        job.error = record['error']
+        return job
+
+    def submit(self, text, language):
+        """Queue synthesis of text and return its audio id immediately"""
+        audio_id = make_audio_id(text, language)
+        if self.store.contains(audio_id):
+            return audio_id
+        with self._lock:
+            job = self._jobs.get(audio_id)
+            if job is not None and job.status == PENDING:
+                return audio_id
+            # A READY job whose file has since been evicted is queued again
+            job = TTSJob(audio_id, text, language, self._clock())
+            self._remember(job)
+            self.submitted += 1
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                job.status = DEFERRED
+                self.deferred += 1
+            job.done.set()
+        self._publish(job)
+        return audio_id
+
+    def _create(self, job):
+        return self.store.get_or_create(job.text, job.language, self.synthesize)[0]
+
+    def _render(self, job):
+        try:
+            if self.flight is not None:
+                self.flight.do(job.audio_id, lambda: self._create(job),
+                               recheck=lambda: job.audio_id if self.store.contains(job.audio_id) else None)
+            else:
+                self._create(job)
+            job.status = READY
+            job.error = None
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"Text-to-speech error: {str(e)}"
+            job.failed_at = self._clock()
+            with self._lock:
+                self.failures += 1
+            print(f"⚠️ Warning: {job.error}")
+        finally:
+            self._publish(job)
+            job.done.set()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._render(job)
+            finally:
+                self._queue.task_done()
+
+    def status(self, audio_id):
+        """(status, error) for an audio id"""
+        if self.store.contains(audio_id):
+            return READY, None
+        with self._lock:
+            job = self._jobs.get(audio_id)
+        if job is None:
+            job = self._shared_job(audio_id)
+        if job is None:
+            return UNKNOWN, None
+        if job.status == READY:
+            # Rendered, but evicted from the store since; ensure() renders it again
+            # if the text is known here
+            return (DEFERRED, None) if job.text is not None else (UNKNOWN, None)
+        return job.status, job.error
+
+    def wait(self, audio_id, timeout=None):
+        """Block until a queued job finishes (or timeout) and return its status"""
+        with self._lock:
+            job = self._jobs.get(audio_id)
+        if job is not None:
+            job.done.wait(timeout)
+            return self.status(audio_id)
+        # Queued by another worker process, if at all: poll its published status
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status, error = self.status(audio_id)
+            if status != PENDING or (deadline is not None and time.monotonic() >= deadline):
+                return status, error
+            time.sleep(self.poll_interval)
+
+    def _claim(self, audio_id, shared=None):
+        """Mark a job that is not being rendered here as pending and return it (None if it is)
+
+        shared is the job as published by another worker process; it is
+        adopted if this process does not know the audio id.
+        """
+        with self._lock:
+            job = self._jobs.get(audio_id)
+            if job is None and shared is not None:
+                job = shared
+                self._remember(job)
+            elif job is None or job.status == PENDING:
+                return None
+            job.status = PENDING
+            job.done.clear()
+            return job
+
+    def _renderable(self, job):
+        """Whether ensure() should render job here rather than wait or report it"""
+        if job.text is None:
+            return False  # rendered or failed elsewhere; the text was not kept
+        if job.status == FAILED:
+            return job.failed_at is None or self._clock() - job.failed_at >= self.failure_ttl
+        if job.status == PENDING:
+            # Queued by a worker that has not rendered it for too long (it may have died)
+            return job.queued_at is not None and self._clock() - job.queued_at >= self.stale_after
+        return True
+
+    def ensure(self, audio_id, timeout=None):
+        """Status of audio_id after waiting for it
+
+        Deferred and evicted jobs, failed ones past ``failure_ttl`` and
+        stale ones queued by another worker process are rendered inline.
+        """
+        status, error = self.wait(audio_id, timeout)
+        if status in (READY, UNKNOWN):
+            return status, error
+        with self._lock:
+            job = self._jobs.get(audio_id)
+        shared = None
+        if job is None:
+            job = shared = self._shared_job(audio_id)
+        if job is None or not self._renderable(job):
+            return status, error
+        job = self._claim(audio_id, shared)
+        if job is not None:
+            self._render(job)
+        return self.status(audio_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'workers': len(self._threads),
+                'queue_depth': self._queue.qsize(),
+                'queue_max': self._queue.maxsize,
+                'submitted': self.submitted,
+                'deferred': self.deferred,
+                'failures': self.failures,
+                'jobs': counts,
+            }
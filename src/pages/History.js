@@ -5,25 +5,49 @@ import { Footer } from '../components/Footer';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5000';
 
+// History is kept per user; send the access token when logged in
+const authHeaders = () => {
+    const token = localStorage.getItem('token');
+    return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
 export const History = () => {
     const [history, setHistory] = useState([]);
     const [selectedItem, setSelectedItem] = useState(null);
     const [showModal, setShowModal] = useState(false);
 
-    useEffect(() => {
-        fetch(`${API_BASE_URL}/history`)
-            .then((res) => res.json())
+    const [nextCursor, setNextCursor] = useState(null);
+    const [search, setSearch] = useState('');
+    const [activeSearch, setActiveSearch] = useState('');
+
+    // Load one page of history, or of search results when searchText is set;
+    // pages are chained through the X-Next-Cursor header
+    const loadHistory = (cursor = null, searchText = activeSearch) => {
+        const params = new URLSearchParams();
+        if (searchText) params.set('q', searchText);
+        if (cursor) params.set('cursor', cursor);
+        const path = searchText ? '/history/search' : '/history';
+        const query = params.toString() ? `?${params}` : '';
+        fetch(`${API_BASE_URL}${path}${query}`, { headers: authHeaders() })
+            .then((res) => {
+                setNextCursor(res.headers.get('X-Next-Cursor'));
+                return res.json();
+            })
             .then((data) => {
                 if (data.error) {
                     alert(data.error);
                 } else {
-                    setHistory(data);
+                    setHistory((previous) => (cursor ? [...previous, ...data] : data));
                 }
             })
             .catch((err) => {
                 console.error('Error fetching history:', err);
                 alert('Failed to load history. Please try again.');
             });
+    };
+
+    useEffect(() => {
+        loadHistory();
     }, []);
 
     return (
@@ -34,6 +58,29 @@ export const History = () => {
                 <main className="md:ml-64 p-5 flex-1">
                     <h1 className="text-2xl font-bold mb-5">Chat History</h1>
                     <p className="text-[var(--text-muted)] mb-5">Review your past translation sessions.</p>
+                    <form
+                        onSubmit={(e) => {
+                            e.preventDefault();
+                            const searchText = search.trim();
+                            setActiveSearch(searchText);
+                            loadHistory(null, searchText);
+                        }}
+                        className="flex gap-3 mb-5"
+                    >
+                        <input
+                            type="search"
+                            value={search}
+                            onChange={(e) => setSearch(e.target.value)}
+                            placeholder="Search original or translated text"
+                            className="flex-1 p-2 border border-[var(--glass-border)] rounded-lg"
+                        />
+                        <button
+                            type="submit"
+                            className="px-5 py-2 bg-[var(--accent-blue)] text-[var(--primary-white)] rounded-full hover:shadow-lg"
+                        >
+                            Search
+                        </button>
+                    </form>
                     <table className="w-full border-collapse">
                         <thead>
                             <tr className="bg-[var(--glass-bg)] text-[var(--text-muted)]">
@@ -62,6 +109,14 @@ export const History = () => {
                             ))}
                         </tbody>
                     </table>
+                    {nextCursor && (
+                        <button
+                            onClick={() => loadHistory(nextCursor)}
+                            className="mt-5 px-5 py-2 bg-[var(--accent-blue)] text-[var(--primary-white)] rounded-full hover:shadow-lg"
+                        >
+                            Load more
+                        </button>
+                    )}
                 </main>
             </div>
             <Footer />
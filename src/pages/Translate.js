@@ -5,6 +5,46 @@ import { Footer } from '../components/Footer';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5000';
 
+// History is kept per user; send the access token when logged in
+const authHeaders = () => {
+    const token = localStorage.getItem('token');
+    return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// POST to /translate/stream and dispatch each server-sent event as it arrives
+const streamTranslation = async (body, onEvent) => {
+    const res = await fetch(`${API_BASE_URL}/translate/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...authHeaders() },
+        body: JSON.stringify(body),
+    });
+    if (!res.ok || !res.body) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.error || `Request failed with status ${res.status}`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach((line) => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+};
+
 export const Translate = () => {
     const [transcript, setTranscript] = useState('');
     const [translatedText, setTranslatedText] = useState('');
@@ -213,30 +253,28 @@ export const Translate = () => {
                 if (fullFinalTranscriptRef.current.trim()) {
                     // Translate the complete transcript as a whole
                     // This ensures we translate complete sentences rather than fragments
-                    fetch(`${API_BASE_URL}/translate`, {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            text: fullFinalTranscriptRef.current,
-                            inputLanguage,
-                            outputLanguage,
-                        }),
-                    })
-                        .then((res) => res.json())
-                        .then((data) => {
-                            if (data.error) {
-                                console.error('Translation error:', data.error);
-                            } else {
-                                setTranslatedText(data.translated_text);
-                                // If we want to show transcript in output language, update it
-                                if (isTranscriptInOutputLanguage.current) {
-                                    setTranscript(data.translated_text);
-                                }
+                    let streamedText = '';
+                    streamTranslation({
+                        text: fullFinalTranscriptRef.current,
+                        inputLanguage,
+                        outputLanguage,
+                    }, (event, data) => {
+                        if (event === 'chunk') {
+                            // Show partial translation as soon as tokens arrive
+                            streamedText += data.text;
+                            setTranslatedText(streamedText);
+                        } else if (event === 'translation') {
+                            setTranslatedText(data.translated_text);
+                            // If we want to show transcript in output language, update it
+                            if (isTranscriptInOutputLanguage.current) {
+                                setTranscript(data.translated_text);
                             }
-                        })
-                        .catch((err) => {
-                            console.error('Translation error:', err);
-                        });
+                        } else if (event === 'error') {
+                            console.error('Translation error:', data.error);
+                        }
+                    }).catch((err) => {
+                        console.error('Translation error:', err);
+                    });
                 }
             } else if (interimTranscript) {
                 // For interim results, combine with the existing final transcript